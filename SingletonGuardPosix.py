@@ -0,0 +1,145 @@
+import fcntl
+import json
+import os
+import socket
+import sys
+import threading
+import time
+from instance_request import parse_request
+
+# 单条请求/应答的最大字节数
+MAX_MESSAGE_SIZE = 64 * 1024
+
+
+# singleton guardian for linux/macos
+class SingletonGuardPosix:
+    """
+    用fcntl锁定锁文件保证只有一个实例；持有锁的实例在Unix域套接字上接收请求，
+    后启动的实例把请求(显示窗口、执行命令、搜索)转发给它后立即退出
+    """
+
+    connect_retries = 20
+    connect_interval = 0.05
+    timeout = 2.0
+
+    def __init__(self, lock_file_path: str, socket_path: str | None = None):
+        self._lock_file_path = lock_file_path
+        if socket_path is None:
+            socket_path = os.path.splitext(lock_file_path)[0] + ".sock"
+        self._socket_path = socket_path
+        self._lock_fd = None
+        self._server = None
+
+    @classmethod
+    def forward_if_running(cls, lock_file_path: str, argv: list[str]):
+        """已有实例在运行时把请求转发给它并退出进程，否则直接返回"""
+        guard = cls(lock_file_path)
+        if guard._acquire_lock():
+            guard._release_lock()
+            return
+        guard._forward_and_exit(parse_request(argv))
+
+    def _acquire_lock(self):
+        fd = os.open(self._lock_file_path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False
+        os.ftruncate(fd, 0)
+        os.write(fd, str(os.getpid()).encode())
+        self._lock_fd = fd
+        return True
+
+    def _release_lock(self):
+        if self._server is not None:
+            self._server.close()
+            self._server = None
+            try:
+                os.unlink(self._socket_path)
+            except OSError:
+                pass
+        if self._lock_fd is not None:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+            os.close(self._lock_fd)
+            self._lock_fd = None
+
+    def is_already_running(self):
+        return self._lock_fd is None and not self._acquire_lock()
+
+    def forward(self, request: dict) -> dict | None:
+        """把请求发送给正在运行的实例，返回其应答；无法连接时返回None"""
+        data = json.dumps(request, ensure_ascii=False).encode() + b"\n"
+        # 运行中的实例可能刚取得锁、尚未开始监听
+        for _ in range(self.connect_retries):
+            try:
+                with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+                    client.settimeout(self.timeout)
+                    client.connect(self._socket_path)
+                    client.sendall(data)
+                    reply = client.makefile("rb").readline(MAX_MESSAGE_SIZE)
+                    return json.loads(reply) if reply else None
+            except (FileNotFoundError, ConnectionRefusedError):
+                time.sleep(self.connect_interval)
+            except (OSError, ValueError):
+                return None
+        return None
+
+    def serve(self, handler):
+        """
+        开始接收其他实例的请求，handler(请求) 在接收线程中调用，返回应答
+        """
+        try:
+            os.unlink(self._socket_path)
+        except FileNotFoundError:
+            pass
+        self._server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._server.bind(self._socket_path)
+        os.chmod(self._socket_path, 0o600)
+        self._server.listen(8)
+        threading.Thread(target=self._accept, args=(handler,), daemon=True).start()
+
+    def _accept(self, handler):
+        server = self._server
+        while True:
+            try:
+                conn, _ = server.accept()
+            except OSError:
+                # 已关闭
+                return
+            with conn:
+                try:
+                    conn.settimeout(self.timeout)
+                    line = conn.makefile("rb").readline(MAX_MESSAGE_SIZE)
+                    reply = handler(json.loads(line))
+                except Exception as e:
+                    reply = {"ok": False, "error": str(e)}
+                data = json.dumps(reply, ensure_ascii=False).encode() + b"\n"
+                try:
+                    conn.sendall(data)
+                except OSError:
+                    pass
+
+    def _forward_and_exit(self, request: dict):
+        reply = self.forward(request)
+        if reply is None:
+            print("Another instance is already running.")
+            sys.exit(1)
+        if not reply.get("ok"):
+            print(reply.get("error", ""), file=sys.stderr)
+            sys.exit(1)
+        sys.exit(0)
+
+    def __enter__(self):
+        if self.is_already_running():
+            self._forward_and_exit(parse_request(sys.argv[1:]))
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._release_lock()
+
+    def guard(self):
+        return self.__enter__()
+
+    def release(self):
+        self._release_lock()
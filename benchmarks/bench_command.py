@@ -0,0 +1,42 @@
+"""
+Command的基准测试：构造、to_dict、from_dict 以及往返转换(导入导出的路径)
+
+    python benchmarks/bench_command.py [--count 100000] [--save]
+"""
+
+import argparse
+import sys
+
+# harness把项目根目录加入sys.path
+from harness import Suite, add_arguments
+from command import Command
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Command基准测试")
+    add_arguments(parser)
+    parser.add_argument("--count", type=int, default=100_000, help="每轮的命令数")
+    args = parser.parse_args(argv)
+
+    count = args.count
+    rows = [(f"cmd{i}", f"echo {i}", f"备注 {i}", i) for i in range(count)]
+    commands = [Command(*row) for row in rows]
+    dicts = [cmd.to_dict() for cmd in commands]
+
+    suite = Suite("command", args)
+    print(f"每条命令的耗时({count}条):", flush=True)
+    suite.bench("Command()", lambda: [Command(*row) for row in rows], items=count)
+    suite.bench("to_dict", lambda: [cmd.to_dict() for cmd in commands], items=count)
+    suite.bench(
+        "from_dict", lambda: [Command.from_dict(d) for d in dicts], items=count
+    )
+    suite.bench(
+        "to_dict+from_dict",
+        lambda: [Command.from_dict(cmd.to_dict()) for cmd in commands],
+        items=count,
+    )
+    return suite.report()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
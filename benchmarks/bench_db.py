@@ -0,0 +1,121 @@
+"""
+DBService的基准测试：在不同数据量(默认1k、100k)的数据库上测量
+批量写入、全量读取、分页、按ID读取、单条增改删、批量删除和搜索
+
+    python benchmarks/bench_db.py [--sizes 1k,100k,1m] [--save]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+# harness把项目根目录加入sys.path
+from harness import Suite, add_arguments, parse_sizes
+from command import Command
+from dbservice import DUPLICATE_SKIP, DBService
+
+# 单条操作每轮执行的次数
+SINGLE_OPS = 200
+
+
+def make_commands(count: int, start: int = 0) -> list[Command]:
+    return [
+        Command(f"cmd{i}", f"echo {i} --flag value{i % 100}", f"备注 {i}")
+        for i in range(start, start + count)
+    ]
+
+
+def bench_size(suite: Suite, size: int, tmp: str):
+    label = f"{size // 1000}k" if size < 1000_000 else f"{size // 1000_000}m"
+    db_service = DBService(os.path.join(tmp, f"bench_{size}.db"))
+    rng = random.Random(size)
+    try:
+        commands = make_commands(size)
+        start = time.perf_counter()
+        db_service.bulk_save_commands(commands)
+        suite.record(f"{label}/bulk_save_commands", [time.perf_counter() - start])
+        ids = [cmd.id for cmd in commands]
+        del commands
+
+        suite.bench(f"{label}/count_commands", db_service.count_commands)
+        suite.bench(f"{label}/get_commands", db_service.get_commands)
+        suite.bench(
+            f"{label}/iter_commands",
+            lambda: sum(1 for _ in db_service.iter_commands()),
+        )
+        middle = ids[len(ids) // 2]
+        suite.bench(
+            f"{label}/get_commands_page",
+            lambda: db_service.get_commands_page(after_id=middle, limit=200),
+            number=SINGLE_OPS,
+        )
+        suite.bench(
+            f"{label}/get_command",
+            lambda: db_service.get_command(rng.choice(ids)),
+            number=SINGLE_OPS,
+        )
+        suite.bench(
+            f"{label}/get_commands_by_ids(200)",
+            lambda: db_service.get_commands_by_ids(rng.sample(ids, 200)),
+        )
+        suite.bench(
+            f"{label}/search_commands",
+            lambda: db_service.search_commands(f"value{rng.randrange(100)}"),
+        )
+        # 全部已存在，走去重路径
+        existing = make_commands(1000)
+        suite.bench(
+            f"{label}/bulk_save_commands(1k dup)",
+            lambda: db_service.bulk_save_commands(existing, DUPLICATE_SKIP),
+        )
+
+        new_ids = []
+        serial = iter(range(size, size * 10))
+        suite.bench(
+            f"{label}/save_command",
+            lambda: new_ids.append(
+                db_service.save_command(make_commands(1, next(serial))[0]).id
+            ),
+            number=SINGLE_OPS,
+        )
+
+        def update():
+            cmd = Command("更新", "echo updated", None, rng.choice(ids))
+            db_service.update_command(cmd)
+
+        suite.bench(f"{label}/update_command", update, number=SINGLE_OPS)
+        suite.bench(
+            f"{label}/delete_command",
+            lambda: db_service.delete_command(new_ids.pop()),
+            number=min(SINGLE_OPS, len(new_ids) // suite.args.repeat),
+        )
+        # 每轮删除不同的1000条
+        batches = iter([ids[i : i + 1000] for i in range(0, len(ids), 1000)])
+        suite.bench(
+            f"{label}/delete_commands(1k)",
+            lambda: db_service.delete_commands(next(batches)),
+            repeat=min(suite.args.repeat, len(ids) // 1000),
+        )
+    finally:
+        db_service.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="DBService基准测试")
+    add_arguments(parser)
+    parser.add_argument("--sizes", default="1k,100k", help="数据量，如 1k,100k,1m")
+    args = parser.parse_args(argv)
+
+    suite = Suite("db", args)
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in parse_sizes(args.sizes):
+            print(f"{size} 条命令:", flush=True)
+            bench_size(suite, size, tmp)
+    return suite.report()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,91 @@
+"""
+执行引擎的基准测试：每执行一条命令的额外开销(与直接subprocess.run比较)、
+工作线程的启动、并发批量执行，以及大量输出时的吞吐
+
+    python benchmarks/bench_executor.py [--commands 20] [--save]
+"""
+
+import argparse
+import queue
+import subprocess
+import sys
+
+# harness把项目根目录加入sys.path
+from harness import Suite, add_arguments
+import executor
+
+# sh和cmd中都可用的空命令
+NOOP = "exit 0"
+# 输出约10MB
+OUTPUT_COMMAND = f'"{sys.executable}" -c "print((\'x\' * 99 + \'\\n\') * 100000)"'
+
+
+def drain(events: queue.Queue) -> int:
+    count = 0
+    while True:
+        try:
+            events.get_nowait()
+        except queue.Empty:
+            return count
+        count += 1
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="执行引擎基准测试")
+    add_arguments(parser)
+    parser.add_argument("--commands", type=int, default=20, help="每轮执行的命令数")
+    args = parser.parse_args(argv)
+
+    events = queue.Queue()
+    engine = executor.CommandExecutor(events)
+    number = args.commands
+
+    suite = Suite("executor", args)
+    print("每条命令的耗时:", flush=True)
+    suite.bench(
+        "subprocess.run",
+        lambda: subprocess.run(NOOP, shell=True, stdout=subprocess.PIPE),
+        number=number,
+    )
+
+    def execute():
+        engine.execute(engine.create_job(NOOP))
+        drain(events)
+
+    suite.bench("execute", execute, number=number)
+
+    def submit():
+        engine.submit(NOOP).done.wait()
+        drain(events)
+
+    suite.bench("submit", submit, number=number)
+
+    def batch():
+        commands = [(str(i), NOOP, None) for i in range(number)]
+        engine.submit_batch(commands, executor.POLICY_PARALLEL).done.wait()
+        drain(events)
+
+    suite.bench("submit_batch(parallel)", batch, items=number)
+
+    def lazy_batch():
+        commands = ((str(i), NOOP, None) for i in range(number))
+        engine.submit_lazy_batch(commands, executor.POLICY_PARALLEL).done.wait()
+        drain(events)
+
+    suite.bench("submit_lazy_batch(parallel)", lazy_batch, items=number)
+
+    def output():
+        engine.execute(engine.create_job(OUTPUT_COMMAND))
+        drain(events)
+
+    suite.bench("execute(10MB output)", output)
+
+    results = suite.results
+    if "execute" in results and "subprocess.run" in results:
+        overhead = results["execute"]["min"] - results["subprocess.run"]["min"]
+        print(f"每条命令的额外开销约 {overhead * 1000:.2f}ms")
+    return suite.report()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
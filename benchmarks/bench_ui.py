@@ -0,0 +1,122 @@
+"""
+界面的基准测试：CmdManager.load_commands 和 Treeview 的填充(render_commands)。
+没有DISPLAY时在Xvfb虚拟显示中运行(Linux，需要安装Xvfb)；需要界面的全部依赖
+
+    python benchmarks/bench_ui.py [--sizes 1k,100k] [--save]
+"""
+
+import argparse
+import importlib
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+# harness把项目根目录加入sys.path
+from harness import ROOT, Suite, add_arguments, parse_sizes
+from command import Command
+from dbservice import DBService
+
+XVFB_DISPLAY = ":99"
+
+
+def start_xvfb() -> subprocess.Popen | None:
+    """没有显示时启动Xvfb，返回其进程；已有显示时返回None"""
+    if os.environ.get("DISPLAY") or os.name == "nt" or sys.platform == "darwin":
+        return None
+    xvfb = shutil.which("Xvfb")
+    if xvfb is None:
+        raise RuntimeError("没有DISPLAY，也没有找到Xvfb")
+    process = subprocess.Popen(
+        [xvfb, XVFB_DISPLAY, "-screen", "0", "1280x1024x24", "-nolisten", "tcp"],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    socket_path = f"/tmp/.X11-unix/X{XVFB_DISPLAY[1:]}"
+    deadline = time.monotonic() + 5
+    while not os.path.exists(socket_path):
+        if process.poll() is not None or time.monotonic() > deadline:
+            process.kill()
+            raise RuntimeError("Xvfb启动失败")
+        time.sleep(0.05)
+    os.environ["DISPLAY"] = XVFB_DISPLAY
+    return process
+
+
+def bench_size(suite: Suite, size: int):
+    import tkinter as tk
+    from main import CmdManager
+
+    label = f"{size // 1000}k" if size < 1000_000 else f"{size // 1000_000}m"
+    db_service = DBService("commands.db")
+    commands = [Command(f"cmd{i}", f"echo {i}", f"备注 {i}") for i in range(size)]
+    db_service.bulk_save_commands(commands)
+    db_service.close()
+
+    root = tk.Tk()
+    start = time.perf_counter()
+    app = CmdManager(root)
+    root.update()
+    suite.record(f"{label}/CmdManager()", [time.perf_counter() - start])
+    try:
+
+        def load():
+            app.load_commands()
+            root.update()
+
+        suite.bench(f"{label}/load_commands", load)
+        # 超过阈值时使用虚拟列表，不会一次填充更多的行
+        rows = commands[: app.virtual_list_threshold]
+
+        def render():
+            app.render_commands(rows)
+            root.update()
+
+        suite.bench(f"{label}/render_commands({len(rows)})", render)
+    finally:
+        app.scheduler.stop()
+        app.tray_icon.stop()
+        root.destroy()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="界面基准测试")
+    add_arguments(parser)
+    parser.add_argument("--sizes", default="1k,100k", help="数据量，如 1k,100k")
+    args = parser.parse_args(argv)
+
+    try:
+        xvfb = start_xvfb()
+    except RuntimeError as e:
+        print(f"跳过界面基准测试: {e}")
+        return 0
+    suite = Suite("ui", args)
+    cwd = os.getcwd()
+    try:
+        try:
+            # pystray在导入时按DISPLAY选择后端，因此在启动Xvfb之后才导入
+            importlib.import_module("main")
+        except ImportError as e:
+            print(f"跳过界面基准测试: {e}")
+            return 0
+        for size in parse_sizes(args.sizes):
+            print(f"{size} 条命令:", flush=True)
+            # CmdManager使用当前目录下的数据库和图标
+            with tempfile.TemporaryDirectory() as tmp:
+                shutil.copy(os.path.join(ROOT, "app.ico"), tmp)
+                os.chdir(tmp)
+                try:
+                    bench_size(suite, size)
+                finally:
+                    os.chdir(cwd)
+    finally:
+        if xvfb is not None:
+            xvfb.terminate()
+            xvfb.wait()
+    return suite.report()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,151 @@
+"""
+基准测试的公共部分：计时、输出结果，以及与JSON基线比较
+
+每个基准脚本建立一个Suite，用bench()逐项计时，最后调用report()：
+结果与 baselines/<套件名>.json 比较，最短耗时比基线慢超过阈值(默认25%)
+的项目视为退化，返回1；加 --save 时把本次结果写为新的基线
+"""
+
+import argparse
+from collections.abc import Callable
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines")
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--repeat", type=int, default=5, help="每项重复次数")
+    parser.add_argument("--save", action="store_true", help="把结果保存为基线")
+    parser.add_argument("--baseline-dir", default=BASELINE_DIR)
+    parser.add_argument(
+        "--threshold", type=float, default=0.25, help="视为退化的变慢比例"
+    )
+    parser.add_argument("--filter", default="", help="只运行名称包含该文本的项目")
+
+
+def parse_sizes(text: str) -> list[int]:
+    """逗号分隔的数据量，支持k/m后缀，如 1k,100k,1m"""
+    sizes = []
+    for part in text.split(","):
+        part = part.strip().lower()
+        scale = {"k": 1000, "m": 1000_000}.get(part[-1:], 1)
+        sizes.append(int(part.rstrip("km")) * scale)
+    return sizes
+
+
+def format_seconds(seconds: float) -> str:
+    if seconds < 1e-3:
+        return f"{seconds * 1e6:.1f}us"
+    if seconds < 1:
+        return f"{seconds * 1e3:.2f}ms"
+    return f"{seconds:.2f}s"
+
+
+class Suite:
+    def __init__(self, name: str, args: argparse.Namespace):
+        self.name = name
+        self.args = args
+        # {项目: {"min": 秒, "median": 秒, "number": 每轮次数}}，时间为单次操作
+        self.results = dict[str, dict]()
+
+    def bench(
+        self,
+        name: str,
+        func: Callable[[], object],
+        number: int = 1,
+        repeat: int | None = None,
+        setup: Callable[[], object] | None = None,
+        items: int = 1,
+    ):
+        """
+        计时func单次调用的耗时：重复repeat轮，每轮调用number次
+        :param setup: 每轮开始前调用，不计入耗时
+        :param items: 每次调用处理的条数，结果为每条的耗时
+        """
+        if self.args.filter not in name:
+            return
+        times = []
+        for _ in range(repeat or self.args.repeat):
+            if setup is not None:
+                setup()
+            start = time.perf_counter()
+            for _ in range(number):
+                func()
+            times.append((time.perf_counter() - start) / number / items)
+        self.record(name, times, number)
+
+    def record(self, name: str, times: list[float], number: int = 1):
+        """记录在别处计时的结果(每项为单次操作的秒数)"""
+        if self.args.filter not in name:
+            return
+        result = {
+            "min": min(times),
+            "median": statistics.median(times),
+            "number": number,
+        }
+        self.results[name] = result
+        print(
+            f"  {name:<48} 最短 {format_seconds(result['min']):>10}  "
+            f"中位数 {format_seconds(result['median']):>10}",
+            flush=True,
+        )
+
+    @property
+    def baseline_path(self) -> str:
+        return os.path.join(self.args.baseline_dir, f"{self.name}.json")
+
+    def load_baseline(self) -> dict | None:
+        try:
+            with open(self.baseline_path, encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def save_baseline(self):
+        os.makedirs(self.args.baseline_dir, exist_ok=True)
+        data = {
+            "suite": self.name,
+            "created_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "machine": platform.node(),
+            "results": self.results,
+        }
+        with open(self.baseline_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        print(f"基线已保存: {self.baseline_path}")
+
+    def report(self) -> int:
+        """与基线比较，有退化时返回1"""
+        baseline = self.load_baseline()
+        regressions = []
+        if baseline is None:
+            print(f"没有基线 {self.baseline_path}，使用 --save 保存")
+        else:
+            if baseline.get("machine") != platform.node():
+                print(f"注意: 基线来自其他机器({baseline.get('machine')})")
+            print(f"与基线({baseline.get('created_at')})比较:")
+            for name, result in self.results.items():
+                old = baseline["results"].get(name)
+                if old is None:
+                    continue
+                change = result["min"] / old["min"] - 1 if old["min"] else 0.0
+                mark = ""
+                if change > self.args.threshold:
+                    mark = "  <-- 退化"
+                    regressions.append(name)
+                print(f"  {name:<48} {change:+7.1%}{mark}")
+        if self.args.save:
+            self.save_baseline()
+        if regressions:
+            print(f"{len(regressions)} 项慢于基线超过 {self.args.threshold:.0%}")
+            return 1
+        return 0
@@ -0,0 +1,40 @@
+"""
+依次运行全部基准测试(每个套件在独立的进程中)，任一套件退化时返回1
+
+    python benchmarks/run.py [--save] [--repeat 次数] [--threshold 比例]
+
+数据量等套件自己的参数需单独运行该套件，如
+    python benchmarks/bench_db.py --sizes 1k,100k,1m
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+from harness import add_arguments
+
+SUITES = ("bench_command.py", "bench_db.py", "bench_executor.py", "bench_ui.py")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="运行全部基准测试")
+    add_arguments(parser)
+    parser.parse_args(argv)
+
+    argv = sys.argv[1:] if argv is None else argv
+    here = os.path.dirname(os.path.abspath(__file__))
+    failed = []
+    for script in SUITES:
+        print(f"== {script}", flush=True)
+        result = subprocess.run([sys.executable, os.path.join(here, script), *argv])
+        if result.returncode:
+            failed.append(script)
+    if failed:
+        print(f"退化或失败: {', '.join(failed)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,107 @@
+"""
+命令行(cmdmanager.py)冷启动回归检查：
+
+- 用 python -X importtime 检查启动时没有导入界面相关的模块，并列出最慢的导入
+- 多次启动 `cmdmanager.py list --limit 0`，最短耗时超过预算(默认50ms)时返回1
+
+    python benchmarks/startup.py [--budget 毫秒] [--runs 次数]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from command import Command  # noqa: E402
+from dbservice import DBService  # noqa: E402
+
+CLI = os.path.join(ROOT, "cmdmanager.py")
+# 启动时不允许导入的模块
+FORBIDDEN_MODULES = ("tkinter", "pystray", "PIL", "argparse", "executor", "tracing")
+
+
+def run_times(args: list[str], runs: int, env) -> list[float]:
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(args, env=env, check=True, stdout=subprocess.DEVNULL)
+        times.append(time.perf_counter() - start)
+    return sorted(times)
+
+
+def parse_importtime(stderr: str) -> list[tuple[str, int, int]]:
+    """解析 -X importtime 输出: [(模块, 自身微秒, 累计微秒)]"""
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|", 2)
+        # 保留名称前的缩进，缩进表示被其他模块导入
+        imports.append((name[1:].rstrip(), int(self_us), int(cumulative_us)))
+    return imports
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="命令行冷启动回归检查")
+    parser.add_argument("--budget", type=float, default=50.0, help="预算(ms)")
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--commands", type=int, default=1000, help="数据库中的命令数")
+    args = parser.parse_args(argv)
+
+    # 确保写入.pyc，否则测到的是编译时间
+    env = dict(os.environ)
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_name = os.path.join(tmp, "startup.db")
+        db_service = DBService(db_name)
+        db_service.bulk_save_commands(
+            [Command(f"cmd{i}", f"echo {i}") for i in range(args.commands)]
+        )
+        db_service.close()
+
+        cli_args = [sys.executable, CLI, "--db", db_name, "list", "--limit", "0"]
+        subprocess.run(cli_args, env=env, check=True)  # 预热，生成.pyc
+
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", *cli_args[1:]],
+            env=env,
+            check=True,
+            capture_output=True,
+            text=True,
+        )
+        imports = parse_importtime(result.stderr)
+        baseline = run_times([sys.executable, "-c", "pass"], args.runs, env)
+        times = run_times(cli_args, args.runs, env)
+
+    print("最慢的导入(累计, 微秒):")
+    top_level = [item for item in imports if not item[0].startswith(" ")]
+    for name, _, cumulative in sorted(top_level, key=lambda x: -x[2])[:10]:
+        print(f"  {cumulative:8d}  {name}")
+
+    failed = False
+    loaded = {name.strip() for name, _, _ in imports}
+    forbidden = [m for m in loaded if m.split(".")[0] in FORBIDDEN_MODULES]
+    if forbidden:
+        print(f"启动时导入了不应导入的模块: {', '.join(sorted(forbidden))}")
+        failed = True
+
+    best, median = times[0] * 1000, times[len(times) // 2] * 1000
+    print(
+        f"python -c pass: 最短 {baseline[0] * 1000:.1f}ms\n"
+        f"cmdmanager list: 最短 {best:.1f}ms, 中位数 {median:.1f}ms, "
+        f"预算 {args.budget:.0f}ms"
+    )
+    if best > args.budget:
+        print("冷启动超出预算")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
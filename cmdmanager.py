@@ -0,0 +1,290 @@
+"""
+命令行入口：不加载Tk、pystray、PIL，供脚本和快捷键频繁调用
+
+用法: python cmdmanager.py [--db 数据库文件] <子命令> ...
+
+    list [--tag 标签 ...] [--any] [--limit N]    按常用度列出命令
+    run <名称|id> [--no-record]                  执行命令
+        [--set 参数=值 ...]                      模板命令的参数
+        [--timeout 秒]                           超时(默认为命令设置的超时)
+    search <关键词> [--limit N]                  搜索命令
+    add <名称> <命令> [--notes 备注] [--tag 标签 ...]
+        [--template]                             启用模板参数 {{参数名}}
+    import <文件> [--format jsonl|csv] [--on-duplicate skip|overwrite|keep_both]
+    export <文件> [--format jsonl|csv]
+"""
+
+import sys
+from command import Command
+from dbservice import DBService, DUPLICATE_MODES, DUPLICATE_SKIP
+
+# 退出码
+EXIT_USAGE = 2
+EXIT_NOT_FOUND = 3
+EXIT_AMBIGUOUS = 4
+# 与coreutils的timeout相同
+EXIT_TIMEOUT = 124
+
+FORMATS = ("jsonl", "csv")
+# 各子命令的位置参数、选项及默认值；选项类型：
+# flag 开关，value 字符串，int 整数，float 数字，multi 可指定多次
+COMMANDS = {
+    "list": (
+        (),
+        {"--tag": "multi", "--any": "flag", "--limit": "int"},
+        {"tag": [], "any": False, "limit": -1},
+    ),
+    "run": (
+        ("target",),
+        {"--no-record": "flag", "--set": "multi", "--timeout": "float"},
+        {"no_record": False, "set": [], "timeout": None},
+    ),
+    "search": (("text",), {"--limit": "int"}, {"limit": 50}),
+    "add": (
+        ("name", "command"),
+        {"--notes": "value", "--tag": "multi", "--template": "flag"},
+        {"notes": None, "tag": [], "template": False},
+    ),
+    "import": (
+        ("path",),
+        {"--format": "value", "--on-duplicate": "value"},
+        {"format": None, "on_duplicate": DUPLICATE_SKIP},
+    ),
+    "export": (("path",), {"--format": "value"}, {"format": None}),
+}
+CHOICES = {"format": FORMATS, "on_duplicate": DUPLICATE_MODES}
+
+
+class UsageError(Exception):
+    pass
+
+
+def parse_args(argv: list[str]) -> dict:
+    """
+    解析命令行参数。这里没有使用argparse：
+    导入argparse(及其依赖的re、gettext等)并构建解析器约占冷启动时间的一半
+    """
+    args = {"db": "commands.db", "action": None}
+    options = {"--db": "value"}
+    positionals = ()
+    values = []
+    it = iter(argv)
+    for arg in it:
+        if arg in ("-h", "--help"):
+            raise UsageError()
+        if not arg.startswith("--"):
+            if args["action"] is None:
+                if arg not in COMMANDS:
+                    raise UsageError(f"未知的子命令: {arg}")
+                positionals, more, defaults = COMMANDS[arg]
+                args["action"] = arg
+                args.update(defaults)
+                options = options | more
+            else:
+                values.append(arg)
+            continue
+
+        name, has_value, value = arg.partition("=")
+        kind = options.get(name)
+        if kind is None:
+            raise UsageError(f"未知的选项: {name}")
+        key = name[2:].replace("-", "_")
+        if kind == "flag":
+            args[key] = True
+            continue
+        if not has_value:
+            value = next(it, None)
+            if value is None:
+                raise UsageError(f"选项 {name} 需要参数")
+        if kind == "int":
+            try:
+                value = int(value)
+            except ValueError:
+                raise UsageError(f"选项 {name} 需要整数")
+        elif kind == "float":
+            try:
+                value = float(value)
+            except ValueError:
+                raise UsageError(f"选项 {name} 需要数字")
+        if key in CHOICES and value not in CHOICES[key]:
+            raise UsageError(f"选项 {name} 只能是: {', '.join(CHOICES[key])}")
+        if kind == "multi":
+            args[key] = args[key] + [value]
+        else:
+            args[key] = value
+
+    if args["action"] is None:
+        raise UsageError("缺少子命令")
+    if len(values) != len(positionals):
+        raise UsageError(f"{args['action']} 需要参数: {' '.join(positionals)}")
+    args.update(zip(positionals, values))
+    return args
+
+
+def print_command(cmd: Command):
+    print(f"{cmd.id}\t{cmd.name}\t{cmd.command}")
+
+
+def resolve_command(db_service: DBService, target: str) -> list[Command]:
+    """按id或名称查找命令"""
+    if target.isdigit():
+        cmd = db_service.get_command(int(target))
+        if cmd is not None:
+            return [cmd]
+    return db_service.get_commands_by_name(target)
+
+
+def cmd_list(db_service: DBService, args: dict) -> int:
+    if args["tag"]:
+        commands = db_service.get_commands_by_tags(
+            args["tag"], match_all=not args["any"], limit=args["limit"]
+        )
+    else:
+        commands = db_service.get_commands(args["limit"])
+    for cmd in commands:
+        print_command(cmd)
+    return 0
+
+
+def cmd_search(db_service: DBService, args: dict) -> int:
+    for cmd, _ in db_service.search_commands(args["text"], args["limit"]):
+        print_command(cmd)
+    return 0
+
+
+def cmd_add(db_service: DBService, args: dict) -> int:
+    if args["template"]:
+        # 模板解析用到re，只在需要时才导入
+        from template import TemplateError, check_template
+
+        try:
+            names = check_template(args["command"])
+        except TemplateError as e:
+            print(e, file=sys.stderr)
+            return EXIT_USAGE
+        print(f"模板参数: {', '.join(names)}", file=sys.stderr)
+    with db_service.transaction():
+        cmd = db_service.save_command(
+            Command(args["name"], args["command"], args["notes"])
+        )
+        if args["tag"]:
+            db_service.set_command_tags(cmd.id, args["tag"])
+        if args["template"]:
+            db_service.set_command_template(cmd.id, True)
+    print(cmd.id)
+    return 0
+
+
+def cmd_run(db_service: DBService, args: dict) -> int:
+    target = args["target"]
+    matches = resolve_command(db_service, target)
+    if not matches:
+        print(f"没有找到命令: {target}", file=sys.stderr)
+        return EXIT_NOT_FOUND
+    if len(matches) > 1:
+        print(f"有多条命令名为 {target}，请使用id:", file=sys.stderr)
+        for cmd in matches:
+            print_command(cmd)
+        return EXIT_AMBIGUOUS
+
+    cmd = matches[0]
+    command = cmd.command
+    if db_service.get_template_ids([cmd.id]):
+        from template import TemplateError, parse_template
+
+        values = dict(item.partition("=")[::2] for item in args["set"])
+        try:
+            command = parse_template(command).render(values)
+        except TemplateError as e:
+            print(f"{e}，请使用 --set 参数=值", file=sys.stderr)
+            return EXIT_USAGE
+
+    # 执行引擎只在执行时才导入
+    import executor
+
+    timeout = args["timeout"]
+    if timeout is None:
+        timeout = db_service.get_command_timeouts([cmd.id]).get(cmd.id)
+    engine = executor.CommandExecutor()
+    job = engine.submit(command, cmd.name, cmd.id, timeout)
+    try:
+        while True:
+            kind, _, data = engine.events.get()
+            if kind == executor.EVENT_STDOUT:
+                sys.stdout.write(data)
+                sys.stdout.flush()
+            elif kind in (executor.EVENT_STDERR, executor.EVENT_ERROR):
+                sys.stderr.write(data)
+                sys.stderr.flush()
+            elif kind == executor.EVENT_EXIT:
+                break
+    except KeyboardInterrupt:
+        engine.cancel(job)
+        job.done.wait()
+
+    if not args["no_record"]:
+        db_service.record_execution(job)
+    if job.timed_out:
+        print(f"执行超时({job.timeout:g}s)，已结束", file=sys.stderr)
+        return EXIT_TIMEOUT
+    if job.error is not None or job.cancelled:
+        return 1
+    return job.returncode or 0
+
+
+def cmd_import(db_service: DBService, args: dict) -> int:
+    import transfer
+
+    result = transfer.import_commands(
+        db_service, args["path"], args["format"], args["on_duplicate"]
+    )
+    print(
+        f"导入完成: 共{result.total}条, 新增{result.inserted}, "
+        f"覆盖{result.overwritten}, 跳过{result.skipped}"
+    )
+    return 0
+
+
+def cmd_export(db_service: DBService, args: dict) -> int:
+    import transfer
+
+    count = transfer.export_commands(db_service, args["path"], args["format"])
+    print(f"导出完成: {count} 条")
+    return 0
+
+
+HANDLERS = {
+    "list": cmd_list,
+    "run": cmd_run,
+    "search": cmd_search,
+    "add": cmd_add,
+    "import": cmd_import,
+    "export": cmd_export,
+}
+
+
+def main(argv=None) -> int:
+    try:
+        args = parse_args(sys.argv[1:] if argv is None else argv)
+    except UsageError as e:
+        if e.args:
+            print(f"错误: {e.args[0]}\n", file=sys.stderr)
+        print(__doc__.strip(), file=sys.stderr)
+        return EXIT_USAGE if e.args else 0
+
+    try:
+        db_service = DBService(args["db"])
+    except Exception as e:
+        print(str(e), file=sys.stderr)
+        return 1
+    try:
+        return HANDLERS[args["action"]](db_service, args)
+    except BrokenPipeError:
+        # 输出被管道提前关闭(如 | head)
+        return 0
+    finally:
+        db_service.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,7 +1,6 @@
-from typing import override
-
-
 class Command:
+    # 界面、索引和搜索结果中可能同时有大量命令对象
+    __slots__ = ("id", "name", "command", "notes")
 
     def __init__(self, name="", command="", notes=None, id=None):
         self.id = id
@@ -9,7 +8,6 @@ class Command:
         self.command = command
         self.notes = notes
 
-    @override
     def __repr__(self) -> str:
         return f"Command(id={self.id}, name={self.name}, command={self.command}, notes={self.notes})"
 
@@ -0,0 +1,114 @@
+from collections.abc import Callable
+from command import Command
+
+# 可在列表中直接编辑的字段
+EDITABLE_FIELDS = ("name", "command", "notes")
+
+
+class CommandStore:
+    """
+    界面中已加载命令的唯一数据源：每条命令只保存一个Command对象，
+    Treeview的行只是它的显示。维护 命令id→行 与 行→命令id 两个索引，
+    以及有未保存编辑的命令集合；编辑后通知监听者刷新显示。
+
+    虚拟列表滚动、文件夹重新加载时只清除行，有未保存编辑的命令仍然保留，
+    再次显示时使用编辑后的内容
+    """
+
+    def __init__(self):
+        self._commands = dict[int, Command]()
+        # 同一命令出现在多个标签下时对应多行
+        self._rows = dict[int, list[str]]()
+        self._row_ids = dict[str, int]()
+        self.dirty = set[int]()
+        self._listeners = list[Callable[[list[int]], None]]()
+
+    def add_listener(self, listener: Callable[[list[int]], None]):
+        """listener(命令id列表)：这些命令的内容变化了(编辑或保存后)"""
+        self._listeners.append(listener)
+
+    def _notify(self, command_ids: list[int]):
+        for listener in self._listeners:
+            listener(command_ids)
+
+    def __len__(self) -> int:
+        """当前有行显示的命令数"""
+        return len(self._rows)
+
+    def get(self, command_id: int) -> Command | None:
+        return self._commands.get(command_id)
+
+    def id_of(self, row_id: str) -> int | None:
+        return self._row_ids.get(row_id)
+
+    def command_at(self, row_id: str) -> Command | None:
+        command_id = self._row_ids.get(row_id)
+        return None if command_id is None else self._commands.get(command_id)
+
+    def rows_of(self, command_id: int) -> list[str]:
+        return self._rows.get(command_id, [])
+
+    def put(self, cmd: Command) -> Command:
+        """
+        加入从数据库读取的命令并返回应显示的版本：
+        有未保存的编辑时保留编辑后的对象，忽略读取到的内容
+        """
+        if cmd.id in self.dirty:
+            return self._commands[cmd.id]
+        self._commands[cmd.id] = cmd
+        return cmd
+
+    def add_row(self, row_id: str, command_id: int):
+        self._rows.setdefault(command_id, []).append(row_id)
+        self._row_ids[row_id] = command_id
+
+    def clear_rows(self):
+        """Treeview的行全部删除后调用，只保留有未保存编辑的命令"""
+        self._rows.clear()
+        self._row_ids.clear()
+        self._commands = {cid: self._commands[cid] for cid in self.dirty}
+
+    def clear(self):
+        """清除全部内容，包括未保存的编辑"""
+        self.dirty.clear()
+        self.clear_rows()
+
+    def edit(self, command_id: int, field: str, value: str):
+        """修改已加载命令的一个字段，保存前只记录在这里"""
+        if field not in EDITABLE_FIELDS:
+            raise ValueError(f"不可编辑的字段: {field}")
+        cmd = self._commands[command_id]
+        if getattr(cmd, field) == value:
+            return
+        if command_id not in self.dirty:
+            # 复制一份，不修改数据库读取的对象(可能还被搜索结果等引用)
+            cmd = Command(cmd.name, cmd.command, cmd.notes, cmd.id)
+            self._commands[command_id] = cmd
+            self.dirty.add(command_id)
+        setattr(cmd, field, value)
+        self._notify([command_id])
+
+    def dirty_commands(self) -> list[Command]:
+        return [self._commands[cid] for cid in self.dirty]
+
+    def update(self, commands: list[Command]):
+        """数据库中的命令已修改：替换已加载的版本并丢弃这些命令的未保存编辑"""
+        changed = []
+        for cmd in commands:
+            self.dirty.discard(cmd.id)
+            if cmd.id in self._rows:
+                self._commands[cmd.id] = cmd
+                changed.append(cmd.id)
+            else:
+                self._commands.pop(cmd.id, None)
+        if changed:
+            self._notify(changed)
+
+    def remove(self, command_id: int) -> list[str]:
+        """数据库中的命令已删除，返回它对应的行"""
+        self.dirty.discard(command_id)
+        self._commands.pop(command_id, None)
+        rows = self._rows.pop(command_id, [])
+        for row_id in rows:
+            del self._row_ids[row_id]
+        return rows
@@ -0,0 +1,114 @@
+import tkinter as tk
+from tkinter import ttk
+
+
+class OutputConsole(ttk.Frame):
+    """
+    有容量上限的输出控制台：
+    - 超过行数/字符数上限时淘汰最早的内容(环形缓冲)
+    - 每帧最多一次写入，合并期间的所有输出
+    - 仅当用户已停留在底部时自动滚动
+    """
+
+    def __init__(
+        self,
+        master,
+        max_lines: int = 5000,
+        max_chars: int = 2 * 1024 * 1024,
+        flush_interval: int = 16,
+        **text_options,
+    ):
+        super().__init__(master)
+        self.max_lines = max_lines
+        self.max_chars = max_chars
+        self.flush_interval = flush_interval
+
+        scrollbar = ttk.Scrollbar(self)
+        scrollbar.pack(side="right", fill="y")
+        self.text = tk.Text(self, yscrollcommand=scrollbar.set, **text_options)
+        self.text.pack(side="left", fill=tk.BOTH, expand=True)
+        scrollbar.config(command=self.text.yview)
+
+        self._pending = list[tuple[str, str]]()
+        self._pending_chars = 0
+        self._chars = 0
+        self._flush_id = None
+
+    def tag_config(self, tag_name, **options):
+        self.text.tag_config(tag_name, **options)
+
+    def write(self, text: str, tag: str = ""):
+        """写入输出(仅缓存，下一帧统一刷新到界面)，只能在Tk线程调用"""
+        if not text:
+            return
+        if self._pending and self._pending[-1][1] == tag:
+            self._pending[-1] = (self._pending[-1][0] + text, tag)
+        else:
+            self._pending.append((text, tag))
+        self._pending_chars += len(text)
+        if self._pending_chars > self.max_chars:
+            self._trim_pending()
+
+        if self._flush_id is None:
+            self._flush_id = self.after(self.flush_interval, self.flush)
+
+    def flush(self):
+        """将缓存的输出一次性写入Text"""
+        self._flush_id = None
+        if not self._pending:
+            return
+
+        at_bottom = self.text.yview()[1] >= 0.999
+        args = []
+        for text, tag in self._pending:
+            args += (text, tag)
+        self.text.insert(tk.END, *args)
+        self._chars += self._pending_chars
+        self._pending.clear()
+        self._pending_chars = 0
+
+        self._evict()
+        if at_bottom:
+            self.text.see(tk.END)
+
+    def clear(self):
+        self._pending.clear()
+        self._pending_chars = 0
+        self._chars = 0
+        self.text.delete("1.0", tk.END)
+
+    def _trim_pending(self):
+        """刷新前的缓存也不超过字符上限，只保留最新的内容"""
+        excess = self._pending_chars - self.max_chars
+        while excess > 0 and self._pending:
+            text, tag = self._pending[0]
+            if len(text) <= excess:
+                self._pending.pop(0)
+                excess -= len(text)
+                self._pending_chars -= len(text)
+            else:
+                self._pending[0] = (text[excess:], tag)
+                self._pending_chars -= excess
+                excess = 0
+
+    def _evict(self):
+        """按行数、字符数上限淘汰最早的内容"""
+        lines = int(self.text.index("end-1c").split(".")[0])
+        if lines > self.max_lines:
+            end = f"{lines - self.max_lines + 1}.0"
+            self._chars -= self._count_chars("1.0", end)
+            self.text.delete("1.0", end)
+
+        if self._chars > self.max_chars:
+            # 删除到超出部分所在行的行尾，避免留下半行
+            excess = self._chars - self.max_chars
+            end = self.text.index(f"1.0 + {excess} chars lineend +1c")
+            self._chars -= self._count_chars("1.0", end)
+            self.text.delete("1.0", end)
+            self._chars = max(self._chars, 0)
+
+    def _count_chars(self, start: str, end: str) -> int:
+        count = self.text.count(start, end, "chars")
+        if isinstance(count, tuple):
+            return count[0]
+        return count or 0
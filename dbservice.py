@@ -1,38 +1,375 @@
+from contextlib import contextmanager
+import math
 import sqlite3
 from command import Command
 
+# 批量写入时遇到重复命令(命令内容相同)的处理方式
+DUPLICATE_SKIP = "skip"  # 跳过
+DUPLICATE_OVERWRITE = "overwrite"  # 覆盖已有命令的名称和备注
+DUPLICATE_KEEP_BOTH = "keep_both"  # 两者都保留
+DUPLICATE_MODES = (DUPLICATE_SKIP, DUPLICATE_OVERWRITE, DUPLICATE_KEEP_BOTH)
+
+# 单条SQL中IN(...)参数的数量上限
+MAX_SQL_PARAMS = 900
+
+# 常用度(frecency)的半衰期(秒)：一次执行的权重每隔这么久减半
+FRECENCY_HALF_LIFE = 14 * 24 * 3600
+
+
+def frecency_add(score: float | None, timestamp: float) -> float:
+    """
+    在常用度上累加一次执行。常用度以对数形式保存:
+    log2(Σ 2^(执行时间/半衰期))，所有命令的衰减因子相同，
+    因此直接按保存的值排序即等价于按当前衰减后的分数排序，无需随时间重算
+    """
+    x = timestamp / FRECENCY_HALF_LIFE
+    if score is None:
+        return x
+    high, low = max(score, x), min(score, x)
+    return high + math.log2(1 + 2 ** (low - high))
+
+
+def frecency_value(score: float | None, now: float) -> float:
+    """常用度在now时刻衰减后的值，约等于近期的执行次数"""
+    if score is None:
+        return 0.0
+    return 2 ** (score - now / FRECENCY_HALF_LIFE)
+
 
 class DBService:
+    # 搜索结果中高亮匹配内容的标记
+    highlight_open = "【"
+    highlight_close = "】"
+    # 连接参数：WAL下读写互不阻塞，synchronous=NORMAL时提交不再每次fsync
+    pragmas = (
+        ("journal_mode", "WAL"),
+        ("synchronous", "NORMAL"),
+        ("cache_size", -16 * 1024),  # 负数单位为KB，即16MB
+        ("mmap_size", 64 * 1024 * 1024),
+        ("temp_store", "MEMORY"),
+        ("busy_timeout", 5000),
+        ("foreign_keys", "ON"),
+    )
+
     def __init__(self, db_name="commands.db"):
         self.db_name = db_name
         self.conn = None
         self.cursor = None
+        self.fts_enabled = False
+        # 数据变更回调 listener(inserted, updated, deleted_ids)，在写入线程中调用
+        self.change_listeners = []
+        # 事务嵌套深度及事务中暂存的变更通知
+        self._tx_depth = 0
+        self._pending_changes = []
         self.init_db()
 
     def init_db(self):
         try:
             self.conn = sqlite3.connect(self.db_name)
             self.cursor = self.conn.cursor()
+            for name, value in self.pragmas:
+                self.cursor.execute(f"PRAGMA {name}={value}")
+            self.migrate()
             self.cursor.execute(
-                """CREATE TABLE IF NOT EXISTS commands
-                             (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                             name TEXT NOT NULL,
-                             command TEXT NOT NULL,
-                             notes TEXT)"""
+                "SELECT 1 FROM sqlite_master WHERE type='table' AND name='commands_fts'"
             )
-            self.conn.commit()
+            self.fts_enabled = self.cursor.fetchone() is not None
         except Exception as e:
             raise Exception(f"无法初始化数据库: {str(e)}")
 
+    def migrations(self):
+        """数据库迁移，按 PRAGMA user_version 记录已执行到的版本"""
+        return [
+            (1, self._migrate_commands),
+            (2, self._migrate_fts),
+            (3, self._migrate_command_indexes),
+            (4, self._migrate_executions),
+            (5, self._migrate_command_usage),
+            (6, self._migrate_tags),
+            (7, self._migrate_result_cache),
+            (8, self._migrate_execution_resources),
+            (9, self._migrate_command_timeouts),
+            (10, self._migrate_execution_logs),
+            (11, self._migrate_schedules),
+            (12, self._migrate_command_templates),
+        ]
+
+    def migrate(self):
+        self.cursor.execute("PRAGMA user_version")
+        version = self.cursor.fetchone()[0]
+        for target, migration in self.migrations():
+            if version >= target:
+                continue
+            with self.transaction():
+                migration()
+                self.cursor.execute(f"PRAGMA user_version={target}")
+            version = target
+
+    def _migrate_commands(self):
+        self.cursor.execute(
+            """CREATE TABLE IF NOT EXISTS commands
+                         (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                         name TEXT NOT NULL,
+                         command TEXT NOT NULL,
+                         notes TEXT)"""
+        )
+
+    def _migrate_fts(self):
+        """创建FTS5全文索引及同步触发器，SQLite不支持FTS5时跳过，搜索退化为LIKE"""
+        try:
+            self.cursor.execute(
+                """CREATE VIRTUAL TABLE IF NOT EXISTS commands_fts USING fts5(
+                    name, command, notes,
+                    content='commands', content_rowid='id',
+                    tokenize='unicode61', prefix='2 3'
+                )"""
+            )
+        except sqlite3.OperationalError:
+            return
+
+        self.cursor.execute(
+            """CREATE TRIGGER IF NOT EXISTS commands_fts_ai AFTER INSERT ON commands
+            BEGIN
+                INSERT INTO commands_fts(rowid, name, command, notes)
+                VALUES (new.id, new.name, new.command, new.notes);
+            END"""
+        )
+        self.cursor.execute(
+            """CREATE TRIGGER IF NOT EXISTS commands_fts_ad AFTER DELETE ON commands
+            BEGIN
+                INSERT INTO commands_fts(commands_fts, rowid, name, command, notes)
+                VALUES ('delete', old.id, old.name, old.command, old.notes);
+            END"""
+        )
+        self.cursor.execute(
+            """CREATE TRIGGER IF NOT EXISTS commands_fts_au AFTER UPDATE ON commands
+            BEGIN
+                INSERT INTO commands_fts(commands_fts, rowid, name, command, notes)
+                VALUES ('delete', old.id, old.name, old.command, old.notes);
+                INSERT INTO commands_fts(rowid, name, command, notes)
+                VALUES (new.id, new.name, new.command, new.notes);
+            END"""
+        )
+        # 为已有数据建立索引
+        self.cursor.execute("INSERT INTO commands_fts(commands_fts) VALUES('rebuild')")
+
+    def _migrate_command_indexes(self):
+        # 按名称查找/排序，按命令内容判重
+        self.cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_commands_name ON commands(name)"
+        )
+        self.cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_commands_command ON commands(command)"
+        )
+
+    def _migrate_executions(self):
+        """命令执行记录"""
+        self.cursor.execute(
+            """CREATE TABLE IF NOT EXISTS executions
+                         (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                         command_id INTEGER REFERENCES commands(id) ON DELETE SET NULL,
+                         command TEXT NOT NULL,
+                         started_at REAL NOT NULL,
+                         ended_at REAL,
+                         duration REAL,
+                         exit_code INTEGER,
+                         status TEXT NOT NULL,
+                         stdout_bytes INTEGER NOT NULL DEFAULT 0,
+                         stderr_bytes INTEGER NOT NULL DEFAULT 0)"""
+        )
+        self.cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_executions_command "
+            "ON executions(command_id, started_at)"
+        )
+        self.cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_executions_started "
+            "ON executions(started_at)"
+        )
+
+    def _migrate_command_usage(self):
+        """
+        命令的常用度，每次执行时增量更新；单独建表，
+        避免更新commands表时触发全文索引的同步
+        """
+        self.cursor.execute(
+            """CREATE TABLE IF NOT EXISTS command_usage
+                         (command_id INTEGER PRIMARY KEY
+                            REFERENCES commands(id) ON DELETE CASCADE,
+                         frecency REAL NOT NULL,
+                         use_count INTEGER NOT NULL DEFAULT 0,
+                         last_used REAL NOT NULL)"""
+        )
+        self.cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_command_usage_frecency "
+            "ON command_usage(frecency DESC)"
+        )
+        # 由已有的执行记录计算初始值
+        self.cursor.execute(
+            "SELECT command_id, started_at FROM executions "
+            "WHERE command_id IS NOT NULL ORDER BY command_id, started_at"
+        )
+        usage = dict()
+        for command_id, started_at in self.cursor.fetchall():
+            score, count, _ = usage.get(command_id, (None, 0, 0))
+            usage[command_id] = (frecency_add(score, started_at), count + 1, started_at)
+        self.cursor.executemany(
+            "INSERT INTO command_usage (command_id, frecency, use_count, last_used) "
+            "VALUES (?, ?, ?, ?)",
+            [(command_id, *values) for command_id, values in usage.items()],
+        )
+
+    def _migrate_tags(self):
+        """标签(文件夹)，与命令多对多"""
+        self.cursor.execute(
+            """CREATE TABLE IF NOT EXISTS tags
+                         (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                         name TEXT NOT NULL UNIQUE)"""
+        )
+        # 主键(command_id, tag_id)用于查命令的标签，反向索引用于按标签查命令
+        self.cursor.execute(
+            """CREATE TABLE IF NOT EXISTS command_tags
+                         (command_id INTEGER NOT NULL
+                            REFERENCES commands(id) ON DELETE CASCADE,
+                         tag_id INTEGER NOT NULL
+                            REFERENCES tags(id) ON DELETE CASCADE,
+                         PRIMARY KEY (command_id, tag_id)) WITHOUT ROWID"""
+        )
+        self.cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_command_tags_tag "
+            "ON command_tags(tag_id, command_id)"
+        )
+
+    def _migrate_result_cache(self):
+        """可缓存命令的缓存时间(秒)，及按LRU淘汰的执行结果缓存"""
+        self.cursor.execute(
+            """CREATE TABLE IF NOT EXISTS cache_policies
+                         (command_id INTEGER PRIMARY KEY
+                            REFERENCES commands(id) ON DELETE CASCADE,
+                         ttl REAL NOT NULL)"""
+        )
+        self.cursor.execute(
+            """CREATE TABLE IF NOT EXISTS result_cache
+                         (key TEXT PRIMARY KEY,
+                         command TEXT NOT NULL,
+                         output TEXT NOT NULL,
+                         returncode INTEGER,
+                         created_at REAL NOT NULL,
+                         last_used REAL NOT NULL,
+                         size INTEGER NOT NULL)"""
+        )
+        self.cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_result_cache_last_used "
+            "ON result_cache(last_used)"
+        )
+
+    def _migrate_execution_resources(self):
+        """执行记录的资源占用：CPU时间、峰值内存、读写字节数、子进程数"""
+        for column, kind in (
+            ("cpu_time", "REAL"),
+            ("peak_rss", "INTEGER"),
+            ("read_bytes", "INTEGER"),
+            ("write_bytes", "INTEGER"),
+            ("peak_children", "INTEGER"),
+        ):
+            self.cursor.execute(f"ALTER TABLE executions ADD COLUMN {column} {kind}")
+
+    def _migrate_command_timeouts(self):
+        """命令的执行超时(秒)"""
+        self.cursor.execute(
+            """CREATE TABLE IF NOT EXISTS command_timeouts
+                         (command_id INTEGER PRIMARY KEY
+                            REFERENCES commands(id) ON DELETE CASCADE,
+                         timeout REAL NOT NULL)"""
+        )
+
+    def _migrate_execution_logs(self):
+        """执行输出写入的日志文件(不含扩展名)，未写入日志时为NULL"""
+        self.cursor.execute("ALTER TABLE executions ADD COLUMN log_path TEXT")
+
+    def _migrate_schedules(self):
+        """定时执行的设置，next_run为NULL时由调度器计算"""
+        self.cursor.execute(
+            """CREATE TABLE IF NOT EXISTS schedules
+                         (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                         command_id INTEGER NOT NULL
+                            REFERENCES commands(id) ON DELETE CASCADE,
+                         kind TEXT NOT NULL,
+                         spec TEXT NOT NULL,
+                         missed TEXT NOT NULL DEFAULT 'skip',
+                         enabled INTEGER NOT NULL DEFAULT 1,
+                         last_run REAL,
+                         next_run REAL)"""
+        )
+        self.cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_schedules_command_id "
+            "ON schedules(command_id)"
+        )
+
+    def _migrate_command_templates(self):
+        """启用了模板参数的命令，其他命令中的 {{...}} 按原样执行"""
+        self.cursor.execute(
+            """CREATE TABLE IF NOT EXISTS command_templates
+                         (command_id INTEGER PRIMARY KEY
+                            REFERENCES commands(id) ON DELETE CASCADE)"""
+        )
+
+    @contextmanager
+    def transaction(self):
+        """
+        事务，可嵌套；其中各方法不再单独提交，最外层结束时一次提交，
+        出错则整体回滚。变更通知在提交后才发出
+        """
+        if self._tx_depth == 0 and not self.conn.in_transaction:
+            self.cursor.execute("BEGIN")
+        self._tx_depth += 1
+        try:
+            yield self
+        except BaseException:
+            self._tx_depth -= 1
+            if self._tx_depth == 0:
+                self.conn.rollback()
+                self._pending_changes.clear()
+            raise
+        self._tx_depth -= 1
+        if self._tx_depth == 0:
+            self.conn.commit()
+            pending = self._pending_changes
+            self._pending_changes = []
+            for changes in pending:
+                self.notify_changes(*changes)
+
+    def commit(self):
+        """提交；在transaction()中时由事务统一提交"""
+        if self._tx_depth == 0:
+            self.conn.commit()
+
+    def add_change_listener(self, listener):
+        self.change_listeners.append(listener)
+
+    def remove_change_listener(self, listener):
+        if listener in self.change_listeners:
+            self.change_listeners.remove(listener)
+
+    def notify_changes(self, inserted=(), updated=(), deleted_ids=()):
+        if not inserted and not updated and not deleted_ids:
+            return
+        if self._tx_depth > 0:
+            self._pending_changes.append((inserted, updated, deleted_ids))
+            return
+        for listener in list(self.change_listeners):
+            listener(inserted, updated, deleted_ids)
+
     def save_command(self, command_obj):
         self.cursor.execute(
             "INSERT INTO commands (name, command, notes) VALUES (?, ?, ?)",
             (command_obj.name, command_obj.command, command_obj.notes),
         )
-        self.conn.commit()
+        self.commit()
 
         # 保存成功后，更新命令对象的ID
         command_obj.id = self.cursor.lastrowid
+        self.notify_changes(inserted=[command_obj])
+        return command_obj
 
     def get_command(self, command_id) -> Command:
         self.cursor.execute(
@@ -43,13 +380,179 @@ class DBService:
             return Command(id=row[0], name=row[1], command=row[2], notes=row[3])
         return None
 
-    def get_commands(self) -> list[Command]:
-        self.cursor.execute("SELECT id, name, command, notes FROM commands")
+    def get_commands(self, limit=-1) -> list[Command]:
+        """全部命令，按常用度从高到低排序，未执行过的按id排在后面"""
+        self.cursor.execute(
+            """SELECT c.id, c.name, c.command, c.notes FROM commands c
+            LEFT JOIN command_usage u ON u.command_id = c.id
+            ORDER BY u.frecency IS NULL, u.frecency DESC, c.id
+            LIMIT ?""",
+            (limit,),
+        )
         return [
             Command(id=row[0], name=row[1], command=row[2], notes=row[3])
             for row in self.cursor.fetchall()
         ]
 
+    def get_commands_by_ids(self, command_ids) -> list[Command]:
+        if not command_ids:
+            return []
+        placeholders = ",".join(["?"] * len(command_ids))
+        self.cursor.execute(
+            "SELECT id, name, command, notes FROM commands "
+            f"WHERE id IN ({placeholders}) ORDER BY id",
+            list(command_ids),
+        )
+        return [
+            Command(id=row[0], name=row[1], command=row[2], notes=row[3])
+            for row in self.cursor.fetchall()
+        ]
+
+    def get_commands_by_name(self, name: str) -> list[Command]:
+        """按名称精确查找命令(走名称索引)"""
+        self.cursor.execute(
+            "SELECT id, name, command, notes FROM commands WHERE name=? ORDER BY id",
+            (name,),
+        )
+        return [
+            Command(id=row[0], name=row[1], command=row[2], notes=row[3])
+            for row in self.cursor.fetchall()
+        ]
+
+    def count_commands(self) -> int:
+        self.cursor.execute("SELECT COUNT(*) FROM commands")
+        return self.cursor.fetchone()[0]
+
+    def get_commands_page(
+        self, after_id=None, before_id=None, limit=100
+    ) -> list[Command]:
+        """
+        按id键集分页获取命令，结果按id升序
+        :param after_id: 获取id大于after_id的前limit条
+        :param before_id: 获取id小于before_id的后limit条
+        """
+        if before_id is not None:
+            self.cursor.execute(
+                "SELECT id, name, command, notes FROM commands WHERE id<? "
+                "ORDER BY id DESC LIMIT ?",
+                (before_id, limit),
+            )
+            rows = self.cursor.fetchall()
+            rows.reverse()
+        else:
+            self.cursor.execute(
+                "SELECT id, name, command, notes FROM commands WHERE id>? "
+                "ORDER BY id LIMIT ?",
+                (after_id if after_id is not None else -1, limit),
+            )
+            rows = self.cursor.fetchall()
+        return [
+            Command(id=row[0], name=row[1], command=row[2], notes=row[3])
+            for row in rows
+        ]
+
+    def iter_commands(self, batch_size=1000):
+        """按id顺序逐批读取全部命令，不会一次性载入内存"""
+        after_id = None
+        while True:
+            page = self.get_commands_page(after_id=after_id, limit=batch_size)
+            if not page:
+                return
+            yield from page
+            after_id = page[-1].id
+
+    def bulk_save_commands(
+        self, command_objs: list[Command], on_duplicate=DUPLICATE_SKIP
+    ) -> tuple[int, int, int]:
+        """
+        在一个事务中批量写入命令(executemany)，新命令的ID会回写到命令对象。
+        ID不从sqlite_sequence推算，而是插入后在同一事务中查询新增的行取得：
+        事务已开始(BEGIN)，期间其他连接的写入无法提交，新行的ID单调递增
+        :param on_duplicate: 命令内容与已有命令相同时的处理方式，见 DUPLICATE_MODES
+        :return: (新增数, 覆盖数, 跳过数)
+        """
+        if on_duplicate not in DUPLICATE_MODES:
+            raise ValueError(f"未知的重复处理方式: {on_duplicate}")
+
+        with self.transaction():
+            existing = dict()
+            if on_duplicate != DUPLICATE_KEEP_BOTH:
+                commands = {c.command for c in command_objs}
+                existing = self.find_ids_by_command(commands)
+
+            inserts, updates = [], []
+            merged, skipped = 0, 0
+            # 本批次内新增的命令，批次内的重复也按同样方式处理
+            pending = dict()
+            for cmd in command_objs:
+                if on_duplicate == DUPLICATE_KEEP_BOTH:
+                    inserts.append(cmd)
+                elif (command_id := existing.get(cmd.command)) is not None:
+                    if on_duplicate == DUPLICATE_OVERWRITE:
+                        cmd.id = command_id
+                        updates.append(cmd)
+                    else:
+                        skipped += 1
+                elif (earlier := pending.get(cmd.command)) is not None:
+                    if on_duplicate == DUPLICATE_OVERWRITE:
+                        earlier.name, earlier.notes = cmd.name, cmd.notes
+                        merged += 1
+                    else:
+                        skipped += 1
+                else:
+                    inserts.append(cmd)
+                    pending[cmd.command] = cmd
+
+            self.cursor.execute("SELECT COALESCE(MAX(id), 0) FROM commands")
+            last_id = self.cursor.fetchone()[0]
+            self.cursor.executemany(
+                "INSERT INTO commands (name, command, notes) VALUES (?, ?, ?)",
+                [(c.name, c.command, c.notes) for c in inserts],
+            )
+            # 大于插入前最大ID的行都是本次插入的，按ID顺序即插入顺序
+            self.cursor.execute(
+                "SELECT id FROM commands WHERE id > ? ORDER BY id", (last_id,)
+            )
+            for cmd, (command_id,) in zip(inserts, self.cursor.fetchall()):
+                cmd.id = command_id
+
+            self.cursor.executemany(
+                "UPDATE commands SET name=?, notes=? WHERE id=?",
+                [(c.name, c.notes, c.id) for c in updates],
+            )
+            self.notify_changes(inserted=inserts, updated=updates)
+        return len(inserts), len(updates) + merged, skipped
+
+    def find_ids_by_command(self, commands) -> dict:
+        """按命令内容查找已有命令，返回 {命令内容: id}"""
+        commands = list(commands)
+        result = dict()
+        for i in range(0, len(commands), MAX_SQL_PARAMS):
+            part = commands[i : i + MAX_SQL_PARAMS]
+            placeholders = ",".join(["?"] * len(part))
+            self.cursor.execute(
+                "SELECT command, MIN(id) FROM commands "
+                f"WHERE command IN ({placeholders}) GROUP BY command",
+                part,
+            )
+            result.update(self.cursor.fetchall())
+        return result
+
+    def get_command_id_at(self, offset: int, from_id=None):
+        """
+        获取按id排序后第offset条(从0开始)命令的id，用于滚动条定位。
+        OFFSET需要逐行跳过，耗时与offset成正比：调用方从附近已知的id(from_id，
+        从id不小于它的第一条开始计数)开始，使offset保持较小
+        """
+        sql = "SELECT id FROM commands ORDER BY id LIMIT 1 OFFSET ?"
+        params = [max(offset, 0)]
+        if from_id is not None:
+            sql = "SELECT id FROM commands WHERE id >= ? ORDER BY id LIMIT 1 OFFSET ?"
+            params.insert(0, from_id)
+        self.cursor.execute(sql, params)
+        row = self.cursor.fetchone()
+        return row[0] if row else None
+
     def update_command(self, command_obj):
         if not command_obj.id:
             raise ValueError("命令对象必须有ID才能更新")
@@ -58,41 +561,588 @@ class DBService:
             "UPDATE commands SET name=?, command=?, notes=? WHERE id=?",
             (command_obj.name, command_obj.command, command_obj.notes, command_obj.id),
         )
-        self.conn.commit()
+        self.commit()
+        self.notify_changes(updated=self.get_commands_by_ids([command_obj.id]))
 
-    def update_commands(self, command_objs: list[Command]):
+    def update_commands(self, command_objs: list[Command]) -> list[Command]:
+        """批量更新命令，返回更新后的行"""
         try:
             self.cursor.executemany(
                 "UPDATE commands SET name=?, command=?, notes=? WHERE id=?",
                 [(cmd.name, cmd.command, cmd.notes, cmd.id) for cmd in command_objs],
             )
-            self.conn.commit()
+            self.commit()
         except Exception as e:
-            self.conn.rollback()
+            if self._tx_depth == 0:
+                self.conn.rollback()
             raise e
+        updated = self.get_commands_by_ids({cmd.id for cmd in command_objs})
+        self.notify_changes(updated=updated)
+        return updated
 
     def delete_command(self, command_id):
         self.cursor.execute("DELETE FROM commands WHERE id=?", (command_id,))
-        self.conn.commit()
+        self.commit()
+        if self.cursor.rowcount:
+            self.notify_changes(deleted_ids=[int(command_id)])
 
     def delete_commands(self, command_ids):
         """
         批量删除命令
         :param command_ids: 要删除的命令ID列表
+        :return: 实际删除的命令ID列表
         """
         if not command_ids:
-            return
+            return []
 
         # 使用IN语句批量删除
         placeholders = ",".join(["?"] * len(command_ids))
-        sql = f"DELETE FROM commands WHERE id IN ({placeholders})"
+        sql = f"DELETE FROM commands WHERE id IN ({placeholders}) RETURNING id"
 
         try:
-            self.cursor.execute(sql, command_ids)
-            self.conn.commit()
+            self.cursor.execute(sql, list(command_ids))
+            deleted_ids = [row[0] for row in self.cursor.fetchall()]
+            self.commit()
         except Exception as e:
-            self.conn.rollback()
+            if self._tx_depth == 0:
+                self.conn.rollback()
             raise Exception(f"批量删除命令失败: {str(e)}")
+        self.notify_changes(deleted_ids=deleted_ids)
+        return deleted_ids
+
+    def record_execution(self, job) -> int:
+        """记录一次命令执行(executor.RunJob)并更新命令的常用度，返回记录ID"""
+        command_id = job.command_id
+        with self.transaction():
+            if command_id is not None:
+                # 执行期间命令可能已被删除
+                self.cursor.execute("SELECT 1 FROM commands WHERE id=?", (command_id,))
+                if self.cursor.fetchone() is None:
+                    command_id = None
+            resources = job.resources
+            self.cursor.execute(
+                """INSERT INTO executions (command_id, command, started_at,
+                    ended_at, duration, exit_code, status, stdout_bytes,
+                    stderr_bytes, cpu_time, peak_rss, read_bytes, write_bytes,
+                    peak_children, log_path)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                (
+                    command_id,
+                    job.command,
+                    job.started_at,
+                    job.ended_at,
+                    None if job.is_file else job.duration,
+                    job.returncode,
+                    job.status,
+                    job.stdout_bytes,
+                    job.stderr_bytes,
+                    job.cpu_time,
+                    resources.peak_rss,
+                    resources.read_bytes,
+                    resources.write_bytes,
+                    resources.peak_children,
+                    job.log_path,
+                ),
+            )
+            execution_id = self.cursor.lastrowid
+            if command_id is not None:
+                self.touch_command(command_id, job.started_at)
+        return execution_id
+
+    def touch_command(self, command_id, timestamp: float):
+        """累加一次使用到命令的常用度(只读写该命令的一行)"""
+        self.cursor.execute(
+            "SELECT frecency FROM command_usage WHERE command_id=?", (command_id,)
+        )
+        row = self.cursor.fetchone()
+        score = frecency_add(row[0] if row else None, timestamp)
+        self.cursor.execute(
+            """INSERT INTO command_usage (command_id, frecency, use_count, last_used)
+            VALUES (?, ?, 1, ?)
+            ON CONFLICT(command_id) DO UPDATE SET
+                frecency=excluded.frecency,
+                use_count=use_count + 1,
+                last_used=MAX(last_used, excluded.last_used)""",
+            (command_id, score, timestamp),
+        )
+        self.commit()
+
+    def get_top_commands(self, limit=10) -> list[Command]:
+        """常用度最高的若干条命令(走frecency索引，只读取limit行)"""
+        self.cursor.execute(
+            """SELECT c.id, c.name, c.command, c.notes FROM command_usage u
+            JOIN commands c ON c.id = u.command_id
+            ORDER BY u.frecency DESC LIMIT ?""",
+            (limit,),
+        )
+        return [
+            Command(id=row[0], name=row[1], command=row[2], notes=row[3])
+            for row in self.cursor.fetchall()
+        ]
+
+    def get_execution_stats(self, command_id=None, since=None) -> list[dict]:
+        """
+        按命令统计执行情况：次数、失败率、耗时p50/p95(最近秩法)、
+        峰值内存的最大值、平均CPU时间、最近执行时间
+        :param command_id: 只统计指定命令
+        :param since: 只统计该时间戳之后的执行
+        """
+        conditions = ["e.command_id IS NOT NULL", "e.status != 'detached'"]
+        params = []
+        if command_id is not None:
+            conditions.append("e.command_id = ?")
+            params.append(command_id)
+        if since is not None:
+            conditions.append("e.started_at >= ?")
+            params.append(since)
+
+        self.cursor.execute(
+            f"""WITH ranked AS (
+                SELECT e.command_id, e.duration, e.status, e.started_at,
+                    e.peak_rss, e.cpu_time,
+                    ROW_NUMBER() OVER (
+                        PARTITION BY e.command_id ORDER BY e.duration
+                    ) AS rn,
+                    COUNT(e.duration) OVER (PARTITION BY e.command_id) AS cnt
+                FROM executions e
+                WHERE {" AND ".join(conditions)}
+            )
+            SELECT r.command_id, c.name, COUNT(*) AS runs,
+                SUM(r.status IN ('failed', 'error', 'timeout')) AS failures,
+                MIN(CASE WHEN r.rn >= 0.5 * r.cnt THEN r.duration END) AS p50,
+                MIN(CASE WHEN r.rn >= 0.95 * r.cnt THEN r.duration END) AS p95,
+                AVG(r.duration) AS avg_duration,
+                MAX(r.peak_rss) AS peak_rss,
+                AVG(r.cpu_time) AS avg_cpu_time,
+                MAX(r.started_at) AS last_run
+            FROM ranked r
+            JOIN commands c ON c.id = r.command_id
+            GROUP BY r.command_id
+            ORDER BY p95 DESC""",
+            params,
+        )
+        columns = [d[0] for d in self.cursor.description]
+        stats = [dict(zip(columns, row)) for row in self.cursor.fetchall()]
+        for item in stats:
+            item["failure_rate"] = item["failures"] / item["runs"]
+        return stats
+
+    def get_recent_executions(self, limit=50, command_id=None) -> list[dict]:
+        sql = (
+            "SELECT id, command_id, command, started_at, ended_at, duration, "
+            "exit_code, status, stdout_bytes, stderr_bytes, cpu_time, peak_rss, "
+            "read_bytes, write_bytes, peak_children, log_path FROM executions"
+        )
+        params = []
+        if command_id is not None:
+            sql += " WHERE command_id = ?"
+            params.append(command_id)
+        sql += " ORDER BY started_at DESC LIMIT ?"
+        params.append(limit)
+        self.cursor.execute(sql, params)
+        columns = [d[0] for d in self.cursor.description]
+        return [dict(zip(columns, row)) for row in self.cursor.fetchall()]
+
+    def get_cache_ttls(self, command_ids) -> dict[int, float]:
+        """可缓存命令的缓存时间 {命令ID: 秒}"""
+        command_ids = list(command_ids)
+        result = dict()
+        for i in range(0, len(command_ids), MAX_SQL_PARAMS):
+            part = command_ids[i : i + MAX_SQL_PARAMS]
+            placeholders = ",".join(["?"] * len(part))
+            self.cursor.execute(
+                "SELECT command_id, ttl FROM cache_policies "
+                f"WHERE command_id IN ({placeholders})",
+                part,
+            )
+            result.update(self.cursor.fetchall())
+        return result
+
+    def set_cache_ttl(self, command_id, ttl: float | None):
+        """设置命令的缓存时间(秒)，None或0表示不缓存"""
+        if ttl:
+            self.cursor.execute(
+                "INSERT OR REPLACE INTO cache_policies (command_id, ttl) VALUES (?, ?)",
+                (command_id, ttl),
+            )
+        else:
+            self.cursor.execute(
+                "DELETE FROM cache_policies WHERE command_id=?", (command_id,)
+            )
+        self.commit()
+
+    def get_command_timeouts(self, command_ids) -> dict[int, float]:
+        """单独设置了超时的命令 {命令ID: 秒}"""
+        command_ids = list(command_ids)
+        result = dict()
+        for i in range(0, len(command_ids), MAX_SQL_PARAMS):
+            part = command_ids[i : i + MAX_SQL_PARAMS]
+            placeholders = ",".join(["?"] * len(part))
+            self.cursor.execute(
+                "SELECT command_id, timeout FROM command_timeouts "
+                f"WHERE command_id IN ({placeholders})",
+                part,
+            )
+            result.update(self.cursor.fetchall())
+        return result
+
+    def set_command_timeout(self, command_id, timeout: float | None):
+        """设置命令的超时(秒)，None或0表示使用默认超时"""
+        if timeout:
+            self.cursor.execute(
+                "INSERT OR REPLACE INTO command_timeouts (command_id, timeout) "
+                "VALUES (?, ?)",
+                (command_id, timeout),
+            )
+        else:
+            self.cursor.execute(
+                "DELETE FROM command_timeouts WHERE command_id=?", (command_id,)
+            )
+        self.commit()
+
+    def get_template_ids(self, command_ids) -> set[int]:
+        """其中启用了模板参数的命令ID"""
+        command_ids = list(command_ids)
+        result = set()
+        for i in range(0, len(command_ids), MAX_SQL_PARAMS):
+            part = command_ids[i : i + MAX_SQL_PARAMS]
+            placeholders = ",".join(["?"] * len(part))
+            self.cursor.execute(
+                "SELECT command_id FROM command_templates "
+                f"WHERE command_id IN ({placeholders})",
+                part,
+            )
+            result.update(row[0] for row in self.cursor.fetchall())
+        return result
+
+    def set_command_template(self, command_id, enabled: bool):
+        """启用或停用命令的模板参数"""
+        if enabled:
+            self.cursor.execute(
+                "INSERT OR IGNORE INTO command_templates (command_id) VALUES (?)",
+                (command_id,),
+            )
+        else:
+            self.cursor.execute(
+                "DELETE FROM command_templates WHERE command_id=?", (command_id,)
+            )
+        self.commit()
+
+    def get_schedules(self, command_id=None) -> list[dict]:
+        """定时设置，连同命令的名称、内容和超时"""
+        sql = (
+            "SELECT s.id AS schedule_id, s.command_id, c.name, c.command, s.kind, "
+            "s.spec, s.missed, s.enabled, s.last_run, s.next_run, t.timeout "
+            "FROM schedules s JOIN commands c ON c.id = s.command_id "
+            "LEFT JOIN command_timeouts t ON t.command_id = s.command_id"
+        )
+        params = []
+        if command_id is not None:
+            sql += " WHERE s.command_id = ?"
+            params.append(command_id)
+        sql += " ORDER BY s.id"
+        self.cursor.execute(sql, params)
+        columns = [d[0] for d in self.cursor.description]
+        return [dict(zip(columns, row)) for row in self.cursor.fetchall()]
+
+    def add_schedule(self, command_id, kind: str, spec: str, missed: str) -> int:
+        """添加定时设置，下次执行时间由调度器计算"""
+        self.cursor.execute(
+            "INSERT INTO schedules (command_id, kind, spec, missed) "
+            "VALUES (?, ?, ?, ?)",
+            (command_id, kind, spec, missed),
+        )
+        self.commit()
+        return self.cursor.lastrowid
+
+    def delete_schedule(self, schedule_id):
+        self.cursor.execute("DELETE FROM schedules WHERE id=?", (schedule_id,))
+        self.commit()
+
+    def set_schedule_enabled(self, schedule_id, enabled: bool):
+        """启用时重新计算下次执行时间"""
+        self.cursor.execute(
+            "UPDATE schedules SET enabled=?, next_run=NULL WHERE id=?",
+            (int(enabled), schedule_id),
+        )
+        self.commit()
+
+    def update_schedule_runs(self, runs):
+        """
+        批量更新定时设置的执行状态
+        :param runs: (上次执行时间, 下次执行时间, 是否启用, 定时设置ID) 列表
+        """
+        with self.transaction():
+            self.cursor.executemany(
+                "UPDATE schedules SET last_run=?, next_run=?, enabled=? WHERE id=?",
+                runs,
+            )
+
+    def get_cached_result(
+        self, key: str, timestamp: float | None = None, ttl: float | None = None
+    ):
+        """
+        读取缓存的执行结果，返回(命令, 输出, 退出码, 缓存时间)或None
+        :param timestamp: 不为None时，命中后更新最近使用时间
+        :param ttl: 不为None时只返回timestamp之前ttl秒内的结果，过期的结果被删除，
+                    不会因这次读取而在LRU淘汰中排到有效结果之前
+        """
+        sql = (
+            "SELECT command, output, returncode, created_at FROM result_cache "
+            "WHERE key=?"
+        )
+        params = [key]
+        expired_before = None
+        if ttl is not None and timestamp is not None:
+            expired_before = timestamp - ttl
+            sql += " AND created_at >= ?"
+            params.append(expired_before)
+        self.cursor.execute(sql, params)
+        row = self.cursor.fetchone()
+        if row is None:
+            if expired_before is not None:
+                self.cursor.execute(
+                    "DELETE FROM result_cache WHERE key=? AND created_at < ?",
+                    (key, expired_before),
+                )
+                if self.cursor.rowcount:
+                    self.commit()
+            return None
+        if timestamp is not None:
+            self.cursor.execute(
+                "UPDATE result_cache SET last_used=? WHERE key=?", (timestamp, key)
+            )
+            self.commit()
+        return row
+
+    def save_cached_result(
+        self, key: str, command: str, output: str, returncode, created_at: float
+    ) -> int:
+        """保存执行结果，返回其占用的字节数"""
+        size = len(output.encode())
+        self.cursor.execute(
+            """INSERT OR REPLACE INTO result_cache
+                (key, command, output, returncode, created_at, last_used, size)
+            VALUES (?, ?, ?, ?, ?, ?, ?)""",
+            (key, command, output, returncode, created_at, created_at, size),
+        )
+        self.commit()
+        return size
+
+    def get_result_cache_size(self) -> int:
+        self.cursor.execute("SELECT COALESCE(SUM(size), 0) FROM result_cache")
+        return self.cursor.fetchone()[0]
+
+    def evict_cached_results(self, max_bytes: int) -> int:
+        """按最近使用时间从旧到新删除缓存，直到总大小不超过max_bytes，返回剩余大小"""
+        total = self.get_result_cache_size()
+        if total <= max_bytes:
+            return total
+        self.cursor.execute("SELECT key, size FROM result_cache ORDER BY last_used")
+        evicted = []
+        for key, size in self.cursor.fetchall():
+            if total <= max_bytes:
+                break
+            evicted.append((key,))
+            total -= size
+        self.cursor.executemany("DELETE FROM result_cache WHERE key=?", evicted)
+        self.commit()
+        return total
+
+    def clear_result_cache(self):
+        self.cursor.execute("DELETE FROM result_cache")
+        self.commit()
+
+    def get_tags(self) -> list[tuple[int, str, int]]:
+        """有命令的标签及其命令数，按名称排序: [(id, 名称, 命令数)]"""
+        self.cursor.execute(
+            """SELECT t.id, t.name, COUNT(*) FROM tags t
+            JOIN command_tags ct ON ct.tag_id = t.id
+            GROUP BY t.id ORDER BY t.name"""
+        )
+        return self.cursor.fetchall()
+
+    def has_tags(self) -> bool:
+        self.cursor.execute("SELECT 1 FROM command_tags LIMIT 1")
+        return self.cursor.fetchone() is not None
+
+    def get_tag_ids(self, names, create=False) -> dict[str, int]:
+        """
+        按名称查找标签ID
+        :param create: 是否创建不存在的标签
+        """
+        names = list(dict.fromkeys(n for n in names if n))
+        if not names:
+            return {}
+        if create:
+            self.cursor.executemany(
+                "INSERT OR IGNORE INTO tags (name) VALUES (?)", [(n,) for n in names]
+            )
+            self.commit()
+        result = dict()
+        for i in range(0, len(names), MAX_SQL_PARAMS):
+            part = names[i : i + MAX_SQL_PARAMS]
+            placeholders = ",".join(["?"] * len(part))
+            self.cursor.execute(
+                f"SELECT name, id FROM tags WHERE name IN ({placeholders})", part
+            )
+            result.update(self.cursor.fetchall())
+        return result
+
+    def get_command_tags(self, command_ids=None) -> dict[int, list[str]]:
+        """命令的标签 {命令ID: [标签名称]}，command_ids为None时返回全部"""
+        sql = (
+            "SELECT ct.command_id, t.name FROM command_tags ct "
+            "JOIN tags t ON t.id = ct.tag_id"
+        )
+        rows = []
+        if command_ids is None:
+            self.cursor.execute(sql + " ORDER BY t.name")
+            rows = self.cursor.fetchall()
+        else:
+            command_ids = list(command_ids)
+            for i in range(0, len(command_ids), MAX_SQL_PARAMS):
+                part = command_ids[i : i + MAX_SQL_PARAMS]
+                placeholders = ",".join(["?"] * len(part))
+                self.cursor.execute(
+                    f"{sql} WHERE ct.command_id IN ({placeholders}) ORDER BY t.name",
+                    part,
+                )
+                rows += self.cursor.fetchall()
+        result = dict()
+        for command_id, name in rows:
+            result.setdefault(command_id, []).append(name)
+        return result
+
+    def set_command_tags(self, command_id, names):
+        """将命令的标签设置为names(替换原有标签)"""
+        with self.transaction():
+            tag_ids = self.get_tag_ids(names, create=True)
+            self.cursor.execute(
+                "DELETE FROM command_tags WHERE command_id=?", (command_id,)
+            )
+            self.cursor.executemany(
+                "INSERT INTO command_tags (command_id, tag_id) VALUES (?, ?)",
+                [(command_id, tag_id) for tag_id in tag_ids.values()],
+            )
+            self.notify_changes(updated=self.get_commands_by_ids([command_id]))
+
+    def add_command_tags(self, command_ids, names):
+        """为多条命令添加标签"""
+        command_ids = list(command_ids)
+        with self.transaction():
+            tag_ids = self.get_tag_ids(names, create=True)
+            self.cursor.executemany(
+                "INSERT OR IGNORE INTO command_tags (command_id, tag_id) VALUES (?, ?)",
+                [(c, t) for c in command_ids for t in tag_ids.values()],
+            )
+            self.notify_changes(updated=self.get_commands_by_ids(command_ids))
+
+    def remove_command_tags(self, command_ids, names):
+        """移除多条命令的标签"""
+        command_ids = list(command_ids)
+        with self.transaction():
+            tag_ids = self.get_tag_ids(names)
+            self.cursor.executemany(
+                "DELETE FROM command_tags WHERE command_id=? AND tag_id=?",
+                [(c, t) for c in command_ids for t in tag_ids.values()],
+            )
+            self.notify_changes(updated=self.get_commands_by_ids(command_ids))
+
+    def get_commands_by_tags(
+        self, names, match_all=True, limit=-1, offset=0
+    ) -> list[Command]:
+        """
+        按标签集合筛选命令，结果按常用度排序
+        :param match_all: True时须包含全部标签，False时包含任一标签即可
+        """
+        names = set(names)
+        tag_ids = list(self.get_tag_ids(names).values())
+        if not tag_ids or (match_all and len(tag_ids) < len(names)):
+            return []
+        placeholders = ",".join(["?"] * len(tag_ids))
+        having = f"HAVING COUNT(*) = {len(tag_ids)}" if match_all else ""
+        self.cursor.execute(
+            f"""SELECT c.id, c.name, c.command, c.notes FROM commands c
+            JOIN (
+                SELECT command_id FROM command_tags
+                WHERE tag_id IN ({placeholders})
+                GROUP BY command_id {having}
+            ) m ON m.command_id = c.id
+            LEFT JOIN command_usage u ON u.command_id = c.id
+            ORDER BY u.frecency IS NULL, u.frecency DESC, c.id
+            LIMIT ? OFFSET ?""",
+            tag_ids + [limit, offset],
+        )
+        return [
+            Command(id=row[0], name=row[1], command=row[2], notes=row[3])
+            for row in self.cursor.fetchall()
+        ]
+
+    def get_untagged_commands(self, limit=-1, offset=0) -> list[Command]:
+        """没有任何标签的命令，按常用度排序"""
+        self.cursor.execute(
+            """SELECT c.id, c.name, c.command, c.notes FROM commands c
+            LEFT JOIN command_usage u ON u.command_id = c.id
+            WHERE NOT EXISTS (SELECT 1 FROM command_tags ct WHERE ct.command_id = c.id)
+            ORDER BY u.frecency IS NULL, u.frecency DESC, c.id
+            LIMIT ? OFFSET ?""",
+            (limit, offset),
+        )
+        return [
+            Command(id=row[0], name=row[1], command=row[2], notes=row[3])
+            for row in self.cursor.fetchall()
+        ]
+
+    def count_untagged_commands(self) -> int:
+        self.cursor.execute(
+            """SELECT COUNT(*) FROM commands c WHERE NOT EXISTS
+            (SELECT 1 FROM command_tags ct WHERE ct.command_id = c.id)"""
+        )
+        return self.cursor.fetchone()[0]
+
+    def search_commands(self, text: str, limit=200) -> list[tuple[Command, str]]:
+        """
+        按名称、命令、备注搜索命令，每个词按前缀匹配，结果按bm25相关度排序
+        :return: (命令, 高亮摘要) 列表
+        """
+        words = text.split()
+        if not words:
+            return []
+        if not self.fts_enabled:
+            return self._search_commands_like(words, limit)
+
+        query = " ".join('"' + w.replace('"', '""') + '"*' for w in words)
+        self.cursor.execute(
+            """SELECT c.id, c.name, c.command, c.notes,
+                      snippet(commands_fts, -1, ?, ?, '…', 12)
+               FROM commands_fts
+               JOIN commands c ON c.id = commands_fts.rowid
+               WHERE commands_fts MATCH ?
+               ORDER BY bm25(commands_fts, 10.0, 5.0, 1.0)
+               LIMIT ?""",
+            (self.highlight_open, self.highlight_close, query, limit),
+        )
+        return [
+            (Command(id=row[0], name=row[1], command=row[2], notes=row[3]), row[4])
+            for row in self.cursor.fetchall()
+        ]
+
+    def _search_commands_like(self, words, limit) -> list[tuple[Command, str]]:
+        conditions, params = [], []
+        for w in words:
+            conditions.append("(name LIKE ? OR command LIKE ? OR notes LIKE ?)")
+            params += [f"%{w}%"] * 3
+        self.cursor.execute(
+            "SELECT id, name, command, notes FROM commands WHERE "
+            + " AND ".join(conditions)
+            + " ORDER BY id LIMIT ?",
+            params + [limit],
+        )
+        return [
+            (Command(id=row[0], name=row[1], command=row[2], notes=row[3]), row[2])
+            for row in self.cursor.fetchall()
+        ]
 
     def close(self):
         if self.conn:
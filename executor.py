@@ -0,0 +1,534 @@
+import codecs
+from collections.abc import Iterable
+from concurrent.futures import ThreadPoolExecutor
+import itertools
+import locale
+import os
+import queue
+import signal
+import subprocess
+import threading
+import time
+from output_log import OutputLogWriter
+from resource_monitor import ProcessTreeSampler, ResourceUsage, maxrss_bytes, psutil
+import tracing
+
+# 执行引擎事件类型
+EVENT_START = "start"
+EVENT_STDOUT = "stdout"
+EVENT_STDERR = "stderr"
+EVENT_EXIT = "exit"
+EVENT_ERROR = "error"
+EVENT_BATCH_DONE = "batch_done"
+
+# 批量执行策略
+POLICY_SEQUENTIAL = "sequential"  # 逐个执行
+POLICY_PARALLEL = "parallel"  # 并发执行，互不影响
+POLICY_FAIL_FAST = "fail_fast"  # 并发执行，任一失败即取消其余命令
+POLICIES = (POLICY_SEQUENTIAL, POLICY_PARALLEL, POLICY_FAIL_FAST)
+
+# 执行结果
+STATUS_RUNNING = "running"
+STATUS_OK = "ok"
+STATUS_FAILED = "failed"  # 退出码非0
+STATUS_ERROR = "error"  # 无法启动等异常
+STATUS_CANCELLED = "cancelled"
+STATUS_TIMEOUT = "timeout"  # 超时后被结束
+STATUS_DETACHED = "detached"  # 文件类命令，启动后不等待结束
+
+# 每次读取的最大字节数
+READ_CHUNK_SIZE = 64 * 1024
+# 写入日志时，推送给调用方的输出超过该字节数后只写入日志
+CONSOLE_LIMIT = 2 * 1024 * 1024
+
+
+class RunJob:
+    """一次命令执行"""
+
+    def __init__(
+        self,
+        job_id: int,
+        command: str,
+        name: str | None = None,
+        command_id=None,
+        timeout: float | None = None,
+    ) -> None:
+        self.id = job_id
+        self.command = command
+        self.name = name or command
+        # 对应的已存储命令ID，临时输入的命令为None
+        self.command_id = command_id
+        self.process: subprocess.Popen | None = None
+        self.is_file = False
+        # perf_counter计时，用于计算耗时
+        self.start_time: float | None = None
+        self.end_time: float | None = None
+        # 开始/结束的时间戳(time.time())，用于记录
+        self.started_at: float | None = None
+        self.ended_at: float | None = None
+        self.returncode: int | None = None
+        self.error: str | None = None
+        self.cancelled = False
+        # 超时(秒)，None为不限制；超时后结束进程树并标记timed_out
+        self.timeout = timeout
+        self.timed_out = False
+        # 进程(含已回收子进程)消耗的CPU时间，无法获取时为None
+        self.cpu_time: float | None = None
+        # 进程树的内存、I/O、子进程数等资源占用
+        self.resources = ResourceUsage()
+        self.batch: "BatchRun | None" = None
+        self.stdout_bytes = 0
+        self.stderr_bytes = 0
+        # 输出日志(不含扩展名，见output_log)，未写入日志时为None
+        self.log_path: str | None = None
+        # 已推送给调用方的输出字节数；stdout、stderr的读取线程都会更新，
+        # 由output_lock保护
+        self.pushed_bytes = 0
+        self.spilled = False
+        self.output_lock = threading.Lock()
+        self.done = threading.Event()
+
+    @property
+    def duration(self) -> float:
+        if self.start_time is None:
+            return 0.0
+        end = self.end_time if self.end_time is not None else time.perf_counter()
+        return end - self.start_time
+
+    @property
+    def ok(self) -> bool:
+        return (
+            not self.cancelled
+            and not self.timed_out
+            and self.error is None
+            and self.returncode in (0, None)
+        )
+
+    @property
+    def status(self) -> str:
+        if not self.done.is_set():
+            return STATUS_RUNNING
+        if self.timed_out:
+            return STATUS_TIMEOUT
+        if self.cancelled:
+            return STATUS_CANCELLED
+        if self.error is not None:
+            return STATUS_ERROR
+        if self.is_file:
+            return STATUS_DETACHED
+        return STATUS_OK if self.returncode == 0 else STATUS_FAILED
+
+    def __repr__(self) -> str:
+        return f"RunJob(id={self.id}, command={self.command}, returncode={self.returncode})"
+
+
+class BatchRun:
+    """一批命令的执行"""
+
+    def __init__(
+        self,
+        jobs: list[RunJob],
+        policy: str,
+        max_workers: int,
+        source: Iterable[tuple[str, str, int | None]] | None = None,
+    ) -> None:
+        self.jobs = jobs
+        # 逐个产生 (名称, 命令, 已存储命令ID) 的迭代器，执行时才创建其job
+        self.source = source
+        self.lazy = source is not None
+        # 逐个创建的job的超时 {命令ID: 秒}
+        self.timeouts = dict[int, float]()
+        self.policy = policy
+        self.max_workers = max_workers
+        self.start_time: float | None = None
+        self.end_time: float | None = None
+        self.stop = threading.Event()
+        self.done = threading.Event()
+        for job in jobs:
+            job.batch = self
+
+    @property
+    def wall_time(self) -> float:
+        if self.start_time is None:
+            return 0.0
+        end = self.end_time if self.end_time is not None else time.perf_counter()
+        return end - self.start_time
+
+    @property
+    def summed_time(self) -> float:
+        return sum(job.duration for job in self.jobs)
+
+    @property
+    def cpu_time(self) -> float | None:
+        times = [job.cpu_time for job in self.jobs if job.cpu_time is not None]
+        return sum(times) if times else None
+
+    def count(self) -> tuple[int, int, int]:
+        """返回 (成功数, 失败数, 取消数)"""
+        cancelled = sum(1 for job in self.jobs if job.cancelled)
+        ok = sum(1 for job in self.jobs if job.ok)
+        return ok, len(self.jobs) - ok - cancelled, cancelled
+
+
+class CommandExecutor:
+    """
+    在工作线程中执行命令，增量读取stdout/stderr，
+    通过队列以 (事件类型, job, 数据) 的形式推送给调用方（如Tk线程定时消费）
+    """
+
+    # 取消或超时时先请求进程树结束，等待该时间(秒)后强制结束
+    kill_grace = 3.0
+
+    def __init__(
+        self,
+        events: queue.Queue | None = None,
+        encoding: str | None = None,
+        sample_interval: float | None = 0.5,
+        log_dir: str | None = None,
+        console_limit: int = CONSOLE_LIMIT,
+    ):
+        """
+        :param sample_interval: 资源占用的采样间隔(秒)，None或0时不采样
+        :param log_dir: 每次执行的输出都写入该目录下的压缩日志，None时不写入
+        :param console_limit: 写入日志时，每次执行最多推送的输出字节数
+        """
+        self.events = events if events is not None else queue.Queue()
+        self.encoding = encoding or locale.getpreferredencoding(False)
+        self.sampler = ProcessTreeSampler(sample_interval)
+        self.log_dir = log_dir
+        self.console_limit = console_limit
+        # 未单独指定超时的命令的默认超时(秒)，None为不限制
+        self.default_timeout: float | None = None
+        self._job_seq = itertools.count(1)
+        self._lock = threading.Lock()
+        self.running = dict[int, RunJob]()
+
+    def create_job(
+        self, command: str, name: str | None = None, command_id=None, timeout=None
+    ):
+        timeout = timeout or self.default_timeout
+        return RunJob(next(self._job_seq), command, name, command_id, timeout)
+
+    def running_jobs(self) -> list[RunJob]:
+        """正在执行的命令的快照，按job id排序(可在任意线程调用)"""
+        with self._lock:
+            jobs = list(self.running.values())
+        return sorted(jobs, key=lambda job: job.id)
+
+    def submit(
+        self, command: str, name: str | None = None, command_id=None, timeout=None
+    ) -> RunJob:
+        """
+        在新的工作线程中执行命令，立即返回job
+        :param timeout: 超时(秒)，默认为default_timeout
+        """
+        job = self.create_job(command, name, command_id, timeout)
+        threading.Thread(target=self.execute, args=(job,), daemon=True).start()
+        return job
+
+    def submit_batch(
+        self,
+        commands: list[tuple[str, str, int | None]],
+        policy: str = POLICY_PARALLEL,
+        max_workers: int | None = None,
+        timeouts: dict[int, float] | None = None,
+    ) -> BatchRun:
+        """
+        批量执行命令，立即返回BatchRun
+        :param commands: (名称, 命令, 已存储命令ID或None) 列表
+        :param policy: 执行策略，见 POLICIES
+        :param max_workers: 并发数，默认为CPU核数
+        :param timeouts: 各已存储命令的超时 {命令ID: 秒}，其余为default_timeout
+        """
+        if policy not in POLICIES:
+            raise ValueError(f"未知的执行策略: {policy}")
+        workers = 1 if policy == POLICY_SEQUENTIAL else max_workers or os.cpu_count()
+        timeouts = timeouts or {}
+        jobs = [
+            self.create_job(command, name, cid, timeouts.get(cid))
+            for name, command, cid in commands
+        ]
+        batch = BatchRun(jobs, policy, max(1, workers or 1))
+        threading.Thread(target=self.execute_batch, args=(batch,), daemon=True).start()
+        return batch
+
+    def submit_lazy_batch(
+        self,
+        commands: Iterable[tuple[str, str, int | None]],
+        policy: str = POLICY_PARALLEL,
+        max_workers: int | None = None,
+        timeouts: dict[int, float] | None = None,
+    ) -> BatchRun:
+        """
+        批量执行由迭代器逐个产生的命令(如参数矩阵)，立即返回BatchRun；
+        有空闲的工作线程时才取下一条命令，batch.jobs随执行逐渐增加
+        """
+        if policy not in POLICIES:
+            raise ValueError(f"未知的执行策略: {policy}")
+        workers = 1 if policy == POLICY_SEQUENTIAL else max_workers or os.cpu_count()
+        batch = BatchRun([], policy, max(1, workers or 1), iter(commands))
+        batch.timeouts = timeouts or {}
+        threading.Thread(target=self.execute_batch, args=(batch,), daemon=True).start()
+        return batch
+
+    def execute_batch(self, batch: BatchRun) -> BatchRun:
+        """在当前线程中调度一批命令，直到全部结束"""
+        batch.start_time = time.perf_counter()
+
+        def run_one(job: RunJob):
+            if batch.stop.is_set():
+                self._skip(job)
+                return
+            self.execute(job)
+            if batch.policy == POLICY_FAIL_FAST and not job.ok and not job.cancelled:
+                self.cancel_batch(batch)
+
+        try:
+            with ThreadPoolExecutor(max_workers=batch.max_workers) as pool:
+                if batch.source is None:
+                    list(pool.map(run_one, batch.jobs))
+                else:
+                    self._feed(batch, pool, run_one)
+        finally:
+            batch.end_time = time.perf_counter()
+            batch.done.set()
+            self.events.put((EVENT_BATCH_DONE, batch, None))
+        return batch
+
+    def _feed(self, batch: BatchRun, pool: ThreadPoolExecutor, run_one):
+        """从batch.source取命令提交到线程池，同时执行的不超过max_workers条"""
+        slots = threading.Semaphore(batch.max_workers)
+
+        def run_slot(job: RunJob):
+            try:
+                run_one(job)
+            finally:
+                slots.release()
+
+        for name, command, command_id in batch.source:
+            slots.acquire()
+            if batch.stop.is_set():
+                # 取消后剩余的命令不再创建
+                break
+            job = self.create_job(
+                command, name, command_id, batch.timeouts.get(command_id)
+            )
+            job.batch = batch
+            batch.jobs.append(job)
+            pool.submit(run_slot, job)
+        batch.source = None
+
+    def cancel_batch(self, batch: BatchRun):
+        """取消尚未开始的命令，并终止正在执行的命令"""
+        batch.stop.set()
+        for job in batch.jobs:
+            if job.done.is_set() or job.process is None:
+                continue
+            self.cancel(job)
+
+    def cancel(self, job: RunJob):
+        """取消正在执行的命令，结束其整个进程树(可在任意线程调用)"""
+        if job.done.is_set():
+            return
+        job.cancelled = True
+        # 进程尚未启动时由execute在启动后结束
+        if job.process is not None:
+            self.kill_tree(job)
+
+    def _on_timeout(self, job: RunJob):
+        if job.done.is_set() or job.cancelled:
+            return
+        job.timed_out = True
+        self.kill_tree(job)
+
+    def kill_tree(self, job: RunJob):
+        """
+        结束命令的进程及其全部子进程：先请求结束(SIGTERM)，
+        kill_grace秒后仍在运行的强制结束，不阻塞调用方
+        """
+        process = job.process
+        # 先取得子进程，shell退出后子进程可能被过继而无法再找到
+        descendants = []
+        if psutil is not None:
+            try:
+                descendants = psutil.Process(process.pid).children(recursive=True)
+            except psutil.Error:
+                pass
+        self._signal_tree(process, descendants, force=False)
+
+        def force_kill():
+            if not job.done.wait(self.kill_grace):
+                self._signal_tree(process, descendants, force=True)
+
+        threading.Thread(target=force_kill, daemon=True).start()
+
+    def _signal_tree(self, process: subprocess.Popen, descendants: list, force: bool):
+        if os.name == "nt":
+            if psutil is None:
+                # 没有psutil时由taskkill结束整个进程树
+                args = ["taskkill", "/T", "/PID", str(process.pid)]
+                subprocess.run(
+                    args + ["/F"] if force else args,
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.DEVNULL,
+                )
+                return
+        else:
+            # 命令在独立的会话中启动，进程组ID即shell的pid
+            try:
+                os.killpg(process.pid, signal.SIGKILL if force else signal.SIGTERM)
+            except OSError:
+                pass
+        errors = OSError if psutil is None else (OSError, psutil.Error)
+        for proc in [*descendants, process]:
+            try:
+                if force:
+                    proc.kill()
+                else:
+                    proc.terminate()
+            except errors:
+                pass
+
+    def _skip(self, job: RunJob):
+        job.cancelled = True
+        job.done.set()
+        self.events.put((EVENT_EXIT, job, None))
+
+    @tracing.traced("exec.execute")
+    def execute(self, job: RunJob) -> RunJob:
+        """在当前线程中执行命令，直到结束"""
+        with self._lock:
+            self.running[job.id] = job
+        job.start_time = time.perf_counter()
+        job.started_at = time.time()
+        self.events.put((EVENT_START, job, None))
+        timer = None
+        log = None
+        try:
+            job.is_file = os.path.isfile(job.command)
+            if job.is_file:
+                # 如果是文件，直接执行不等待输出
+                job.process = subprocess.Popen(
+                    job.command,
+                    shell=True,
+                    stdin=subprocess.DEVNULL,
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.DEVNULL,
+                )
+                self.events.put((EVENT_STDOUT, job, "已执行文件"))
+            else:
+                if self.log_dir:
+                    job.log_path = os.path.join(
+                        self.log_dir, f"{int(job.started_at * 1000)}-{job.id}"
+                    )
+                    log = OutputLogWriter(job.log_path)
+                with tracing.span("exec.spawn", command=job.command):
+                    job.process = subprocess.Popen(
+                        job.command,
+                        shell=True,
+                        stdin=subprocess.DEVNULL,
+                        stdout=subprocess.PIPE,
+                        stderr=subprocess.PIPE,
+                        # 独立的进程组，取消时可结束全部子进程
+                        start_new_session=os.name != "nt",
+                    )
+                self.sampler.add(job.id, job.process.pid, job.resources)
+                if job.timeout:
+                    timer = threading.Timer(job.timeout, self._on_timeout, (job,))
+                    timer.daemon = True
+                    timer.start()
+                if job.cancelled:
+                    self.kill_tree(job)
+                self._pump(job, log)
+                self._wait(job)
+        except Exception as e:
+            job.error = str(e)
+            self.events.put((EVENT_ERROR, job, f"错误: {str(e)}"))
+        finally:
+            if timer is not None:
+                timer.cancel()
+            if log is not None:
+                log.close()
+            self.sampler.remove(job.id)
+            if job.cpu_time is None:
+                job.cpu_time = job.resources.cpu_time
+            job.end_time = time.perf_counter()
+            job.ended_at = time.time()
+            with self._lock:
+                self.running.pop(job.id, None)
+            job.done.set()
+            self.events.put((EVENT_EXIT, job, job.returncode))
+        return job
+
+    def _wait(self, job: RunJob):
+        """等待进程结束，并尽可能取得其CPU时间"""
+        process = job.process
+        if hasattr(os, "wait4"):
+            try:
+                _, status, usage = os.wait4(process.pid, 0)
+            except ChildProcessError:
+                job.returncode = process.wait()
+                return
+            process.returncode = os.waitstatus_to_exitcode(status)
+            job.returncode = process.returncode
+            job.cpu_time = usage.ru_utime + usage.ru_stime
+            # 比采样更准确，且包含采样间隔内就结束的进程
+            job.resources.update_peak_rss(maxrss_bytes(usage.ru_maxrss))
+            return
+
+        job.returncode = process.wait()
+        if os.name == "nt":
+            try:
+                import win32process
+
+                times = win32process.GetProcessTimes(int(process._handle))
+                # 单位为100纳秒
+                job.cpu_time = (times["UserTime"] + times["KernelTime"]) / 1e7
+            except Exception:
+                pass
+
+    def _pump(self, job: RunJob, log: OutputLogWriter | None = None):
+        """stderr由辅助线程读取，stdout在当前线程读取"""
+        err_reader = threading.Thread(
+            target=self._read_stream,
+            args=(job, job.process.stderr, EVENT_STDERR, log),
+            daemon=True,
+        )
+        err_reader.start()
+        self._read_stream(job, job.process.stdout, EVENT_STDOUT, log)
+        err_reader.join()
+
+    def _read_stream(
+        self, job: RunJob, stream, kind: str, log: OutputLogWriter | None = None
+    ):
+        decoder = codecs.getincrementaldecoder(self.encoding)(errors="replace")
+        with stream:
+            while True:
+                chunk = stream.read1(READ_CHUNK_SIZE)
+                if not chunk:
+                    break
+                if kind == EVENT_STDOUT:
+                    job.stdout_bytes += len(chunk)
+                else:
+                    job.stderr_bytes += len(chunk)
+                self._emit(job, kind, decoder.decode(chunk), len(chunk), log)
+            self._emit(job, kind, decoder.decode(b"", final=True), 0, log)
+
+    def _emit(
+        self, job: RunJob, kind: str, text: str, size: int, log: OutputLogWriter | None
+    ):
+        """输出写入日志；推送的输出超过console_limit后只写入日志"""
+        if not text:
+            return
+        if log is None:
+            self.events.put((kind, job, text))
+            return
+        log.write(text)
+        with job.output_lock:
+            if job.spilled:
+                return
+            job.pushed_bytes += size
+            if job.pushed_bytes > self.console_limit:
+                job.spilled = True
+                text = "\n输出过多，后续内容只写入日志\n"
+            self.events.put((kind, job, text))
@@ -0,0 +1,208 @@
+import heapq
+import re
+import time
+from command import Command
+
+# 这些字符之后的位置视为单词开头
+WORD_SEPARATORS = frozenset(" -_/\\.:;,|&=\"'()[]{}")
+WORD_PATTERN = re.compile("[^" + re.escape("".join(WORD_SEPARATORS)) + "]+")
+
+SCORE_MATCH = 16
+BONUS_BOUNDARY = 10
+BONUS_FIRST_CHAR = 8
+BONUS_CONSECUTIVE = 6
+PENALTY_GAP = 1
+MAX_GAP_PENALTY = 8
+# 名称匹配优先于命令匹配
+NAME_WEIGHT = 1.25
+# 命令内容只为前若干个单词建立倒排，其余部分靠顺序扫描匹配
+MAX_INDEXED_WORDS = 6
+
+
+def fuzzy_score(text: str, query: str) -> int | None:
+    """
+    子序列匹配打分(类似fzf)：query中的字符须按顺序出现在text中，
+    命中单词开头、连续命中加分，间隔扣分；不匹配时返回None。
+    text、query均应为小写。
+    """
+    # 正向查找，确定最早能完成匹配的结束位置
+    pos = -1
+    for c in query:
+        pos = text.find(c, pos + 1)
+        if pos < 0:
+            return None
+
+    # 从结束位置反向查找，得到更紧凑的匹配
+    positions = [0] * len(query)
+    for i in range(len(query) - 1, -1, -1):
+        pos = text.rfind(query[i], 0, pos + 1)
+        positions[i] = pos
+        pos -= 1
+
+    score = 0
+    prev = -2
+    for p in positions:
+        score += SCORE_MATCH
+        if p == 0:
+            score += BONUS_FIRST_CHAR + BONUS_BOUNDARY
+        elif text[p - 1] in WORD_SEPARATORS:
+            score += BONUS_BOUNDARY
+        if p == prev + 1:
+            score += BONUS_CONSECUTIVE
+        elif prev >= 0:
+            score -= min((p - prev - 1) * PENALTY_GAP, MAX_GAP_PENALTY)
+        prev = p
+    # 同等条件下更短的文本优先
+    return score - len(text) // 32
+
+
+def split_words(text: str) -> list[str]:
+    return WORD_PATTERN.findall(text)
+
+
+def initials(words: list[str]) -> str:
+    """各单词首字母，如 "git commit -m" -> "gcm" """
+    return "".join(w[0] for w in words)
+
+
+def trigrams(text: str):
+    return {text[i : i + 3] for i in range(len(text) - 2)}
+
+
+class FuzzyIndex:
+    """
+    命令名称/内容的内存模糊匹配索引：
+    - 倒排表预筛选：名称及单词首字母串的三元组、各单词的前缀，
+      按从少到多的顺序优先给最可能的候选打分，最后才顺序扫描全部命令
+    - 每次查询有时间上限，超时返回当前最好的结果，保证按键响应
+    - 连续输入(新查询以上次查询开头)时只在上次的完整结果中继续筛选
+    倒排表只追加，删除/修改后的失效项在打分时被过滤，积累过多时整体重建
+    """
+
+    def __init__(self, budget: float = 0.008) -> None:
+        self.budget = budget
+        self.commands = dict[int, Command]()
+        self._texts = dict[int, tuple[str, str, str]]()
+        self._grams = dict[str, list[int]]()
+        self._stale = 0
+        self._last_query = None
+        self._last_matches = None
+
+    def rebuild(self, commands: list[Command]):
+        self.commands.clear()
+        self._texts.clear()
+        self._grams.clear()
+        self._stale = 0
+        for cmd in commands:
+            self._add(cmd)
+        self._invalidate()
+
+    def apply_changes(self, inserted=(), updated=(), deleted_ids=()):
+        """增量更新，参数与DBService变更通知一致"""
+        for command_id in deleted_ids:
+            self._remove(command_id)
+        for cmd in updated:
+            self._remove(cmd.id)
+            self._add(cmd)
+        for cmd in inserted:
+            self._add(cmd)
+        self._invalidate()
+        if self._stale > max(len(self._texts), 1024):
+            self.rebuild(list(self.commands.values()))
+
+    def search(self, query: str, limit=50) -> list[Command]:
+        """返回按匹配分数从高到低排序的命令"""
+        query = "".join(query.lower().split())
+        if not query:
+            return []
+
+        deadline = time.perf_counter() + self.budget
+        if self._last_matches is not None and query.startswith(self._last_query):
+            tiers = [self._last_matches]
+        else:
+            tiers = self._candidate_tiers(query)
+
+        top = []  # 小顶堆，保存分数最高的limit条
+        matches = set()
+        seen = set()
+        complete = True
+        checked = 0
+        for tier in tiers:
+            for command_id in tier:
+                if command_id in seen:
+                    continue
+                seen.add(command_id)
+                texts = self._texts.get(command_id)
+                if texts is None:
+                    continue
+                score = self._score(texts, query)
+                if score is not None:
+                    matches.add(command_id)
+                    item = (score, -command_id)
+                    if len(top) < limit:
+                        heapq.heappush(top, item)
+                    elif item > top[0]:
+                        heapq.heapreplace(top, item)
+
+                checked += 1
+                if checked % 256 == 0 and time.perf_counter() > deadline:
+                    complete = False
+                    break
+            if not complete:
+                break
+
+        # 只有完整的结果才能用于下一次的增量筛选
+        self._last_query = query
+        self._last_matches = matches if complete else None
+        top.sort(reverse=True)
+        return [self.commands[-neg_id] for _, neg_id in top]
+
+    def _score(self, texts: tuple[str, str, str], query: str):
+        name, command, acronym = texts
+        best = None
+        for text, weight in ((name, NAME_WEIGHT), (command, 1.0)):
+            score = fuzzy_score(text, query)
+            if score is not None:
+                score *= weight
+                if best is None or score > best:
+                    best = score
+        if len(query) > 1 and query in acronym:
+            # 完整命中单词首字母，如 "gcm" -> "git commit -m"
+            best = (best or 0) + BONUS_BOUNDARY * len(query)
+        return best
+
+    def _candidate_tiers(self, query: str) -> list:
+        grams = self._grams
+        tiers = [grams[g] for g in trigrams(query) if g in grams]
+        tiers.sort(key=len)
+        if query[:2] in grams:
+            tiers.append(grams[query[:2]])
+        elif query in grams:
+            tiers.append(grams[query])
+        # 最后顺序扫描全部命令
+        tiers.append(self._texts.keys())
+        return tiers
+
+    def _add(self, cmd: Command):
+        name = (cmd.name or "").lower()
+        command = (cmd.command or "").lower()
+        words = split_words(name) + split_words(command)[:MAX_INDEXED_WORDS]
+        acronym = initials(words)
+        self.commands[cmd.id] = cmd
+        self._texts[cmd.id] = (name, command, acronym)
+        # 名称及首字母串的三元组、各单词的前1、2个字符
+        keys = trigrams(name) | trigrams(acronym)
+        keys.update(w[:2] for w in words)
+        for key in keys:
+            self._grams.setdefault(key, []).append(cmd.id)
+
+    def _remove(self, command_id):
+        if self._texts.pop(command_id, None) is None:
+            return
+        self.commands.pop(command_id, None)
+        # 倒排表中的旧项在查询时被过滤(仍会按新内容重新打分)
+        self._stale += 1
+
+    def _invalidate(self):
+        self._last_query = None
+        self._last_matches = None
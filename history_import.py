@@ -0,0 +1,270 @@
+import argparse
+from collections.abc import Iterator
+import hashlib
+import os
+import re
+import sys
+import time
+from command import Command
+from dbservice import DBService, DUPLICATE_KEEP_BOTH
+
+SHELL_BASH = "bash"
+SHELL_ZSH = "zsh"
+SHELL_POWERSHELL = "powershell"
+SHELLS = (SHELL_BASH, SHELL_ZSH, SHELL_POWERSHELL)
+
+# 忽略过短/过长的命令
+MIN_COMMAND_LENGTH = 3
+MAX_COMMAND_LENGTH = 4096
+# 没有时间戳时，按行号计算新近程度的半衰期(行)
+RECENCY_HALF_LIFE_LINES = 2000
+# 有时间戳时的半衰期(秒)
+RECENCY_HALF_LIFE_SECONDS = 30 * 24 * 3600
+# 每个事务写入的行数
+INSERT_CHUNK_SIZE = 10000
+NAME_MAX_LENGTH = 40
+
+ZSH_EXTENDED_PATTERN = re.compile(r"^: (\d+):\d+;(.*)$", re.S)
+BASH_TIMESTAMP_PATTERN = re.compile(r"^#(\d{9,})$")
+WHITESPACE_PATTERN = re.compile(r"\s+")
+
+
+class HistoryEntry:
+    """历史中的一条(去重后的)命令"""
+
+    __slots__ = ("command", "count", "last_seen", "shell", "score")
+
+    def __init__(self, command: str, shell: str) -> None:
+        self.command = command
+        self.count = 0
+        self.last_seen = 0
+        self.shell = shell
+        self.score = 0.0
+
+
+def default_history_paths() -> list[tuple[str, str]]:
+    """返回当前用户存在的 (shell, 历史文件路径) 列表"""
+    home = os.path.expanduser("~")
+    candidates = [
+        (SHELL_BASH, os.path.join(home, ".bash_history")),
+        (SHELL_ZSH, os.environ.get("HISTFILE") or os.path.join(home, ".zsh_history")),
+    ]
+    if appdata := os.environ.get("APPDATA"):
+        candidates.append(
+            (
+                SHELL_POWERSHELL,
+                os.path.join(
+                    appdata,
+                    "Microsoft",
+                    "Windows",
+                    "PowerShell",
+                    "PSReadLine",
+                    "ConsoleHost_history.txt",
+                ),
+            )
+        )
+    # Linux/macOS上的PowerShell
+    candidates.append(
+        (
+            SHELL_POWERSHELL,
+            os.path.join(
+                home,
+                ".local",
+                "share",
+                "powershell",
+                "PSReadLine",
+                "ConsoleHost_history.txt",
+            ),
+        )
+    )
+    return [(shell, path) for shell, path in candidates if os.path.isfile(path)]
+
+
+def guess_shell(path: str) -> str:
+    name = os.path.basename(path).lower()
+    if "zsh" in name:
+        return SHELL_ZSH
+    if name.endswith(".txt") or "powershell" in path.lower():
+        return SHELL_POWERSHELL
+    return SHELL_BASH
+
+
+def _unmetafy(line: bytes) -> bytes:
+    """zsh历史中非ASCII字节被转义为 0x83 + (字节 ^ 0x20)"""
+    if b"\x83" not in line:
+        return line
+    result = bytearray()
+    it = iter(line)
+    for b in it:
+        if b == 0x83:
+            b = next(it, 0x20) ^ 0x20
+        result.append(b)
+    return bytes(result)
+
+
+def read_history(path: str, shell: str) -> Iterator[tuple[str, int | None]]:
+    """
+    逐行读取历史文件(生成器)，合并多行命令
+    :return: (命令, 时间戳或None)
+    """
+    continuation = "`" if shell == SHELL_POWERSHELL else "\\"
+    timestamp = None
+    pending = []
+    with open(path, "rb") as f:
+        for raw in f:
+            if shell == SHELL_ZSH:
+                raw = _unmetafy(raw)
+            line = raw.decode("utf-8", errors="replace").rstrip("\r\n")
+
+            if not pending and shell == SHELL_BASH:
+                if m := BASH_TIMESTAMP_PATTERN.match(line):
+                    timestamp = int(m.group(1))
+                    continue
+
+            if line.endswith(continuation):
+                pending.append(line[:-1])
+                continue
+            pending.append(line)
+            entry = "\n".join(pending)
+            pending = []
+
+            if shell == SHELL_ZSH and (m := ZSH_EXTENDED_PATTERN.match(entry)):
+                yield m.group(2), int(m.group(1))
+            else:
+                yield entry, timestamp
+            timestamp = None
+
+    if pending:
+        yield "\n".join(pending), timestamp
+
+
+def normalize(command: str) -> str | None:
+    """去除首尾空白，单行命令中的连续空白合并；无效命令返回None"""
+    command = command.strip()
+    if "\n" not in command:
+        command = WHITESPACE_PATTERN.sub(" ", command)
+    if not MIN_COMMAND_LENGTH <= len(command) <= MAX_COMMAND_LENGTH:
+        return None
+    if command.startswith("#"):
+        return None
+    return command
+
+
+def collect_history(sources: list[tuple[str, str]]) -> dict[bytes, HistoryEntry]:
+    """流式读取各历史文件，按内容哈希去重并统计次数和最近出现时间"""
+    entries = dict[bytes, HistoryEntry]()
+    now = int(time.time())
+    # 没有时间戳时按行号计算先后，每行相当于的秒数
+    seconds_per_line = RECENCY_HALF_LIFE_SECONDS / RECENCY_HALF_LIFE_LINES
+    for shell, path in sources:
+        line_no = 0
+        positions = dict[bytes, int]()
+        for raw_command, timestamp in read_history(path, shell):
+            line_no += 1
+            command = normalize(raw_command)
+            if command is None:
+                continue
+            key = hashlib.blake2b(command.encode("utf-8"), digest_size=16).digest()
+            entry = entries.get(key)
+            if entry is None:
+                entry = entries[key] = HistoryEntry(command, shell)
+            entry.count += 1
+            if timestamp is not None:
+                entry.last_seen = max(entry.last_seen, timestamp)
+            else:
+                positions[key] = line_no
+
+        # 行号换算为时间：文件末尾视为当前时间
+        for key, position in positions.items():
+            entry = entries[key]
+            last_seen = int(now - (line_no - position) * seconds_per_line)
+            entry.last_seen = max(entry.last_seen, last_seen)
+    return entries
+
+
+def rank_entries(entries, limit=None, min_count=1) -> list[HistoryEntry]:
+    """按频率与新近程度排序: 次数 * 0.5^(距今时间/半衰期)"""
+    now = time.time()
+    ranked = []
+    for entry in entries:
+        if entry.count < min_count:
+            continue
+        age = max(now - entry.last_seen, 0)
+        entry.score = entry.count * 0.5 ** (age / RECENCY_HALF_LIFE_SECONDS)
+        ranked.append(entry)
+    ranked.sort(key=lambda e: e.score, reverse=True)
+    return ranked[:limit] if limit else ranked
+
+
+def make_command(entry: HistoryEntry) -> Command:
+    first_line = entry.command.split("\n", 1)[0]
+    name = first_line[:NAME_MAX_LENGTH]
+    if len(first_line) > NAME_MAX_LENGTH or "\n" in entry.command:
+        name += "…"
+    return Command(name, entry.command, f"来自{entry.shell}历史, 使用{entry.count}次")
+
+
+def import_history(
+    db_service: DBService,
+    sources: list[tuple[str, str]] | None = None,
+    limit=None,
+    min_count=1,
+    dry_run=False,
+) -> list[HistoryEntry]:
+    """
+    导入shell历史：去重、剔除已存在的命令、排序后分块批量写入
+    :return: 选中(并已写入，dry_run时不写入)的条目
+    """
+    sources = default_history_paths() if sources is None else sources
+    entries = collect_history(sources)
+
+    # 按命令内容一次性查出已存在的命令(走索引)
+    existing = db_service.find_ids_by_command(e.command for e in entries.values())
+    candidates = (e for e in entries.values() if e.command not in existing)
+    selected = rank_entries(candidates, limit, min_count)
+
+    if not dry_run:
+        # 已按哈希去重并剔除已存在的命令，写入时无需再次查重
+        for i in range(0, len(selected), INSERT_CHUNK_SIZE):
+            chunk = selected[i : i + INSERT_CHUNK_SIZE]
+            db_service.bulk_save_commands(
+                [make_command(e) for e in chunk], DUPLICATE_KEEP_BOTH
+            )
+    return selected
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="从shell历史导入命令")
+    parser.add_argument("paths", nargs="*", help="历史文件，默认自动查找")
+    parser.add_argument("--shell", choices=SHELLS, help="历史文件的格式")
+    parser.add_argument("--limit", type=int, help="最多导入的条数")
+    parser.add_argument("--min-count", type=int, default=1, help="最少使用次数")
+    parser.add_argument("--dry-run", action="store_true", help="只列出不导入")
+    parser.add_argument("--db", default="commands.db", help="数据库文件")
+    args = parser.parse_args(argv)
+
+    if args.paths:
+        sources = [(args.shell or guess_shell(p), p) for p in args.paths]
+    else:
+        sources = default_history_paths()
+    if not sources:
+        print("没有找到历史文件", file=sys.stderr)
+        return 1
+
+    db_service = DBService(args.db)
+    try:
+        selected = import_history(
+            db_service, sources, args.limit, args.min_count, args.dry_run
+        )
+    finally:
+        db_service.close()
+
+    for entry in selected[:20]:
+        print(f"{entry.count:6d}  {entry.command}")
+    action = "可导入" if args.dry_run else "已导入"
+    print(f"{action} {len(selected)} 条")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
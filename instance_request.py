@@ -0,0 +1,23 @@
+"""
+后启动的实例转发给运行中实例的请求，与平台无关
+"""
+
+REQUEST_SHOW = "show"
+REQUEST_RUN = "run"
+REQUEST_SEARCH = "search"
+
+
+def parse_request(argv: list[str]) -> dict:
+    """
+    启动参数转换为请求:
+    无参数 显示窗口；--run <名称|id> 执行命令；--search <关键词> 搜索
+    """
+    for option, action, key in (
+        ("--run", REQUEST_RUN, "target"),
+        ("--search", REQUEST_SEARCH, "text"),
+    ):
+        if option in argv:
+            index = argv.index(option)
+            if index + 1 < len(argv):
+                return {"action": action, key: argv[index + 1]}
+    return {"action": REQUEST_SHOW}
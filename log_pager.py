@@ -0,0 +1,137 @@
+import tkinter as tk
+from tkinter import ttk, font as tkfont
+from output_log import OutputLogReader
+from resource_monitor import format_bytes
+
+
+class LogPagerWindow:
+    """
+    分页查看输出日志：Text中只渲染可见的行，滚动时通过OutputLogReader
+    读取对应的块，内存占用与日志大小无关。日志仍在写入时定时读取新增部分
+    """
+
+    refresh_interval = 1000
+
+    def __init__(self, root: tk.Tk, path: str, title: str):
+        self.root = root
+        self.reader = OutputLogReader(path)
+        self.offset = 0  # 窗口第一行在日志中的位置
+        self._after_id = None
+
+        self.window = tk.Toplevel(root)
+        self.window.title(f"输出日志: {title}")
+        self.window.geometry("900x600")
+        self.window.protocol("WM_DELETE_WINDOW", self.close)
+
+        toolbar = ttk.Frame(self.window)
+        toolbar.pack(fill=tk.X, padx=5, pady=5)
+        self.info_var = tk.StringVar()
+        ttk.Label(toolbar, textvariable=self.info_var).pack(side=tk.LEFT)
+        self.follow_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(
+            toolbar, text="跟随末尾", variable=self.follow_var, command=self.refresh
+        ).pack(side=tk.RIGHT, padx=5)
+        self.goto_var = tk.StringVar()
+        goto_entry = ttk.Entry(toolbar, textvariable=self.goto_var, width=10)
+        goto_entry.pack(side=tk.RIGHT)
+        goto_entry.bind("<Return>", lambda e: self.goto_line())
+        ttk.Label(toolbar, text="跳转到行").pack(side=tk.RIGHT, padx=5)
+
+        frame = ttk.Frame(self.window)
+        frame.pack(fill=tk.BOTH, expand=True, padx=5, pady=(0, 5))
+        self.scrollbar = ttk.Scrollbar(frame, command=self.scroll)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        xscrollbar = ttk.Scrollbar(frame, orient=tk.HORIZONTAL)
+        xscrollbar.pack(side=tk.BOTTOM, fill=tk.X)
+        self.font = tkfont.nametofont("TkFixedFont")
+        self.text = tk.Text(
+            frame, wrap=tk.NONE, font=self.font, xscrollcommand=xscrollbar.set
+        )
+        self.text.pack(fill=tk.BOTH, expand=True)
+        xscrollbar.config(command=self.text.xview)
+
+        self.text.bind("<Configure>", lambda e: self.render())
+        self.text.bind("<MouseWheel>", self.on_mouse_wheel)
+        for seq, func in (
+            ("<Button-4>", lambda: self.scroll("scroll", -3, "units")),
+            ("<Button-5>", lambda: self.scroll("scroll", 3, "units")),
+            ("<Prior>", lambda: self.scroll("scroll", -1, "pages")),
+            ("<Next>", lambda: self.scroll("scroll", 1, "pages")),
+            ("<Up>", lambda: self.scroll("scroll", -1, "units")),
+            ("<Down>", lambda: self.scroll("scroll", 1, "units")),
+            ("<Control-Home>", lambda: self.goto(0)),
+            ("<Control-End>", lambda: self.goto(self.reader.line_count)),
+        ):
+            # 阻止Text自身的滚动
+            self.text.bind(seq, lambda e, f=func: f() or "break")
+        self.text.focus_set()
+        self.refresh()
+
+    def visible_rows(self) -> int:
+        return max(1, self.text.winfo_height() // self.font.metrics("linespace"))
+
+    def refresh(self):
+        """读取日志新增的部分，跟随末尾时滚动到最后"""
+        self._after_id = None
+        if not self.window.winfo_exists():
+            return
+        self.reader.refresh()
+        self.info_var.set(
+            f"共 {self.reader.line_count} 行, {format_bytes(self.reader.size)}"
+        )
+        if self.follow_var.get():
+            self.goto(self.reader.line_count)
+        else:
+            self.render()
+        self._after_id = self.window.after(self.refresh_interval, self.refresh)
+
+    def goto(self, offset: int):
+        rows = self.visible_rows()
+        self.offset = max(0, min(offset, self.reader.line_count - rows))
+        self.render()
+
+    def goto_line(self):
+        try:
+            line = int(self.goto_var.get())
+        except ValueError:
+            return
+        self.follow_var.set(False)
+        self.goto(line - 1)
+
+    def render(self):
+        rows = self.visible_rows()
+        lines = self.reader.read_lines(self.offset, rows)
+        self.text.config(state=tk.NORMAL)
+        self.text.delete("1.0", tk.END)
+        self.text.insert("1.0", "\n".join(lines))
+        self.text.config(state=tk.DISABLED)
+        total = self.reader.line_count
+        if total:
+            self.scrollbar.set(self.offset / total, (self.offset + rows) / total)
+        else:
+            self.scrollbar.set(0, 1)
+
+    def scroll(self, *args):
+        """滚动条回调: ('moveto', 比例) 或 ('scroll', 数量, 'units'|'pages')"""
+        if not args:
+            return
+        if args[0] == "moveto":
+            self.goto(int(float(args[1]) * self.reader.line_count))
+            return
+        count = int(args[1])
+        if args[2] == "pages":
+            count *= self.visible_rows()
+        if count < 0:
+            # 向上滚动时不再跟随末尾
+            self.follow_var.set(False)
+        self.goto(self.offset + count)
+
+    def on_mouse_wheel(self, event):
+        self.scroll("scroll", -3 if event.delta > 0 else 3, "units")
+        return "break"
+
+    def close(self):
+        if self._after_id is not None:
+            self.window.after_cancel(self._after_id)
+        self.reader.close()
+        self.window.destroy()
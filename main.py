@@ -1,24 +1,60 @@
-from contextlib import nullcontext
+import os
+import sys
+
+if __name__ == "__main__" and os.name != "nt":
+    # 已有实例在运行时把请求转发给它后立即退出，不再导入界面相关的模块
+    from SingletonGuardPosix import SingletonGuardPosix
+
+    SingletonGuardPosix.forward_if_running("CmdManager.lock", sys.argv[1:])
+
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
-import subprocess
-from dbservice import DBService
+from dbservice import (
+    DBService,
+    DUPLICATE_KEEP_BOTH,
+    DUPLICATE_OVERWRITE,
+    DUPLICATE_SKIP,
+)
 from command import Command
-import SingletonGuardWin as sgw
+from command_store import CommandStore
+from console import OutputConsole
+from virtual_list import VirtualTreeview
+from search import CommandSearcher
+from fuzzy import FuzzyIndex
+from quick_launch import QuickLaunchPopup
+from stats_view import ExecutionStatsWindow
+from perf_view import PerformanceWindow
+from log_pager import LogPagerWindow
+from output_log import log_files, prune_logs
+from resource_monitor import format_bytes
+from result_cache import ResultCache, CachedResult
+from scheduler import Schedule, Scheduler
+from schedule_dialog import ScheduleDialog
+from template import CommandTemplate, check_template, format_values, is_template
+from template_dialog import TemplateRunDialog
+from tray_menu import TrayMenu
+from tag_tree import TagTreeview, MORE_PREFIX
+import transfer
+import history_import
+import tracing
+from tracing import traced
+import executor
+from executor import CommandExecutor, RunJob
+from cmdmanager import resolve_command
+import instance_request as ir
+
+if os.name != "nt":
+    # fcntl只在POSIX平台上存在
+    import SingletonGuardPosix as sgp
 from datetime import datetime as dt
-import os
-import sys
+import queue
 import threading
+import time
 import pystray
 from PIL import Image
 
-
-class TreeviewRowExtra:
-    def __init__(self, id: str, row_id: str, cmd: Command) -> None:
-        self.id = id
-        self.row_id = row_id
-        self.is_modified = False
-        self.cmd = cmd
+# 数据库方法的跟踪只在界面进程中包装，命令行启动时不导入tracing
+tracing.trace_methods("db", exclude=("transaction", "iter_commands"))(DBService)
 
 
 class CmdManager:
@@ -33,7 +69,33 @@ class CmdManager:
     normal_font = ("微软雅黑", 10)
     big_font = ("微软雅黑", 12)
     entry_placeholders = dict()
-    treeviewRowExtras = dict[str, TreeviewRowExtra]()
+    # 执行输出轮询间隔(ms)及每次轮询的处理时间上限(s)，保证界面约60fps
+    exec_poll_interval = 16
+    exec_poll_budget = 0.008
+    # 正在执行的命令变化后更新托盘菜单的延迟(ms)
+    tray_update_delay = 500
+    # 命令输出日志的目录及总大小上限，超过时启动后删除最旧的日志
+    output_log_dir = "logs"
+    max_log_bytes = 1024 * 1024 * 1024
+    batch_policy_names = (
+        (executor.POLICY_PARALLEL, "并发"),
+        (executor.POLICY_SEQUENTIAL, "顺序"),
+        (executor.POLICY_FAIL_FAST, "并发(失败即停)"),
+    )
+    virtual_list_threshold = 2000
+    duplicate_mode_names = (
+        (DUPLICATE_SKIP, "跳过"),
+        (DUPLICATE_OVERWRITE, "覆盖"),
+        (DUPLICATE_KEEP_BOTH, "都保留"),
+    )
+    transfer_filetypes = [("JSON Lines", "*.jsonl"), ("CSV文件", "*.csv")]
+    history_import_limit = 500
+    display_columns = ("selected", "name", "command", "remark")
+    search_display_columns = display_columns + ("match",)
+    # 可双击编辑的列及对应的命令字段
+    editable_columns = {"name": "name", "command": "command", "remark": "notes"}
+    # 搜索输入防抖(ms)
+    search_debounce = 150
 
     def __init__(self, root: tk.Tk):
         self.root = root
@@ -129,6 +191,22 @@ class CmdManager:
         self.remark_var.trace_add("write", lambda *args: self.update_button_states())
         self.entry_placeholders[self.remark_entry] = self.remark_placeholder
 
+        # 标签字段
+        self.tags_placeholder = "标签(逗号分隔)"
+        self.tags_var = tk.StringVar()
+        self.tags_entry = ttk.Entry(input_frame, textvariable=self.tags_var)
+        self.tags_entry.insert(0, self.tags_placeholder)
+        self.tags_entry.config(foreground="grey")
+        self.tags_entry.bind(
+            "<FocusIn>", lambda e: self.on_entry_focus_in(e, self.tags_placeholder)
+        )
+        self.tags_entry.bind(
+            "<FocusOut>", lambda e: self.on_entry_focus_out(e, self.tags_placeholder)
+        )
+        self.tags_entry.grid(row=0, column=4, sticky=tk.EW, padx=5)
+        self.tags_var.trace_add("write", lambda *args: self.update_button_states())
+        self.entry_placeholders[self.tags_entry] = self.tags_placeholder
+
         # 隐藏的id字段
         self.id_var = tk.StringVar()
         self.id_var.trace_add("write", lambda *args: self.update_button_states())
@@ -164,27 +242,149 @@ class CmdManager:
         )
         self.clear_inputs_button.grid(row=1, column=4, sticky=tk.EW, padx=5)
 
+        # 批量执行设置
+        batch_frame = ttk.Frame(input_frame)
+        batch_frame.grid(row=2, column=0, columnspan=5, sticky=tk.EW, padx=5, pady=5)
+        ttk.Label(batch_frame, text="批量执行策略").pack(side=tk.LEFT)
+        self.batch_policy_var = tk.StringVar(value=self.batch_policy_names[0][1])
+        ttk.Combobox(
+            batch_frame,
+            textvariable=self.batch_policy_var,
+            values=[name for _, name in self.batch_policy_names],
+            state="readonly",
+            width=12,
+        ).pack(side=tk.LEFT, padx=5)
+        ttk.Label(batch_frame, text="并发数").pack(side=tk.LEFT, padx=(10, 0))
+        self.batch_workers_var = tk.IntVar(value=os.cpu_count() or 1)
+        ttk.Spinbox(
+            batch_frame,
+            from_=1,
+            to=64,
+            textvariable=self.batch_workers_var,
+            width=5,
+        ).pack(side=tk.LEFT, padx=5)
+
+        ttk.Button(batch_frame, text="统计", command=self.show_stats).pack(
+            side=tk.RIGHT, padx=5
+        )
+        ttk.Button(
+            batch_frame, text="性能", command=lambda: self.perf_window.show()
+        ).pack(side=tk.RIGHT, padx=5)
+        ttk.Button(batch_frame, text="定时", command=self.show_schedules).pack(
+            side=tk.RIGHT, padx=5
+        )
+        # 导入/导出
+        ttk.Button(
+            batch_frame, text="导入历史", command=self.import_shell_history
+        ).pack(side=tk.RIGHT, padx=5)
+        ttk.Button(batch_frame, text="导出", command=self.export_commands).pack(
+            side=tk.RIGHT, padx=5
+        )
+        ttk.Button(batch_frame, text="导入", command=self.import_commands).pack(
+            side=tk.RIGHT, padx=5
+        )
+        self.duplicate_mode_var = tk.StringVar(value=self.duplicate_mode_names[0][1])
+        ttk.Combobox(
+            batch_frame,
+            textvariable=self.duplicate_mode_var,
+            values=[name for _, name in self.duplicate_mode_names],
+            state="readonly",
+            width=8,
+        ).pack(side=tk.RIGHT, padx=5)
+        ttk.Label(batch_frame, text="导入重复时").pack(side=tk.RIGHT)
+
+        # 执行选项
+        options_frame = ttk.Frame(input_frame)
+        options_frame.grid(row=3, column=0, columnspan=5, sticky=tk.EW, padx=5)
+        # 当前命令的结果缓存时间，0为不缓存
+        ttk.Label(options_frame, text="结果缓存(秒)").pack(side=tk.LEFT)
+        self.cache_ttl_var = tk.StringVar(value="0")
+        ttk.Spinbox(
+            options_frame,
+            from_=0,
+            to=7 * 24 * 3600,
+            increment=60,
+            textvariable=self.cache_ttl_var,
+            width=7,
+        ).pack(side=tk.LEFT, padx=5)
+        self.refresh_cache_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(
+            options_frame, text="命中时后台刷新", variable=self.refresh_cache_var
+        ).pack(side=tk.LEFT, padx=5)
+        # 当前命令的超时，0为使用默认超时
+        ttk.Label(options_frame, text="超时(秒)").pack(side=tk.LEFT, padx=(10, 0))
+        self.timeout_var = tk.StringVar(value="0")
+        ttk.Spinbox(
+            options_frame,
+            from_=0,
+            to=24 * 3600,
+            increment=10,
+            textvariable=self.timeout_var,
+            width=7,
+        ).pack(side=tk.LEFT, padx=5)
+        # 启用后命令中的 {{参数名}} 在执行前填写，否则按原样执行
+        self.template_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(
+            options_frame, text="模板参数", variable=self.template_var
+        ).pack(side=tk.LEFT, padx=5)
+        ttk.Label(options_frame, text="默认超时(秒)").pack(side=tk.LEFT, padx=(10, 0))
+        self.default_timeout_var = tk.StringVar(value="0")
+        self.default_timeout_var.trace_add(
+            "write", lambda *args: self.update_default_timeout()
+        )
+        ttk.Spinbox(
+            options_frame,
+            from_=0,
+            to=24 * 3600,
+            increment=10,
+            textvariable=self.default_timeout_var,
+            width=7,
+        ).pack(side=tk.LEFT, padx=5)
+        # 正在执行的命令，菜单打开时才生成
+        self.running_button = ttk.Menubutton(options_frame, text="正在执行")
+        self.running_menu = tk.Menu(
+            self.running_button, tearoff=False, postcommand=self.build_running_menu
+        )
+        self.running_button["menu"] = self.running_menu
+        self.running_button.pack(side=tk.RIGHT, padx=5)
+        ttk.Button(options_frame, text="输出日志", command=self.show_last_log).pack(
+            side=tk.RIGHT, padx=5
+        )
+
         # 命令列表容器
         self.cmd_list_frame = ttk.LabelFrame(self.main_frame, text="命令列表")
         self.cmd_list_frame.grid(
             row=2, column=0, sticky=tk.NSEW, padx=5, pady=5, columnspan=2
         )
 
+        # 搜索框
+        search_frame = ttk.Frame(self.cmd_list_frame)
+        search_frame.pack(fill=tk.X, padx=5, pady=(0, 5))
+        ttk.Label(search_frame, text="搜索").pack(side=tk.LEFT)
+        self.search_var = tk.StringVar()
+        self.search_entry = ttk.Entry(search_frame, textvariable=self.search_var)
+        self.search_entry.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
+        self.search_entry.bind("<Escape>", lambda e: self.search_var.set(""))
+        self.search_var.trace_add("write", lambda *args: self.on_search_changed())
+        self.search_after_id = None
+        self.search_seq = 0
+        self.search_active = False
+
         # 列表容器
         self.cmd_list_container = tk.Frame(self.cmd_list_frame)
         self.cmd_list_container.pack(fill=tk.BOTH, expand=True)
 
         # 滚动条
-        tree_scrollbar = tk.Scrollbar(self.cmd_list_container)
-        tree_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.tree_scrollbar = tk.Scrollbar(self.cmd_list_container)
+        self.tree_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
 
         # 命令列表
         self.cmd_tree = ttk.Treeview(
             self.cmd_list_container,
-            columns=("id", "name", "command", "remark", "selected"),
-            displaycolumns=("selected", "name", "command", "remark"),
+            columns=("id", "name", "command", "remark", "selected", "match"),
+            displaycolumns=self.display_columns,
             show="headings",
-            yscrollcommand=tree_scrollbar.set,
+            yscrollcommand=self.tree_scrollbar.set,
             # selectmode="extended", # 多选模式
         )
         self.cmd_tree.tag_configure(
@@ -208,39 +408,101 @@ class CmdManager:
             font=[("selected", self.big_font)],
         )
 
-        tree_scrollbar.config(command=self.cmd_tree.yview)
+        self.tree_scrollbar.config(command=self.cmd_tree.yview)
 
+        self.cmd_tree.heading("#0", text="标签")
+        self.cmd_tree.column("#0", width=120, stretch=False)
         self.cmd_tree.heading("selected", text="选择")
         self.cmd_tree.heading("name", text="名称")
         self.cmd_tree.heading("command", text="命令")
         self.cmd_tree.heading("remark", text="备注")
+        self.cmd_tree.heading("match", text="匹配")
         # 设置列宽可调整
         self.cmd_tree.column("selected", width=50, stretch=False)
         self.cmd_tree.column("name", width=100, stretch=True)
         self.cmd_tree.column("command", width=200, stretch=True)
         self.cmd_tree.column("remark", width=100, stretch=True)
+        self.cmd_tree.column("match", width=200, stretch=True)
 
         self.cmd_tree.pack(fill="both", expand=True)
         self.cmd_tree.bind("<Button-1>", self.on_treeview_click)
         self.cmd_tree.bind("<Double-1>", self.on_treeview_double_click)
 
         # 输出区域
-        output_frame = ttk.Frame(self.main_frame)
-        output_frame.grid(row=3, column=0, columnspan=2, sticky=tk.NSEW, padx=5, pady=5)
-
-        # 添加垂直滚动条
-        output_scrollbar = ttk.Scrollbar(output_frame)
-        output_scrollbar.pack(side="right", fill="y")
-
-        self.output_text = tk.Text(
-            output_frame, height=0, yscrollcommand=output_scrollbar.set
-        )
-        self.output_text.pack(side="left", fill=tk.BOTH, expand=True)
-        self.output_text.tag_config("error", foreground="red")
-        output_scrollbar.config(command=self.output_text.yview)
+        self.console = OutputConsole(self.main_frame, height=0)
+        self.console.grid(row=3, column=0, columnspan=2, sticky=tk.NSEW, padx=5, pady=5)
+        self.console.tag_config("error", foreground="red")
+
+        # 执行引擎：命令在工作线程中执行，输出通过队列交给Tk线程
+        self.executor = CommandExecutor(log_dir=self.output_log_dir)
+        self.last_output_job = None
+        # 最近一次写入了输出日志的执行
+        self.last_log_job = None
+        threading.Thread(
+            target=prune_logs,
+            args=(self.output_log_dir, self.max_log_bytes),
+            daemon=True,
+        ).start()
+        # 可缓存命令执行时收集的输出 {job.id: [(事件类型, 文本)]}
+        self.cache_outputs = dict[int, list]()
+        # 在后台刷新缓存、不在输出区显示的执行
+        self.cache_refresh_jobs = set[int]()
+        self.tray_update_pending = False
+        self.poll_exec_events()
 
         # 初始化数据库
         self.init_db()
+        # 命令数量超过阈值时使用虚拟列表，只渲染可见行
+        self.virtual_list = VirtualTreeview(
+            self.cmd_tree,
+            self.tree_scrollbar,
+            self.db_service,
+            self.render_virtual_window,
+        )
+        # 已加载命令及未保存编辑的唯一来源，Treeview只负责显示
+        self.store = CommandStore()
+        self.store.add_listener(self.on_store_changed)
+        # 有标签时按标签分层显示，文件夹展开时才加载其中的命令
+        self.tag_tree = TagTreeview(
+            self.cmd_tree, self.db_service, self.insert_command_row
+        )
+        self.searcher = CommandSearcher(self.db_service.db_name, self.on_search_result)
+        # 数据库写入后增量更新列表和快速启动索引
+        self.db_service.add_change_listener(self.on_commands_changed)
+        # 快速启动的模糊匹配索引，在后台线程中建立
+        self.fuzzy_index = None
+        self.pending_index_changes = []
+        self.build_fuzzy_index()
+        self.quick_launch = QuickLaunchPopup(
+            self.root,
+            lambda: self.fuzzy_index,
+            lambda cmd: self.run(cmd.command, cmd.name, cmd.id),
+            font=self.big_font,
+        )
+        self.stats_window = ExecutionStatsWindow(
+            self.root, self.db_service, self.show_log
+        )
+        self.perf_window = PerformanceWindow(self.root)
+        self.result_cache = ResultCache(self.db_service)
+        self.template_dialog = TemplateRunDialog(self.root, self.run_template)
+        # 托盘的命令菜单快照，数据变更后在后台重建
+        self.tray_menu = TrayMenu(
+            self.db_service.db_name,
+            lambda cmd: self.root.after(
+                0, lambda: self.run(str(cmd.command), cmd.name, cmd.id)
+            ),
+            lambda: self.root.after(0, self.update_tray_menu),
+            self.report_background_error,
+        )
+        # 定时执行在调度线程中直接提交给执行引擎
+        self.scheduler = Scheduler(
+            self.db_service.db_name, self.run_scheduled, self.report_background_error
+        )
+        self.scheduler.start()
+        self.schedule_dialog = ScheduleDialog(
+            self.root, self.db_service, self.scheduler.reload
+        )
+        self.root.bind_all("<Control-k>", lambda e: self.show_quick_launch())
         # 加载已存储命令
         self.load_commands()
 
@@ -286,10 +548,14 @@ class CmdManager:
         ico = Image.open(resource_path("app.ico"))
         menu = pystray.Menu(
             pystray.MenuItem("显示窗口", self.show_window, default=True),
+            pystray.MenuItem(
+                "快速启动", lambda *args: self.root.after(0, self.show_quick_launch)
+            ),
             pystray.MenuItem(
                 "命令",
-                pystray.Menu(self.show_cmds_submenu),
+                pystray.Menu(self.tray_menu.items),
             ),
+            pystray.MenuItem("正在执行", pystray.Menu(self.running_tray_items)),
             pystray.Menu.SEPARATOR,
             pystray.MenuItem("退出", self.quit_app),
         )
@@ -307,17 +573,59 @@ class CmdManager:
 
         self.root.after(0, lambda: _show())
 
-    def show_cmds_submenu(self):
-        menu_items = []
-        for e in self.treeviewRowExtras.values():
-            c = str(e.cmd.command)
-            mi = pystray.MenuItem(
-                e.cmd.name,
-                lambda *args, cmd=c: self.run(cmd),
-            )
-            menu_items.append(mi)
+    def handle_instance_request(self, request: dict) -> dict:
+        """处理其他实例转发的请求(在接收线程中调用)，返回应答"""
+        result = queue.Queue()
+        self.root.after(0, lambda: result.put(self.apply_instance_request(request)))
+        try:
+            return result.get(timeout=1)
+        except queue.Empty:
+            # 界面繁忙，请求已排队
+            return {"ok": True}
+
+    def apply_instance_request(self, request: dict) -> dict:
+        """在Tk线程中执行请求：显示窗口、执行命令或搜索"""
+        action = request.get("action")
+        if action == ir.REQUEST_SHOW:
+            self.show_window(None)
+        elif action == ir.REQUEST_SEARCH:
+            self.show_window(None)
+            self.search_var.set(request.get("text", ""))
+            self.search_entry.focus_set()
+        elif action == ir.REQUEST_RUN:
+            target = str(request.get("target", ""))
+            matches = resolve_command(self.db_service, target)
+            if not matches:
+                return {"ok": False, "error": f"没有找到命令: {target}"}
+            if len(matches) > 1:
+                return {"ok": False, "error": f"有多条命令名为 {target}，请使用id"}
+            cmd = matches[0]
+            job = self.run(cmd.command, cmd.name, cmd.id)
+            return {"ok": True, "job": job.id if job is not None else None}
+        else:
+            return {"ok": False, "error": f"未知的请求: {action}"}
+        return {"ok": True}
+
+    def report_background_error(self, message: str):
+        """后台线程(调度、托盘菜单)的错误显示在控制台，程序只在托盘中运行时也能看到"""
+        self.root.after(0, lambda: self.console.write(f"\n{message}\n", "error"))
+
+    def update_tray_menu(self):
+        """新的菜单快照已发布"""
+        if hasattr(self, "tray_icon") and self.tray_icon:
+            self.tray_icon.update_menu()
+
+    def schedule_tray_update(self):
+        """正在执行的命令变化后更新托盘菜单，短时间内的多次变化只更新一次"""
+        if self.tray_update_pending:
+            return
+        self.tray_update_pending = True
 
-        return menu_items
+        def update():
+            self.tray_update_pending = False
+            self.update_tray_menu()
+
+        self.root.after(self.tray_update_delay, update)
 
     def quit_app(self, icon):
         # 使用线程安全方式停止托盘图标
@@ -325,6 +633,7 @@ class CmdManager:
             if not hasattr(self, "tray_icon") or not self.tray_icon:
                 return
 
+            self.scheduler.stop()
             self.tray_icon.stop()
             self.root.quit()
             self.root.destroy()
@@ -354,104 +663,437 @@ class CmdManager:
         except Exception as e:
             messagebox.showerror("初始化错误", f"无法初始化数据库: {str(e)}")
 
-    def load_commands(self):
-        try:
-            commands = self.db_service.get_commands()
-            self.cmd_tree.delete(*self.cmd_tree.get_children())
-            self.treeviewRowExtras.clear()
+    def export_commands(self):
+        """在后台线程中导出命令库"""
+        path = filedialog.asksaveasfilename(
+            title="导出命令",
+            defaultextension=".jsonl",
+            filetypes=self.transfer_filetypes,
+        )
+        if not path:
+            return
 
-            if not commands:
-                vals = ("", "没有存储的命令", "", "", self.unchecked_symbol)
-                self.cmd_tree.insert("", tk.END, values=vals)
-                return
-            # print(f"加载的命令: {commands}")  # 调试信息
-            for cmd in commands:
-                vals = (
-                    cmd.id,
-                    cmd.name,
-                    cmd.command,
-                    cmd.notes or "",
-                    self.unchecked_symbol,
+        def progress(count):
+            self.root.after(0, lambda: self.console.write(f"\n已导出{count}条"))
+
+        self.run_transfer(
+            lambda db: transfer.export_commands(db, path, progress=progress),
+            lambda count: f"导出完成: {count}条 -> {path}",
+        )
+
+    def import_commands(self):
+        """在后台线程中导入命令，完成后重新加载列表"""
+        path = filedialog.askopenfilename(
+            title="导入命令", filetypes=self.transfer_filetypes
+        )
+        if not path:
+            return
+        mode_name = self.duplicate_mode_var.get()
+        mode = next(m for m, name in self.duplicate_mode_names if name == mode_name)
+
+        def progress(result):
+            total = result.total
+            self.root.after(0, lambda: self.console.write(f"\n已处理{total}条"))
+
+        def done(result):
+            self.reload_after_bulk_write()
+            return (
+                f"导入完成: 共{result.total}条, 新增{result.inserted}, "
+                f"覆盖{result.overwritten}, 跳过{result.skipped}"
+            )
+
+        self.run_transfer(
+            lambda db: transfer.import_commands(
+                db, path, on_duplicate=mode, progress=progress
+            ),
+            done,
+        )
+
+    def import_shell_history(self):
+        """从bash/zsh/PowerShell历史中导入最常用的命令"""
+        sources = history_import.default_history_paths()
+        if not sources:
+            messagebox.showinfo("提示", "没有找到shell历史文件")
+            return
+        paths = "\n".join(path for _, path in sources)
+        limit = self.history_import_limit
+        confirm_msg = f"从以下历史文件导入最常用的{limit}条命令?\n{paths}"
+        if not messagebox.askyesno("确认", confirm_msg):
+            return
+
+        def done(selected):
+            self.reload_after_bulk_write()
+            return f"已从shell历史导入{len(selected)}条命令"
+
+        self.run_transfer(
+            lambda db: history_import.import_history(db, sources, limit=limit),
+            done,
+        )
+
+    def reload_after_bulk_write(self):
+        """其他连接批量写入后，重新加载列表和快速启动索引"""
+        self.load_commands()
+        self.fuzzy_index = None
+        self.build_fuzzy_index()
+
+    def run_transfer(self, action, on_done):
+        """导入/导出使用独立的数据库连接在后台线程中执行"""
+        db_name = self.db_service.db_name
+
+        def worker():
+            db_service = DBService(db_name)
+            try:
+                result = action(db_service)
+            except Exception as e:
+                error = str(e)
+                self.root.after(
+                    0, lambda: messagebox.showerror("错误", f"导入/导出失败: {error}")
                 )
-                row_id = self.cmd_tree.insert("", tk.END, values=vals)
-                self.treeviewRowExtras[cmd.id] = TreeviewRowExtra(cmd.id, row_id, cmd)
+                return
+            finally:
+                db_service.close()
+            self.root.after(0, lambda: self.console.write(f"\n{on_done(result)}\n"))
 
-            if hasattr(self, "tray_icon") and self.tray_icon:
-                self.tray_icon.update_menu()
+        threading.Thread(target=worker, daemon=True).start()
+
+    @traced("ui.load_commands")
+    def load_commands(self):
+        try:
+            self.store.clear()
+            if self.db_service.has_tags():
+                self.virtual_list.disable()
+                self.tag_tree.enable()
+            else:
+                self.tag_tree.disable()
+                total = self.db_service.count_commands()
+                if total > self.virtual_list_threshold:
+                    self.virtual_list.enable(total)
+                else:
+                    self.virtual_list.disable()
+                    self.render_commands(self.db_service.get_commands())
+            self.tray_menu.invalidate()
 
         except Exception as e:
             messagebox.showerror("加载错误", f"无法加载命令: {str(e)}")
             # 调试信息
             print(f"加载命令时出错: {e}")
 
+    @traced("ui.render_commands")
+    def render_commands(
+        self, commands: list[Command], selected_ids=(), snippets=None
+    ):
+        """在Treeview中渲染命令"""
+        self.cmd_tree.delete(*self.cmd_tree.get_children())
+        self.store.clear_rows()
+
+        if not commands:
+            text = "没有匹配的命令" if self.search_active else "没有存储的命令"
+            vals = ("", text, "", "", self.unchecked_symbol, "")
+            self.cmd_tree.insert("", tk.END, values=vals)
+            return
+        # print(f"加载的命令: {commands}")  # 调试信息
+        for cmd in commands:
+            selected = str(cmd.id) in selected_ids
+            snippet = snippets.get(cmd.id, "") if snippets else ""
+            row_id = self.insert_command_row("", cmd, selected, snippet)
+            if selected:
+                self.cmd_tree.selection_add(row_id)
+
+    def insert_command_row(self, parent: str, cmd: Command, selected=False, snippet=""):
+        """插入一行命令，有未保存的编辑时显示编辑后的内容"""
+        cmd = self.store.put(cmd)
+        vals = (
+            cmd.id,
+            cmd.name,
+            cmd.command,
+            cmd.notes or "",
+            self.checked_symbol if selected else self.unchecked_symbol,
+            snippet,
+        )
+        row_id = self.cmd_tree.insert(
+            parent, tk.END, values=vals, tags=("selected",) if selected else ()
+        )
+        self.store.add_row(row_id, cmd.id)
+        return row_id
+
+    def on_store_changed(self, command_ids: list[int]):
+        """命令被编辑或保存后刷新显示它的各行"""
+        for command_id in command_ids:
+            cmd = self.store.get(command_id)
+            for row_id in self.store.rows_of(command_id):
+                self.cmd_tree.set(row_id, "name", cmd.name)
+                self.cmd_tree.set(row_id, "command", cmd.command)
+                self.cmd_tree.set(row_id, "remark", cmd.notes or "")
+
+    def selected_command_rows(self) -> list[str]:
+        """选中的命令行(不含文件夹行)"""
+        return [
+            item
+            for item in self.cmd_tree.selection()
+            if TagTreeview.is_command_row(item)
+        ]
+
+    @traced("ui.render_virtual_window")
+    def render_virtual_window(self, commands: list[Command]):
+        """虚拟列表窗口变化时重新渲染，保留仍可见行的选中状态(编辑保留在store中)"""
+        selected_ids = {
+            str(self.store.id_of(item)) for item in self.selected_command_rows()
+        }
+        self.render_commands(commands, selected_ids)
+
+    def refresh_tag_tree(self):
+        """重新加载文件夹及已展开的命令，未保存的编辑保留在store中"""
+        self.store.clear_rows()
+        self.tag_tree.refresh()
+
+    def on_commands_changed(self, inserted, updated, deleted_ids):
+        """数据库变更通知"""
+        self.apply_command_changes(inserted, updated, deleted_ids)
+        self.tray_menu.invalidate()
+        if updated or deleted_ids:
+            # 定时设置中的命令内容已变化
+            self.scheduler.reload()
+        if self.fuzzy_index is None:
+            self.pending_index_changes.append((inserted, updated, deleted_ids))
+        else:
+            self.fuzzy_index.apply_changes(inserted, updated, deleted_ids)
+
+    def build_fuzzy_index(self):
+        """在后台线程中使用独立连接建立模糊匹配索引"""
+        db_name = self.db_service.db_name
+
+        def build():
+            db_service = DBService(db_name)
+            try:
+                index = FuzzyIndex()
+                index.rebuild(db_service.get_commands())
+            finally:
+                db_service.close()
+            self.root.after(0, lambda: self.on_fuzzy_index_ready(index))
+
+        threading.Thread(target=build, daemon=True).start()
+
+    def on_fuzzy_index_ready(self, index: FuzzyIndex):
+        # 应用建立索引期间发生的变更
+        for changes in self.pending_index_changes:
+            index.apply_changes(*changes)
+        self.pending_index_changes.clear()
+        self.fuzzy_index = index
+        self.quick_launch.refresh_if_visible()
+
+    def show_quick_launch(self):
+        self.quick_launch.show()
+
+    @traced("ui.apply_command_changes")
+    def apply_command_changes(self, inserted=(), updated=(), deleted_ids=()):
+        """将数据库中新增/修改/删除的行增量应用到Treeview"""
+        if not inserted and not updated and not deleted_ids:
+            return
+
+        # 已显示的行由store的变更通知更新
+        deleted_rows = [row for cid in deleted_ids for row in self.store.remove(cid)]
+        self.store.update(updated)
+
+        if self.search_active:
+            # 搜索结果按相关度排序，重新搜索即可
+            self.start_search()
+        elif self.tag_tree.enabled != self.db_service.has_tags():
+            # 添加了第一个标签或移除了最后一个标签，切换显示方式
+            self.load_commands()
+        elif self.tag_tree.enabled:
+            # 只重新读取顶层及已展开的文件夹
+            self.refresh_tag_tree()
+        elif self.virtual_list.enabled:
+            # 虚拟列表只需重新获取可见窗口
+            changed_ids = [cmd.id for cmd in inserted] + list(deleted_ids)
+            if changed_ids:
+                self.virtual_list.forget_anchors(min(changed_ids))
+            self.virtual_list.total += len(inserted) - len(deleted_ids)
+            self.virtual_list.refresh()
+        else:
+            if deleted_rows:
+                self.cmd_tree.delete(*deleted_rows)
+
+            if inserted and not self.store:
+                # 移除“没有存储的命令”占位行
+                self.cmd_tree.delete(*self.cmd_tree.get_children())
+            for cmd in inserted:
+                self.insert_command_row("", cmd)
+
+            if not self.store:
+                self.render_commands([])
+
+        if hasattr(self, "tray_icon") and self.tray_icon:
+            self.tray_icon.update_menu()
+
+    def on_search_changed(self):
+        """输入变化后延迟搜索，避免每次按键都查询"""
+        if self.search_after_id:
+            self.root.after_cancel(self.search_after_id)
+        self.search_after_id = self.root.after(self.search_debounce, self.start_search)
+
+    def start_search(self):
+        self.search_after_id = None
+        text = self.search_var.get().strip()
+        if text:
+            self.search_seq = self.searcher.search(text)
+            return
+
+        self.search_seq = 0
+        if self.search_active:
+            self.search_active = False
+            self.cmd_tree.config(displaycolumns=self.display_columns)
+            self.load_commands()
+
+    def on_search_result(self, seq: int, text: str, results):
+        """搜索线程回调，转到Tk线程处理"""
+        self.root.after(0, lambda: self.show_search_results(seq, results))
+
+    def show_search_results(self, seq: int, results):
+        if seq != self.search_seq:
+            # 过期的结果
+            return
+        if not self.search_active:
+            self.search_active = True
+            self.virtual_list.disable()
+            self.tag_tree.disable()
+            self.store.clear()
+            self.cmd_tree.config(displaycolumns=self.search_display_columns)
+        snippets = {cmd.id: snippet for cmd, snippet in results}
+        self.render_commands([cmd for cmd, _ in results], snippets=snippets)
+
     def edit_command(self, item):
         """编辑命令"""
         try:
-            item_values = self.cmd_tree.item(item, "values")
-            print(f"原始值: {item_values}")  # 调试信息
-
-            item_id = item_values[0] if len(item_values) > 0 else ""
+            cmd = self.store.command_at(item)
+            item_id = cmd.id if cmd else ""
             self.id_var.set(item_id)
 
             self.name_entry.delete(0, tk.END)
             self.cmd_entry.delete(0, tk.END)
             self.remark_entry.delete(0, tk.END)
 
-            if len(item_values) >= 3:
-                self.name_entry.insert(0, item_values[1])
-                self.cmd_entry.insert(0, item_values[2])
-                self.remark_entry.insert(0, item_values[3])
+            if cmd:
+                self.name_entry.insert(0, cmd.name)
+                self.cmd_entry.insert(0, cmd.command)
+                self.remark_entry.insert(0, cmd.notes or "")
+
+            self.tags_entry.delete(0, tk.END)
+            self.cache_ttl_var.set("0")
+            self.timeout_var.set("0")
+            self.template_var.set(False)
+            if item_id:
+                tags = self.db_service.get_command_tags([int(item_id)])
+                self.tags_entry.insert(0, ", ".join(tags.get(int(item_id), [])))
+                ttl = self.db_service.get_cache_ttls([int(item_id)]).get(int(item_id))
+                self.cache_ttl_var.set(f"{ttl:g}" if ttl else "0")
+                timeouts = self.db_service.get_command_timeouts([int(item_id)])
+                timeout = timeouts.get(int(item_id))
+                self.timeout_var.set(f"{timeout:g}" if timeout else "0")
+                templates = self.db_service.get_template_ids([int(item_id)])
+                self.template_var.set(bool(templates))
         except Exception as e:
             messagebox.showerror("错误", f"编辑命令失败: {str(e)}")
 
+    @traced("ui.save_command")
     def save_command(self):
         """保存当前命令"""
         try:
-            update_items = []
-            for extra in self.treeviewRowExtras.values():
-                if not extra.is_modified:
-                    continue
-
-                values = self.cmd_tree.item(extra.row_id, "values")
-                cmd = Command(values[1], values[2], values[3], id=extra.id)
-                update_items.append(cmd)
+            # 列表中编辑过的命令，包括已滚出虚拟列表窗口的
+            update_items = self.store.dirty_commands()
 
             name = self.name_entry.get().strip(self.name_placeholder)
             command = self.cmd_entry.get().strip(self.cmd_placeholder)
             remark = self.remark_entry.get().strip(self.remark_placeholder)
-
+            tags = self.get_input_tags()
+            cache_ttl = self.get_input_seconds(self.cache_ttl_var)
+            timeout = self.get_input_seconds(self.timeout_var)
+            template = self.template_var.get()
             if len(update_items) == 0 and (not name or not command):
                 messagebox.showwarning("警告", "名称和命令不能为空")
                 return
+            # 启用了模板参数的命令在保存时解析校验，没有占位符时抛出TemplateError
+            names = check_template(command) if template and command else ()
+            inline_templates = self.db_service.get_template_ids(
+                c.id for c in update_items
+            )
+            for cmd in update_items:
+                if cmd.id in inline_templates:
+                    check_template(cmd.command)
 
             itemid = self.id_var.get()
             did_save_item = False
             if itemid:
-                # 避免输入框与treeview行重复
-                if itemid not in self.treeviewRowExtras:
-                    update_items.append(Command(name, command, remark, itemid))
+                # 同一命令也在列表中编辑过时，以输入框为准
+                update_items = [c for c in update_items if c.id != int(itemid)]
+                update_items.append(Command(name, command, remark, int(itemid)))
+                current = self.db_service.get_command_tags([int(itemid)])
+                if current.get(int(itemid), []) != sorted(tags):
+                    self.db_service.set_command_tags(int(itemid), tags)
+                ttls = self.db_service.get_cache_ttls([int(itemid)])
+                if ttls.get(int(itemid), 0) != cache_ttl:
+                    self.db_service.set_cache_ttl(int(itemid), cache_ttl)
+                timeouts = self.db_service.get_command_timeouts([int(itemid)])
+                if timeouts.get(int(itemid), 0) != timeout:
+                    self.db_service.set_command_timeout(int(itemid), timeout)
+                templates = self.db_service.get_template_ids([int(itemid)])
+                if bool(templates) != template:
+                    self.db_service.set_command_template(int(itemid), template)
             elif name and command:
-                self.db_service.save_command(Command(name, command, remark))
+                with self.db_service.transaction():
+                    cmd = self.db_service.save_command(Command(name, command, remark))
+                    if tags:
+                        self.db_service.set_command_tags(cmd.id, tags)
+                    if cache_ttl:
+                        self.db_service.set_cache_ttl(cmd.id, cache_ttl)
+                    if timeout:
+                        self.db_service.set_command_timeout(cmd.id, timeout)
+                    if template:
+                        self.db_service.set_command_template(cmd.id, True)
                 did_save_item = True
 
-            did_update_item = False
+            # Treeview由数据库变更通知(on_commands_changed)增量更新，无需整表重新加载
             if len(update_items) > 0:
                 self.db_service.update_commands(update_items)
-                did_update_item = True
-
-            if did_save_item or did_update_item:
-                self.load_commands()
+            if names:
+                self.console.write(
+                    f"\n[{name}] 模板参数: {', '.join(names)}\n", "separator"
+                )
 
             if did_save_item:
                 # 清空输入框
                 self.name_entry.delete(0, tk.END)
                 self.cmd_entry.delete(0, tk.END)
                 self.remark_entry.delete(0, tk.END)
+                self.tags_entry.delete(0, tk.END)
+                self.cache_ttl_var.set("0")
+                self.timeout_var.set("0")
+                self.template_var.set(False)
                 self.id_var.set("")
 
         except Exception as e:
             messagebox.showerror("错误", f"保存命令失败: {str(e)}")
 
+    def get_input_seconds(self, var: tk.StringVar) -> float:
+        """缓存时间、超时等秒数输入，无效输入视为0(不启用)"""
+        try:
+            return max(0.0, float(var.get()))
+        except ValueError:
+            return 0.0
+
+    def update_default_timeout(self):
+        self.executor.default_timeout = (
+            self.get_input_seconds(self.default_timeout_var) or None
+        )
+
+    def get_input_tags(self) -> list[str]:
+        """标签输入框中的标签，以中英文逗号分隔"""
+        text = self.tags_entry.get()
+        if text == self.tags_placeholder:
+            return []
+        tags = (t.strip() for t in text.replace("，", ",").split(","))
+        return list(dict.fromkeys(t for t in tags if t))
+
     def update_button_states(self):
         """根据id_var状态更新按钮可用性"""
         has_id = bool(self.id_var.get())
@@ -477,7 +1119,12 @@ class CmdManager:
 
     def update_input_config(self):
         """根据输入框内容更新输入框配置"""
-        for entry in [self.name_entry, self.cmd_entry, self.remark_entry]:
+        for entry in [
+            self.name_entry,
+            self.cmd_entry,
+            self.remark_entry,
+            self.tags_entry,
+        ]:
             val = entry.get()
             if val and val != self.entry_placeholders[entry]:
                 entry.config(foreground="black")
@@ -489,9 +1136,14 @@ class CmdManager:
         self.name_entry.delete(0, tk.END)
         self.cmd_entry.delete(0, tk.END)
         self.remark_entry.delete(0, tk.END)
+        self.tags_entry.delete(0, tk.END)
         self.name_entry.insert(0, self.name_placeholder)
         self.cmd_entry.insert(0, self.cmd_placeholder)
         self.remark_entry.insert(0, self.remark_placeholder)
+        self.tags_entry.insert(0, self.tags_placeholder)
+        self.cache_ttl_var.set("0")
+        self.timeout_var.set("0")
+        self.template_var.set(False)
 
         self.id_var.set("")
         self.update_button_states()
@@ -515,19 +1167,20 @@ class CmdManager:
 
     def delete_commands(self):
         """删除选中的命令"""
-        selected_items = self.cmd_tree.selection()
+        selected_items = self.selected_command_rows()
         if not selected_items:
             messagebox.showwarning("警告", "请先选择要删除的命令")
             return
 
-        command_ids = [self.cmd_tree.item(item, "values")[0] for item in selected_items]
+        # 同一命令可能在多个标签下被选中
+        command_ids = list(dict.fromkeys(map(self.store.id_of, selected_items)))
+        command_ids = [cid for cid in command_ids if cid is not None]
         try:
             cmfirmsg = f"确定要删除选中的{len(command_ids)}条命令吗?"
             if not messagebox.askyesno("确认", cmfirmsg):
                 return
 
             self.db_service.delete_commands(command_ids)
-            self.load_commands()
 
             self.clear_inputs()
         except Exception as e:
@@ -537,6 +1190,12 @@ class CmdManager:
         """处理treeview点击事件，包括checkbox和编辑"""
         item = self.cmd_tree.identify_row(event.y)
         column = self.cmd_tree.identify_column(event.x)
+        if item.startswith(MORE_PREFIX):
+            self.tag_tree.load_more(item)
+            return "break"
+        if not TagTreeview.is_command_row(item):
+            # 文件夹行，保留默认的展开/折叠处理
+            return
 
         tags = None
         # 如果是点击了checkbox列
@@ -564,15 +1223,16 @@ class CmdManager:
             return  # 仅响应单元格双击
 
         column = self.cmd_tree.identify_column(event.x)  # 获取列ID（如 '#1'）
-        if column == "#1":
+        if column == "#0":
             return
-
+        field = self.editable_columns.get(self.cmd_tree.column(column, "id"))
         row_id = self.cmd_tree.focus()  # 获取当前选中行ID
-        column_index = int(column[1:]) - 1  # 列索引（0开始）
+        cmd = self.store.command_at(row_id)
+        if field is None or cmd is None:
+            return
 
         # 获取单元格原始值
-        values = self.cmd_tree.item(row_id, "values")
-        old_value = values[column_index]
+        old_value = getattr(cmd, field) or ""
 
         # 创建临时Entry控件
         entry_edit = ttk.Entry(self.cmd_tree)
@@ -585,29 +1245,20 @@ class CmdManager:
 
         # 绑定保存和取消事件
         entry_edit.bind(
-            "<Return>",
-            lambda e: self.save_tree_view_edit(row_id, column_index, entry_edit),
+            "<Return>", lambda e: self.save_tree_view_edit(row_id, field, entry_edit)
         )
         entry_edit.bind(
             "<FocusOut>",
-            lambda e: self.save_tree_view_edit(row_id, column_index, entry_edit),
+            lambda e: self.save_tree_view_edit(row_id, field, entry_edit),
         )
         entry_edit.bind("<Escape>", lambda e: entry_edit.destroy())
         entry_edit.focus_set()
 
-    def save_tree_view_edit(self, row_id, column_index, entry):
-        """保存编辑后的内容到Treeview"""
-
-        new_value = entry.get()
-        values = self.cmd_tree.item(row_id, "values")
-        item_id = values[0]
-        if new_value != values[column_index]:
-            values = list(values)
-            values[column_index] = new_value
-            self.cmd_tree.item(row_id, values=values)
-            if extra := self.treeviewRowExtras.get(item_id):
-                extra.is_modified = True
-
+    def save_tree_view_edit(self, row_id, field, entry):
+        """保存编辑后的内容到store，由其变更通知更新该命令的各行"""
+        command_id = self.store.id_of(row_id)
+        if command_id is not None:
+            self.store.edit(command_id, field, entry.get())
         entry.destroy()  # 销毁临时Entry
 
     def on_cmd_edit(self, event):
@@ -617,63 +1268,378 @@ class CmdManager:
             self.edit_command(item)
 
     def run_command(self):
-        selected_items = self.cmd_tree.selection() or []
+        selected_items = self.selected_command_rows()
 
         commands = []
         for item in selected_items:
-            values = self.cmd_tree.item(item, "values")
-            if len(values) > 2 and values[2] is not None:  # 假设命令在第二列
-                commands.append(values[2])
+            if cmd := self.store.command_at(item):
+                commands.append((cmd.name, cmd.command, cmd.id))
+        templates = self.db_service.get_template_ids(c for _, _, c in commands)
+        # 各命令是否按模板执行
+        flags = [command_id in templates for _, _, command_id in commands]
 
         cur_cmd = self.cmd_entry.get()
-        if cur_cmd and cur_cmd not in commands:
-            commands.append(cur_cmd)
+        if cur_cmd and cur_cmd not in [c for _, c, _ in commands]:
+            # 正在编辑的已存储命令仍计入该命令的执行记录
+            cur_id = self.id_var.get()
+            commands.append((cur_cmd, cur_cmd, int(cur_id) if cur_id else None))
+            # 输入框中的命令以“模板参数”选项为准
+            flags.append(self.template_var.get())
 
         if not commands or len(commands) == 0:
             messagebox.showwarning("警告", "请先[选择/填入]要执行的命令")
             return
 
-        for command in commands:
-            self.run(command)
+        if len(commands) == 1:
+            name, command, command_id = commands[0]
+            self.run(command, name, command_id, flags[0])
+            return
 
-    def run(self, command: str):
-        """执行命令"""
-        try:
-            isFile = os.path.isfile(command)
-            stdout, stderr = None, None
-            output_type = subprocess.DEVNULL if isFile else subprocess.PIPE
-            # 如果是文件，直接执行不等待输出
-            subpro = subprocess.Popen(
-                command,
-                shell=True,
-                stdout=output_type,
-                stderr=output_type,
+        if any(
+            flag and is_template(command)
+            for (_, command, _), flag in zip(commands, flags)
+        ):
+            messagebox.showwarning("警告", "模板命令需要单独执行以填写参数")
+            return
+        self.run_batch(commands)
+
+    @traced("ui.run")
+    def run(
+        self, command: str, name: str | None = None, command_id=None, template=None
+    ):
+        """
+        执行命令(在Tk线程中调用，不阻塞界面)，返回job；
+        模板命令先弹出参数窗口，返回None；template为None时按命令的模板设置；
+        可缓存的命令有未过期的结果时直接显示缓存，按需在后台刷新，
+        不刷新时返回None
+        """
+        if template is None:
+            template = self.is_template_command(command_id)
+        if template and is_template(command):
+            self.show_window(None)
+            self.template_dialog.show(name or command, command, command_id)
+            return None
+        return self.submit_command(command, name, command_id)
+
+    def is_template_command(self, command_id) -> bool:
+        """已保存的命令是否启用了模板参数"""
+        if command_id is None:
+            return False
+        return bool(self.db_service.get_template_ids([int(command_id)]))
+
+    def submit_command(self, command: str, name: str | None = None, command_id=None):
+        ttl = timeout = None
+        if command_id is not None:
+            ttl = self.db_service.get_cache_ttls([command_id]).get(command_id)
+            timeout = self.db_service.get_command_timeouts([command_id]).get(command_id)
+        if not ttl:
+            return self.executor.submit(command, name, command_id, timeout)
+
+        cached = self.result_cache.get(command, ttl)
+        if cached is None:
+            job = self.executor.submit(command, name, command_id, timeout)
+        else:
+            self.show_cached_result(cached)
+            if not self.refresh_cache_var.get():
+                # 没有后台刷新时不会有执行记录，在此计入常用度；
+                # 刷新时由其执行记录计入，避免一次点击计两次
+                self.db_service.touch_command(command_id, time.time())
+                self.tray_menu.invalidate(commands_changed=False)
+                return None
+            job = self.executor.submit(command, name, command_id, timeout)
+            self.cache_refresh_jobs.add(job.id)
+        self.cache_outputs[job.id] = []
+        return job
+
+    def build_running_menu(self):
+        """正在执行的命令，点击取消"""
+        self.running_menu.delete(0, tk.END)
+        jobs = self.executor.running_jobs()
+        if not jobs:
+            self.running_menu.add_command(label="没有正在执行的命令", state=tk.DISABLED)
+            return
+        for job in jobs:
+            self.running_menu.add_command(
+                label=f"取消 {job.name} ({job.duration:.0f}s)",
+                command=lambda j=job: self.executor.cancel(j),
             )
-            if isFile:
-                stdout = "已执行文件"
-            else:
-                stdout, stderr = subpro.communicate()
+        self.running_menu.add_separator()
+        self.running_menu.add_command(label="全部取消", command=self.cancel_all)
+
+    def cancel_all(self):
+        for job in self.executor.running_jobs():
+            self.executor.cancel(job)
+
+    def running_tray_items(self) -> tuple:
+        """托盘的“正在执行”菜单，在托盘线程中调用"""
+        jobs = self.executor.running_jobs()
+        if not jobs:
+            return (pystray.MenuItem("没有正在执行的命令", None, enabled=False),)
+        return (
+            *(
+                pystray.MenuItem(
+                    f"取消 {job.name}",
+                    lambda *args, j=job: self.executor.cancel(j),
+                )
+                for job in jobs
+            ),
+            pystray.Menu.SEPARATOR,
+            pystray.MenuItem("全部取消", lambda *args: self.cancel_all()),
+        )
 
-            self.output_text.see(tk.END)  # 自动滚动到最后
-            self.output_text.update()
-            # print(f"{stdout = }")  # 调试信息
-            # print(f"{stderr = }")  # 调试信息
+    def show_cached_result(self, cached: CachedResult):
+        self.console.write(f'\n{"-" * 50}\n', "separator")
+        created = dt.fromtimestamp(cached.created_at).strftime("%y-%m-%d %H:%M:%S")
+        self.console.write(
+            f"{created}:[{cached.command}] (缓存，{cached.age:.0f}秒前)\n", "separator"
+        )
+        for kind, text in cached.chunks:
+            self.console.write(text, "" if kind == executor.EVENT_STDOUT else "error")
+        if not cached.chunks:
+            self.console.write("执行成功")
+        self.last_output_job = None
+
+    def collect_cache_output(self, job: RunJob, kind: str, text: str):
+        """收集可缓存命令的输出，超过缓存上限后放弃"""
+        chunks = self.cache_outputs.get(job.id)
+        if chunks is None:
+            return
+        if job.stdout_bytes + job.stderr_bytes > self.result_cache.max_entry_bytes:
+            del self.cache_outputs[job.id]
+            return
+        chunks.append((kind, text))
+
+    def save_cache_result(self, job: RunJob):
+        chunks = self.cache_outputs.pop(job.id, None)
+        refreshing = job.id in self.cache_refresh_jobs
+        self.cache_refresh_jobs.discard(job.id)
+        saved = False
+        if chunks is not None and job.status == executor.STATUS_OK:
+            try:
+                saved = self.result_cache.put(
+                    job.command, chunks, job.returncode, job.started_at
+                )
+            except Exception as e:
+                self.console.write(f"\n保存结果缓存失败: {str(e)}\n", "error")
+        if refreshing:
+            if saved:
+                self.console.write(f"\n[{job.name}] 缓存已在后台刷新\n", "separator")
+            else:
+                self.console.write(
+                    f"\n[{job.name}] 后台刷新失败({job.status})，保留原缓存\n", "error"
+                )
 
-            self.output_text.insert(tk.END, f'\n{"-" * 50}\n', "separator")
-            self.output_text.insert(
-                tk.END, dt.now().strftime("%y-%m-%d %H:%M:%S") + ":[" + command + "]\n"
+    def run_batch(self, commands: list[tuple[str, str, int | None]]):
+        """按所选策略批量执行命令"""
+        policy_name, policy, workers = self.get_batch_settings()
+        self.console.write(
+            f'\n{"=" * 50}\n批量执行{len(commands)}条命令 [{policy_name}, 并发数{workers}]\n',
+        )
+        timeouts = self.db_service.get_command_timeouts(
+            {cid for _, _, cid in commands if cid is not None}
+        )
+        return self.executor.submit_batch(commands, policy, workers, timeouts)
+
+    def run_template(
+        self,
+        name: str,
+        template: CommandTemplate,
+        matrix: dict[str, list[str]],
+        command_id=None,
+    ):
+        """按参数矩阵执行模板命令，组合逐个展开，不预先生成全部命令"""
+        count = template.count(matrix)
+        if count == 1:
+            _, command = next(template.expand(matrix))
+            return self.submit_command(command, name, command_id)
+
+        policy_name, policy, workers = self.get_batch_settings()
+        self.console.write(
+            f'\n{"=" * 50}\n参数矩阵执行[{name}] {count}个组合 '
+            f"[{policy_name}, 并发数{workers}]\n",
+        )
+        commands = (
+            (f"{name} [{format_values(values)}]", command, command_id)
+            for values, command in template.expand(matrix)
+        )
+        timeouts = {}
+        if command_id is not None:
+            timeouts = self.db_service.get_command_timeouts([command_id])
+        return self.executor.submit_lazy_batch(commands, policy, workers, timeouts)
+
+    def get_batch_settings(self) -> tuple[str, str, int]:
+        """返回所选的 (策略名称, 策略, 并发数)"""
+        policy_name = self.batch_policy_var.get()
+        policy = next(p for p, name in self.batch_policy_names if name == policy_name)
+        try:
+            workers = max(1, int(self.batch_workers_var.get()))
+        except (tk.TclError, ValueError):
+            workers = os.cpu_count() or 1
+        return policy_name, policy, workers
+
+    def poll_exec_events(self):
+        """在Tk线程中定时消费执行引擎推送的输出"""
+        deadline = time.perf_counter() + self.exec_poll_budget
+        try:
+            while time.perf_counter() < deadline:
+                kind, job, data = self.executor.events.get_nowait()
+                self.on_exec_event(kind, job, data)
+        except queue.Empty:
+            pass
+        self.root.after(self.exec_poll_interval, self.poll_exec_events)
+
+    @traced("ui.on_exec_event")
+    def on_exec_event(self, kind: str, job: RunJob, data):
+        if kind == executor.EVENT_START or kind == executor.EVENT_EXIT:
+            self.schedule_tray_update()
+        if kind != executor.EVENT_BATCH_DONE and job.id in self.cache_refresh_jobs:
+            # 后台刷新缓存的执行不显示输出
+            if kind == executor.EVENT_STDOUT or kind == executor.EVENT_STDERR:
+                self.collect_cache_output(job, kind, data)
+            elif kind == executor.EVENT_EXIT:
+                self.record_execution(job)
+                self.save_cache_result(job)
+            return
+        if kind == executor.EVENT_START:
+            self.console.write(f'\n{"-" * 50}\n', "separator")
+            self.console.write(
+                dt.now().strftime("%y-%m-%d %H:%M:%S") + ":[" + job.command + "]\n"
             )
+            self.last_output_job = job
+            if job.log_path:
+                self.last_log_job = job
+        elif kind in (
+            executor.EVENT_STDOUT,
+            executor.EVENT_STDERR,
+            executor.EVENT_ERROR,
+        ):
+            # 并发执行时输出交错，切换来源时标出命令名称
+            if job.batch and self.last_output_job is not job:
+                self.console.write(f"\n[{job.name}]\n", "separator")
+                self.last_output_job = job
+            tag = "" if kind == executor.EVENT_STDOUT else "error"
+            self.console.write(data, tag)
+            if kind != executor.EVENT_ERROR:
+                self.collect_cache_output(job, kind, data)
+        elif kind == executor.EVENT_EXIT:
+            self.record_execution(job)
+            if job.id in self.cache_outputs:
+                self.save_cache_result(job)
+            if job.spilled:
+                self.console.write(
+                    f"\n[{job.name}] 完整输出共"
+                    f"{format_bytes(job.stdout_bytes + job.stderr_bytes)}，"
+                    "可在“输出日志”中查看\n",
+                    "separator",
+                )
+            if job.batch:
+                self.show_batch_job_status(job)
+            elif job.timed_out:
+                self.console.write(f"\n执行超时({job.timeout:g}s)，已结束", "error")
+            elif job.cancelled:
+                self.console.write("\n已取消", "error")
+            elif job.error is None and not job.is_file:
+                if job.returncode:
+                    self.console.write(f"\n退出码: {job.returncode}", "error")
+                elif not job.stdout_bytes and not job.stderr_bytes:
+                    self.console.write("执行成功")
+                self.console.write(
+                    f"\n{job.resources.summary(job.cpu_time)}\n", "separator"
+                )
+        elif kind == executor.EVENT_BATCH_DONE:
+            self.show_batch_summary(job)
 
-            # 根据是否有错误决定是否展开输出区域
-            if stderr:
-                self.output_text.insert(tk.END, stderr, "error")
-            elif stdout:
-                self.output_text.insert(tk.END, stdout)
-            else:
-                self.output_text.append_output("执行成功")
-
+    def record_execution(self, job: RunJob):
+        # 批量执行中未启动就被取消的命令不记录
+        if job.started_at is None:
+            return
+        try:
+            self.db_service.record_execution(job)
         except Exception as e:
-            self.output_text.insert(tk.END, f"错误: {str(e)}", "error")
+            self.console.write(f"\n记录执行历史失败: {str(e)}\n", "error")
+            return
+        if job.command_id is not None:
+            # 常用度变化，命令本身不变
+            self.tray_menu.invalidate(commands_changed=False)
+
+    def show_stats(self):
+        self.stats_window.show()
+
+    def show_schedules(self):
+        command_id = self.id_var.get()
+        if not command_id:
+            messagebox.showinfo("提示", "请先选择一条已保存的命令")
+            return
+        if self.is_template_command(command_id):
+            messagebox.showwarning("警告", "模板命令需要填写参数，不能定时执行")
+            return
+        self.schedule_dialog.show(int(command_id), self.name_var.get())
+
+    def run_scheduled(self, schedule: Schedule):
+        """到期的定时命令(在调度线程中调用)，输出与手动执行的相同"""
+        return self.executor.submit(
+            schedule.command, schedule.name, schedule.command_id, schedule.timeout
+        )
+
+    def show_last_log(self):
+        job = self.last_log_job
+        if job is None:
+            messagebox.showinfo("提示", "还没有命令的输出日志")
+            return
+        self.show_log(job.log_path, job.name)
+
+    def show_log(self, path: str, title: str):
+        if not os.path.exists(log_files(path)[0]):
+            messagebox.showinfo("提示", "输出日志已被删除")
+            return
+        try:
+            LogPagerWindow(self.root, path, title)
+        except OSError as e:
+            messagebox.showerror("错误", f"无法打开输出日志: {str(e)}")
+
+    def show_batch_job_status(self, job: RunJob):
+        if job.timed_out:
+            status, tag = f"超时({job.timeout:g}s)", "error"
+        elif job.cancelled:
+            status, tag = "已取消", "error"
+        elif job.ok:
+            status, tag = "成功", ""
+        else:
+            status, tag = f"失败(退出码: {job.returncode})", "error"
+        self.console.write(
+            f"\n[{job.name}] {status}, 耗时{job.duration:.2f}s, "
+            f"峰值内存{format_bytes(job.resources.peak_rss)}\n",
+            tag,
+        )
+        self.last_output_job = None
+
+    def show_batch_summary(self, batch: executor.BatchRun):
+        ok, failed, cancelled = batch.count()
+        cpu_time = batch.cpu_time
+        cpu_text = f"{cpu_time:.2f}s" if cpu_time is not None else "不可用"
+        self.console.write(
+            f'\n{"=" * 50}\n批量执行完成: 成功{ok}, 失败{failed}, 取消{cancelled}\n'
+            f"总耗时{batch.wall_time:.2f}s, 各命令耗时合计{batch.summed_time:.2f}s, "
+            f"CPU时间合计{cpu_text}\n",
+            "error" if failed else "",
+        )
+        if batch.lazy:
+            self.show_batch_table(batch)
+
+    def show_batch_table(self, batch: executor.BatchRun):
+        """各组合的执行结果表"""
+        width = min(max((len(job.name) for job in batch.jobs), default=0), 60)
+        self.console.write(
+            f"{'命令':<{width}}  结果       退出码  耗时      峰值内存\n", "separator"
+        )
+        for job in batch.jobs:
+            code = "-" if job.returncode is None else job.returncode
+            duration = f"{job.duration:.2f}s"
+            self.console.write(
+                f"{job.name[:width]:<{width}}  {job.status:<9}  {code!s:<6}  "
+                f"{duration:<8}  {format_bytes(job.resources.peak_rss)}\n",
+                "" if job.ok else "error",
+            )
 
 
 def resource_path(relative_path):
@@ -686,13 +1652,21 @@ def resource_path(relative_path):
 
 def check_single_instance(lock_file_path):
     if os.name == "nt":
+        import SingletonGuardWin as sgw
+
         return sgw.SingletonGuardWin(lock_file_path)
 
-    return nullcontext()
+    return sgp.SingletonGuardPosix(lock_file_path)
 
 
 if __name__ == "__main__":
-    with check_single_instance("CmdManager.lock"):
+    with check_single_instance("CmdManager.lock") as guard:
         root = tk.Tk()
         app = CmdManager(root)
+        if os.name != "nt" and isinstance(guard, sgp.SingletonGuardPosix):
+            # 主循环开始后才接收请求：处理请求时要在接收线程中调用root.after
+            root.after(0, lambda: guard.serve(app.handle_instance_request))
+        request = ir.parse_request(sys.argv[1:])
+        if request["action"] != ir.REQUEST_SHOW:
+            root.after(0, lambda: app.apply_instance_request(request))
         root.mainloop()
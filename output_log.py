@@ -0,0 +1,300 @@
+from array import array
+from collections import OrderedDict
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+
+# 每次执行的输出日志由三个文件组成：
+#   .log    逐块独立压缩(zlib)的输出
+#   .blocks 块索引，每块4个uint64: 压缩后偏移, 压缩后长度, 原始偏移, 原始长度
+#   .lines  行索引，每LINE_INDEX_STEP行记录一次行首的原始偏移(uint64)
+# 三者都只追加，读取方通过mmap按需读取，内存占用与输出大小无关
+LOG_SUFFIX = ".log"
+BLOCKS_SUFFIX = ".blocks"
+LINES_SUFFIX = ".lines"
+LINE_INDEX_STEP = 64
+# 单行显示的最大字符数
+MAX_LINE_CHARS = 4096
+
+
+def log_files(path: str) -> tuple[str, str, str]:
+    return path + LOG_SUFFIX, path + BLOCKS_SUFFIX, path + LINES_SUFFIX
+
+
+class OutputLogWriter:
+    """
+    边执行边写入压缩日志：输出先缓存在内存中，攒满block_size字节
+    或距上次写入超过flush_interval秒时压缩为一块写入，同时建立行索引。
+    命令暂停输出时由定时器写入缓存的部分，查看日志不会落后于控制台。
+    可在多个线程中调用write
+    """
+
+    block_size = 64 * 1024
+    flush_interval = 1.0
+    # 边执行边压缩，优先速度
+    compress_level = 1
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        log_path, blocks_path, lines_path = log_files(path)
+        self._log = open(log_path, "wb")
+        self._blocks = open(blocks_path, "wb")
+        self._lines = open(lines_path, "wb")
+        self._lock = threading.Lock()
+        self._buffer = bytearray()
+        # 已写入的压缩字节数、原始字节数
+        self._compressed_size = 0
+        self._size = 0
+        self.line_count = 0
+        # 尚未写入的行索引(其所在的块写入后才写入行索引)
+        self._pending_lines = array("Q", [0])
+        self._last_flush = time.monotonic()
+        # 缓存中有未写入的输出时等待写入的定时器
+        self._timer = None
+
+    @property
+    def size(self) -> int:
+        return self._size + len(self._buffer)
+
+    def write(self, text: str):
+        data = text.encode("utf-8")
+        with self._lock:
+            start = self.size
+            newline = data.find(b"\n")
+            while newline >= 0:
+                self.line_count += 1
+                if self.line_count % LINE_INDEX_STEP == 0:
+                    self._pending_lines.append(start + newline + 1)
+                newline = data.find(b"\n", newline + 1)
+            self._buffer += data
+            if (
+                len(self._buffer) >= self.block_size
+                or time.monotonic() - self._last_flush >= self.flush_interval
+            ):
+                self._flush()
+            elif self._timer is None:
+                self._start_timer(self.flush_interval)
+
+    def _start_timer(self, delay: float):
+        self._timer = threading.Timer(delay, self._flush_idle)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _flush_idle(self):
+        """定时器：距上次写入已超过flush_interval时写入缓存的输出"""
+        with self._lock:
+            self._timer = None
+            if self._log.closed or not self._buffer:
+                return
+            remaining = self._last_flush + self.flush_interval - time.monotonic()
+            if remaining > 0:
+                self._start_timer(remaining)
+            else:
+                self._flush()
+
+    def _flush(self):
+        for i in range(0, len(self._buffer), self.block_size):
+            block = self._buffer[i : i + self.block_size]
+            compressed = zlib.compress(block, self.compress_level)
+            self._log.write(compressed)
+            entry = (self._compressed_size, len(compressed), self._size, len(block))
+            self._blocks.write(struct.pack("=4Q", *entry))
+            self._compressed_size += len(compressed)
+            self._size += len(block)
+        self._buffer.clear()
+        # 先写数据再写索引，读取方只会看到已写入的块
+        self._log.flush()
+        self._blocks.flush()
+        written = [offset for offset in self._pending_lines if offset <= self._size]
+        if written:
+            self._lines.write(struct.pack(f"={len(written)}Q", *written))
+            self._lines.flush()
+            self._pending_lines = array("Q", self._pending_lines[len(written) :])
+        self._last_flush = time.monotonic()
+
+    def close(self):
+        with self._lock:
+            if self._log.closed:
+                return
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            self._flush()
+            self._log.close()
+            self._blocks.close()
+            self._lines.close()
+
+
+class OutputLogReader:
+    """
+    通过mmap读取输出日志的任意行，只解压所需的块(最近使用的几块保留在缓存中)，
+    索引也直接从映射中读取。日志仍在写入时调用refresh()读取新增的部分
+    """
+
+    cache_blocks = 4
+
+    def __init__(self, path: str):
+        self.path = path
+        self._maps = dict[str, mmap.mmap | None]()
+        self._cache = OrderedDict[int, bytes]()
+        self.block_count = 0
+        self.indexed_lines = 0
+        self.size = 0
+        self.line_count = 0
+        self.refresh()
+
+    def _map(self, file_path: str) -> mmap.mmap | None:
+        """映射文件的当前全部内容，文件增长后重新映射"""
+        old = self._maps.get(file_path)
+        try:
+            size = os.path.getsize(file_path)
+        except OSError:
+            size = 0
+        if old is not None and len(old) == size:
+            return old
+        if old is not None:
+            old.close()
+        self._maps[file_path] = None
+        if size == 0:
+            return None
+        with open(file_path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._maps[file_path] = mapped
+        return mapped
+
+    def refresh(self):
+        log_path, blocks_path, lines_path = log_files(self.path)
+        self._data = self._map(log_path)
+        self._blocks = self._map(blocks_path)
+        self._lines = self._map(lines_path)
+        # 只使用完整写入的索引项
+        self.block_count = len(self._blocks) // 32 if self._blocks else 0
+        self.indexed_lines = len(self._lines) // 8 if self._lines else 0
+        self.size = 0
+        if self.block_count:
+            _, _, offset, length = self._block_entry(self.block_count - 1)
+            self.size = offset + length
+        # 最后一个已索引的行之后的行数需要扫描得到(不超过LINE_INDEX_STEP行)
+        offset = self._line_offset(self.indexed_lines - 1)
+        tail = sum(1 for _ in self._iter_lines(offset))
+        self.line_count = max(self.indexed_lines - 1, 0) * LINE_INDEX_STEP + tail
+
+    def _block_entry(self, index: int) -> tuple[int, int, int, int]:
+        return struct.unpack_from("=4Q", self._blocks, index * 32)
+
+    def _line_offset(self, chunk: int) -> int:
+        """第chunk * LINE_INDEX_STEP行的行首偏移"""
+        if chunk < 0 or not self.indexed_lines:
+            return 0
+        return struct.unpack_from("=Q", self._lines, chunk * 8)[0]
+
+    def _block(self, index: int) -> bytes:
+        data = self._cache.get(index)
+        if data is not None:
+            self._cache.move_to_end(index)
+            return data
+        offset, length, _, _ = self._block_entry(index)
+        data = zlib.decompress(self._data[offset : offset + length])
+        self._cache[index] = data
+        if len(self._cache) > self.cache_blocks:
+            self._cache.popitem(last=False)
+        return data
+
+    def _find_block(self, offset: int) -> int:
+        """原始偏移所在的块(二分查找)"""
+        low, high = 0, self.block_count - 1
+        while low < high:
+            middle = (low + high + 1) // 2
+            if self._block_entry(middle)[2] <= offset:
+                low = middle
+            else:
+                high = middle - 1
+        return low
+
+    def _iter_lines(self, offset: int):
+        """从原始偏移offset(行首)开始逐行读取，超长的行只保留开头部分"""
+        if offset >= self.size:
+            return
+        index = self._find_block(offset)
+        skip = offset - self._block_entry(index)[2]
+        line = bytearray()
+        for index in range(index, self.block_count):
+            data = self._block(index)
+            start = skip
+            skip = 0
+            while True:
+                newline = data.find(b"\n", start)
+                end = len(data) if newline < 0 else newline
+                # 按字节截断，解码时忽略被截断的字符
+                room = MAX_LINE_CHARS * 4 - len(line)
+                if room > 0:
+                    line += data[start : min(end, start + room)]
+                if newline < 0:
+                    break
+                yield line.decode("utf-8", errors="ignore")[:MAX_LINE_CHARS]
+                line = bytearray()
+                start = newline + 1
+        if line:
+            yield line.decode("utf-8", errors="ignore")[:MAX_LINE_CHARS]
+
+    def read_lines(self, start: int, count: int) -> list[str]:
+        """读取第start行(从0开始)起的count行"""
+        start = max(0, min(start, self.line_count))
+        chunk = min(start // LINE_INDEX_STEP, self.indexed_lines - 1)
+        offset = self._line_offset(chunk)
+        skip = start - max(chunk, 0) * LINE_INDEX_STEP
+        result = []
+        for i, line in enumerate(self._iter_lines(offset)):
+            if i < skip:
+                continue
+            result.append(line)
+            if len(result) >= count:
+                break
+        return result
+
+    def close(self):
+        self._data = self._blocks = self._lines = None
+        self._cache.clear()
+        for mapped in self._maps.values():
+            if mapped is not None:
+                mapped.close()
+        self._maps.clear()
+
+
+def prune_logs(log_dir: str, max_bytes: int) -> int:
+    """日志总大小超过max_bytes时从最旧的开始删除，返回删除的日志数"""
+    try:
+        names = os.listdir(log_dir)
+    except OSError:
+        return 0
+    runs = dict[str, list[str]]()
+    for name in names:
+        base, ext = os.path.splitext(name)
+        if ext in (LOG_SUFFIX, BLOCKS_SUFFIX, LINES_SUFFIX):
+            runs.setdefault(base, []).append(os.path.join(log_dir, name))
+    entries = []
+    total = 0
+    for files in runs.values():
+        try:
+            stats = [os.stat(f) for f in files]
+        except OSError:
+            continue
+        size = sum(st.st_size for st in stats)
+        total += size
+        entries.append((max(st.st_mtime for st in stats), size, files))
+    removed = 0
+    for _, size, files in sorted(entries):
+        if total <= max_bytes:
+            break
+        for f in files:
+            try:
+                os.remove(f)
+            except OSError:
+                pass
+        total -= size
+        removed += 1
+    return removed
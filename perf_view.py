@@ -0,0 +1,127 @@
+import tkinter as tk
+from tkinter import ttk, filedialog, messagebox
+import tracing
+from stats_view import format_duration
+
+
+class PerformanceWindow:
+    """
+    性能窗口：启用/停用跟踪，按span名称显示次数与耗时分位数，
+    并可导出为Chrome trace(在chrome://tracing或Perfetto中查看时间线)
+    """
+
+    columns = (
+        ("name", "名称", 220),
+        ("count", "次数", 70),
+        ("total", "总计", 90),
+        ("p50", "p50", 80),
+        ("p95", "p95", 80),
+        ("p99", "p99", 80),
+        ("max", "最大", 80),
+    )
+    refresh_interval = 1000
+
+    def __init__(self, root: tk.Tk):
+        self.root = root
+        self.window = None
+        self._after_id = None
+
+    def show(self):
+        if self.window is None or not self.window.winfo_exists():
+            self._create()
+        self.refresh()
+        self.window.deiconify()
+        self.window.lift()
+
+    def _create(self):
+        self.window = tk.Toplevel(self.root)
+        self.window.title("性能")
+        self.window.geometry("760x420")
+        self.window.protocol("WM_DELETE_WINDOW", self.close)
+
+        toolbar = ttk.Frame(self.window)
+        toolbar.pack(fill=tk.X, padx=5, pady=5)
+        self.enabled_var = tk.BooleanVar(value=tracing.is_enabled())
+        ttk.Checkbutton(
+            toolbar, text="启用跟踪", variable=self.enabled_var, command=self.toggle
+        ).pack(side=tk.LEFT)
+        ttk.Button(toolbar, text="清空", command=self.clear).pack(side=tk.LEFT, padx=5)
+        ttk.Button(toolbar, text="导出Chrome trace", command=self.export).pack(
+            side=tk.LEFT
+        )
+        self.info_var = tk.StringVar()
+        ttk.Label(toolbar, textvariable=self.info_var).pack(side=tk.RIGHT)
+
+        frame = ttk.Frame(self.window)
+        frame.pack(fill=tk.BOTH, expand=True, padx=5, pady=(0, 5))
+        scrollbar = ttk.Scrollbar(frame)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.tree = ttk.Treeview(
+            frame,
+            columns=[c[0] for c in self.columns],
+            show="headings",
+            yscrollcommand=scrollbar.set,
+        )
+        for key, text, width in self.columns:
+            self.tree.heading(key, text=text)
+            self.tree.column(key, width=width, stretch=True)
+        self.tree.pack(fill=tk.BOTH, expand=True)
+        scrollbar.config(command=self.tree.yview)
+
+    def refresh(self):
+        """重新汇总缓冲区中的span，窗口打开期间定时刷新"""
+        if self.window is None or not self.window.winfo_exists():
+            return
+        if self._after_id is not None:
+            self.window.after_cancel(self._after_id)
+        spans = tracing.snapshot()
+        self.tree.delete(*self.tree.get_children())
+        for item in tracing.summarize(spans):
+            self.tree.insert(
+                "",
+                tk.END,
+                values=(
+                    item["name"],
+                    item["count"],
+                    format_duration(item["total"]),
+                    format_duration(item["p50"]),
+                    format_duration(item["p95"]),
+                    format_duration(item["p99"]),
+                    format_duration(item["max"]),
+                ),
+            )
+        state = "已启用" if tracing.is_enabled() else "未启用"
+        self.info_var.set(f"{state}, 共 {len(spans)} 个span")
+        self._after_id = self.window.after(self.refresh_interval, self.refresh)
+
+    def toggle(self):
+        if self.enabled_var.get():
+            tracing.enable()
+        else:
+            tracing.disable()
+
+    def clear(self):
+        tracing.clear()
+        self.refresh()
+
+    def export(self):
+        path = filedialog.asksaveasfilename(
+            parent=self.window,
+            title="导出Chrome trace",
+            defaultextension=".json",
+            filetypes=[("Chrome trace", "*.json")],
+        )
+        if not path:
+            return
+        try:
+            count = tracing.export_chrome_trace(path)
+        except OSError as e:
+            messagebox.showerror("错误", f"导出失败: {str(e)}", parent=self.window)
+            return
+        messagebox.showinfo("提示", f"已导出 {count} 个span", parent=self.window)
+
+    def close(self):
+        if self._after_id is not None:
+            self.window.after_cancel(self._after_id)
+            self._after_id = None
+        self.window.destroy()
@@ -0,0 +1,99 @@
+from collections.abc import Callable
+import tkinter as tk
+from tkinter import ttk
+from command import Command
+from fuzzy import FuzzyIndex
+
+
+class QuickLaunchPopup:
+    """键盘驱动的快速启动弹窗：输入即模糊匹配，上下键选择，回车执行，Esc关闭"""
+
+    width = 600
+    max_results = 15
+
+    def __init__(
+        self,
+        root: tk.Tk,
+        get_index: Callable[[], FuzzyIndex | None],
+        on_run: Callable[[Command], None],
+        font=None,
+    ):
+        self.root = root
+        self.get_index = get_index
+        self.on_run = on_run
+        self.font = font
+        self.window = None
+        self.results = list[Command]()
+
+    def show(self):
+        if self.window is None:
+            self._create()
+        self.query_var.set("")
+        self.refresh()
+
+        x = int((self.root.winfo_screenwidth() - self.width) / 2)
+        y = int(self.root.winfo_screenheight() / 4)
+        self.window.geometry(f"{self.width}x360+{x}+{y}")
+        self.window.deiconify()
+        self.window.lift()
+        self.window.attributes("-topmost", True)
+        self.entry.focus_force()
+
+    def hide(self):
+        if self.window is not None:
+            self.window.withdraw()
+
+    def refresh_if_visible(self):
+        if self.window is not None and self.window.winfo_viewable():
+            self.refresh()
+
+    def refresh(self):
+        index = self.get_index()
+        self.listbox.delete(0, tk.END)
+        if index is None:
+            self.results = []
+            self.listbox.insert(tk.END, "正在建立索引…")
+            return
+
+        self.results = index.search(self.query_var.get(), self.max_results)
+        for cmd in self.results:
+            self.listbox.insert(tk.END, f"{cmd.name}    {cmd.command}")
+        if self.results:
+            self.listbox.selection_set(0)
+
+    def _create(self):
+        self.window = tk.Toplevel(self.root)
+        self.window.title("快速启动")
+        self.window.protocol("WM_DELETE_WINDOW", self.hide)
+
+        self.query_var = tk.StringVar()
+        self.entry = ttk.Entry(self.window, textvariable=self.query_var, font=self.font)
+        self.entry.pack(fill=tk.X, padx=5, pady=5)
+        self.listbox = tk.Listbox(self.window, font=self.font, activestyle="none")
+        self.listbox.pack(fill=tk.BOTH, expand=True, padx=5, pady=(0, 5))
+
+        self.query_var.trace_add("write", lambda *args: self.refresh())
+        self.entry.bind("<Down>", lambda e: self._move(1))
+        self.entry.bind("<Up>", lambda e: self._move(-1))
+        self.entry.bind("<Return>", lambda e: self._run_selected())
+        self.listbox.bind("<Double-1>", lambda e: self._run_selected())
+        self.window.bind("<Escape>", lambda e: self.hide())
+
+    def _move(self, step: int):
+        if not self.results:
+            return "break"
+        selection = self.listbox.curselection()
+        current = selection[0] if selection else -1
+        index = max(0, min(current + step, len(self.results) - 1))
+        self.listbox.selection_clear(0, tk.END)
+        self.listbox.selection_set(index)
+        self.listbox.see(index)
+        return "break"
+
+    def _run_selected(self):
+        selection = self.listbox.curselection()
+        if not self.results or not selection:
+            return
+        cmd = self.results[selection[0]]
+        self.hide()
+        self.on_run(cmd)
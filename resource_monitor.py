@@ -0,0 +1,146 @@
+import sys
+import threading
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+
+def format_bytes(size) -> str:
+    if size is None:
+        return "-"
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.0f}{unit}" if unit == "B" else f"{size:.1f}{unit}"
+        size /= 1024
+
+
+def maxrss_bytes(ru_maxrss: int) -> int:
+    """getrusage/wait4的ru_maxrss：macOS上单位为字节，Linux上为KB"""
+    return ru_maxrss if sys.platform == "darwin" else ru_maxrss * 1024
+
+
+class ResourceUsage:
+    """一次执行的进程树资源占用，无法获取的项为None"""
+
+    def __init__(self):
+        self.peak_rss: int | None = None
+        # 采样得到的进程树CPU时间(秒)
+        self.cpu_time: float | None = None
+        self.read_bytes: int | None = None
+        self.write_bytes: int | None = None
+        # 同时存在的子进程数的峰值
+        self.peak_children: int | None = None
+        self.samples = 0
+
+    def update_peak_rss(self, rss: int):
+        self.peak_rss = rss if self.peak_rss is None else max(self.peak_rss, rss)
+
+    def summary(self, cpu_time: float | None = None) -> str:
+        cpu_time = cpu_time if cpu_time is not None else self.cpu_time
+        parts = [
+            f"CPU {cpu_time:.2f}s" if cpu_time is not None else "CPU -",
+            f"峰值内存 {format_bytes(self.peak_rss)}",
+        ]
+        if self.read_bytes is not None:
+            parts.append(
+                f"读 {format_bytes(self.read_bytes)}/写 {format_bytes(self.write_bytes)}"
+            )
+        if self.peak_children is not None:
+            parts.append(f"子进程 {self.peak_children}")
+        return "资源: " + ", ".join(parts)
+
+
+class _TreeState:
+    """一个进程树的采样状态；已退出的进程保留其最后一次的CPU时间和I/O"""
+
+    def __init__(self, usage: ResourceUsage, pid: int):
+        self.usage = usage
+        self.pid = pid
+        # {pid: psutil.Process}，复用对象以识别pid是否被重用
+        self.processes = dict()
+        self.cpu = dict[int, float]()
+        self.io = dict[int, tuple[int, int]]()
+
+
+class ProcessTreeSampler:
+    """
+    在一个后台线程中按interval秒对所有注册的进程树(进程及其全部子进程)采样，
+    记录峰值内存、CPU时间、读写字节数和子进程数。需要psutil，未安装时不采样
+    """
+
+    def __init__(self, interval: float = 0.5):
+        self.interval = interval
+        self._trees = dict[int, _TreeState]()
+        self._lock = threading.Lock()
+        self._wake = threading.Condition(self._lock)
+        self._thread = None
+
+    @property
+    def available(self) -> bool:
+        return psutil is not None and bool(self.interval)
+
+    def add(self, key: int, pid: int, usage: ResourceUsage):
+        if not self.available:
+            return
+        with self._lock:
+            self._trees[key] = _TreeState(usage, pid)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+            self._wake.notify()
+
+    def remove(self, key: int):
+        with self._lock:
+            self._trees.pop(key, None)
+
+    def _run(self):
+        while True:
+            with self._lock:
+                while not self._trees:
+                    self._wake.wait()
+                trees = list(self._trees.items())
+            # 采样期间不持有锁，add/remove不被阻塞；
+            # 进程缓存、CPU时间等只在本线程中使用
+            samples = [(key, state, self._sample(state)) for key, state in trees]
+            with self._lock:
+                for key, state, sample in samples:
+                    # 已移除的进程树不再写回，执行结束后由执行器汇总
+                    if sample is not None and self._trees.get(key) is state:
+                        self._apply(state, *sample)
+                # 等待期间释放锁
+                self._wake.wait(self.interval)
+
+    def _sample(self, state: _TreeState) -> tuple[int, int] | None:
+        """采样一次进程树，返回 (总内存, 子进程数)；进程已退出时返回None"""
+        try:
+            root = state.processes.get(state.pid) or psutil.Process(state.pid)
+            state.processes[state.pid] = root
+            children = root.children(recursive=True)
+        except psutil.Error:
+            return None
+        rss = 0
+        for proc in [root, *children]:
+            proc = state.processes.setdefault(proc.pid, proc)
+            try:
+                with proc.oneshot():
+                    rss += proc.memory_info().rss
+                    times = proc.cpu_times()
+                    state.cpu[proc.pid] = times.user + times.system
+                    if hasattr(proc, "io_counters"):
+                        io = proc.io_counters()
+                        state.io[proc.pid] = (io.read_bytes, io.write_bytes)
+            except psutil.Error:
+                continue
+        return rss, len(children)
+
+    def _apply(self, state: _TreeState, rss: int, children: int):
+        usage = state.usage
+        usage.samples += 1
+        usage.update_peak_rss(rss)
+        usage.cpu_time = sum(state.cpu.values())
+        if state.io:
+            usage.read_bytes = sum(r for r, _ in state.io.values())
+            usage.write_bytes = sum(w for _, w in state.io.values())
+        usage.peak_children = max(usage.peak_children or 0, children)
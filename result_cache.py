@@ -0,0 +1,74 @@
+import hashlib
+import json
+import os
+import time
+from dbservice import DBService
+
+
+class CachedResult:
+    """缓存的一次执行结果"""
+
+    def __init__(self, command: str, chunks: list, returncode, created_at: float):
+        self.command = command
+        # [(事件类型, 文本)]，保持stdout/stderr的交错顺序
+        self.chunks = chunks
+        self.returncode = returncode
+        self.created_at = created_at
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.created_at
+
+
+class ResultCache:
+    """
+    可缓存(幂等)命令的执行结果缓存，保存在数据库中，重启后仍然有效。
+    以命令内容、工作目录及key_env中的环境变量为键；
+    总大小超过max_bytes时按最近使用时间淘汰(LRU)
+    """
+
+    max_bytes = 16 * 1024 * 1024
+    # 输出超过该大小的结果不缓存
+    max_entry_bytes = 1024 * 1024
+    # 影响命令结果、计入缓存键的环境变量
+    key_env = ("PATH", "HOME", "USERPROFILE", "VIRTUAL_ENV", "LANG")
+
+    def __init__(self, db_service: DBService, max_bytes: int | None = None):
+        self.db_service = db_service
+        if max_bytes is not None:
+            self.max_bytes = max_bytes
+        self.size = db_service.get_result_cache_size()
+
+    def make_key(self, command: str) -> str:
+        env = {name: os.environ.get(name) for name in self.key_env}
+        data = json.dumps([command, os.getcwd(), env], ensure_ascii=False)
+        return hashlib.sha256(data.encode()).hexdigest()
+
+    def get(self, command: str, ttl: float) -> CachedResult | None:
+        """未超过ttl秒的缓存结果"""
+        # 过期判断在查询中完成，过期的结果被删除；
+        # self.size仍计入其大小，淘汰时按数据库中的实际大小重新计算
+        row = self.db_service.get_cached_result(
+            self.make_key(command), time.time(), ttl
+        )
+        if row is None:
+            return None
+        return CachedResult(row[0], json.loads(row[1]), row[2], row[3])
+
+    def put(self, command: str, chunks: list, returncode, created_at: float) -> bool:
+        """保存执行结果，过大时不保存"""
+        output = json.dumps(chunks, ensure_ascii=False)
+        # 按UTF-8字节数计算，中文等输出每个字符不止一个字节
+        if len(output.encode()) > self.max_entry_bytes:
+            return False
+        # 覆盖已有结果时旧的大小仍被计入，淘汰时按数据库中的实际大小重新计算
+        self.size += self.db_service.save_cached_result(
+            self.make_key(command), command, output, returncode, created_at
+        )
+        if self.size > self.max_bytes:
+            self.size = self.db_service.evict_cached_results(self.max_bytes)
+        return True
+
+    def clear(self):
+        self.db_service.clear_result_cache()
+        self.size = 0
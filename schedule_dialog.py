@@ -0,0 +1,179 @@
+from collections.abc import Callable
+import time
+import tkinter as tk
+from tkinter import ttk, messagebox
+from dbservice import DBService
+from scheduler import (
+    KIND_AT,
+    KIND_CRON,
+    KIND_INTERVAL,
+    MISSED_CATCH_UP,
+    MISSED_SKIP,
+    ScheduleError,
+    normalize_spec,
+    parse_trigger,
+)
+from stats_view import format_time
+
+
+class ScheduleDialog:
+    """设置一条已存储命令的定时执行：cron表达式、固定间隔或指定时间"""
+
+    kind_names = (
+        (KIND_CRON, "cron表达式"),
+        (KIND_INTERVAL, "固定间隔"),
+        (KIND_AT, "指定时间"),
+    )
+    kind_hints = {
+        KIND_CRON: "分 时 日 月 周，如 */15 9-18 * * mon-fri 或 @daily",
+        KIND_INTERVAL: "如 90、30s、5m、2h、1d",
+        KIND_AT: "如 2026-01-01 08:00，或 08:00 表示下一次的08:00",
+    }
+    missed_names = ((MISSED_SKIP, "跳过"), (MISSED_CATCH_UP, "补执行一次"))
+    columns = (
+        ("kind", "方式", 90),
+        ("spec", "设置", 200),
+        ("missed", "错过时", 80),
+        ("next_run", "下次执行", 140),
+        ("last_run", "上次执行", 140),
+    )
+
+    def __init__(
+        self, root: tk.Tk, db_service: DBService, on_changed: Callable[[], None]
+    ):
+        """
+        :param on_changed: 定时设置变化后调用(通知调度器重新读取)
+        """
+        self.root = root
+        self.db_service = db_service
+        self.on_changed = on_changed
+        self.window = None
+        self.command_id = None
+
+    def show(self, command_id, name: str):
+        if self.window is not None and self.window.winfo_exists():
+            self.window.destroy()
+        self.command_id = command_id
+        self._create(name)
+        self.refresh()
+
+    def _create(self, name: str):
+        self.window = tk.Toplevel(self.root)
+        self.window.title(f"定时执行: {name}")
+        self.window.geometry("700x360")
+
+        frame = ttk.Frame(self.window)
+        frame.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        self.tree = ttk.Treeview(
+            frame, columns=[c[0] for c in self.columns], show="headings", height=8
+        )
+        for key, text, width in self.columns:
+            self.tree.heading(key, text=text)
+            self.tree.column(key, width=width, stretch=True)
+        self.tree.pack(fill=tk.BOTH, expand=True)
+
+        form = ttk.Frame(self.window)
+        form.pack(fill=tk.X, padx=5)
+        self.kind_var = tk.StringVar(value=self.kind_names[0][1])
+        self.kind_var.trace_add("write", lambda *args: self.update_hint())
+        ttk.Combobox(
+            form,
+            textvariable=self.kind_var,
+            values=[name for _, name in self.kind_names],
+            state="readonly",
+            width=10,
+        ).pack(side=tk.LEFT)
+        self.spec_var = tk.StringVar()
+        spec_entry = ttk.Entry(form, textvariable=self.spec_var, width=30)
+        spec_entry.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
+        spec_entry.bind("<Return>", lambda e: self.add())
+        ttk.Label(form, text="错过时").pack(side=tk.LEFT)
+        self.missed_var = tk.StringVar(value=self.missed_names[0][1])
+        ttk.Combobox(
+            form,
+            textvariable=self.missed_var,
+            values=[name for _, name in self.missed_names],
+            state="readonly",
+            width=10,
+        ).pack(side=tk.LEFT, padx=5)
+        self.hint_var = tk.StringVar()
+        ttk.Label(self.window, textvariable=self.hint_var, foreground="grey").pack(
+            fill=tk.X, padx=5
+        )
+        self.update_hint()
+
+        buttons = ttk.Frame(self.window)
+        buttons.pack(fill=tk.X, padx=5, pady=5)
+        ttk.Button(buttons, text="添加", command=self.add).pack(side=tk.LEFT)
+        ttk.Button(buttons, text="删除", command=self.delete).pack(side=tk.LEFT, padx=5)
+        ttk.Button(buttons, text="启用/停用", command=self.toggle).pack(side=tk.LEFT)
+        ttk.Button(buttons, text="刷新", command=self.refresh).pack(side=tk.RIGHT)
+
+    def get_kind(self) -> str:
+        return next(k for k, name in self.kind_names if name == self.kind_var.get())
+
+    def update_hint(self):
+        self.hint_var.set(self.kind_hints[self.get_kind()])
+
+    def refresh(self):
+        kinds = dict(self.kind_names)
+        missed = dict(self.missed_names)
+        self.tree.delete(*self.tree.get_children())
+        for item in self.db_service.get_schedules(self.command_id):
+            next_run = item["next_run"]
+            if not item["enabled"]:
+                next_text = "已停用"
+            else:
+                if next_run is None:
+                    # 调度器尚未计算
+                    try:
+                        trigger = parse_trigger(item["kind"], item["spec"])
+                        next_run = trigger.first(time.time())
+                    except ScheduleError:
+                        pass
+                next_text = format_time(next_run)
+            self.tree.insert(
+                "",
+                tk.END,
+                iid=str(item["schedule_id"]),
+                values=(
+                    kinds.get(item["kind"], item["kind"]),
+                    item["spec"],
+                    missed.get(item["missed"], item["missed"]),
+                    next_text,
+                    format_time(item["last_run"]),
+                ),
+            )
+
+    def add(self):
+        kind = self.get_kind()
+        try:
+            spec = normalize_spec(kind, self.spec_var.get())
+        except ScheduleError as e:
+            messagebox.showerror("错误", str(e), parent=self.window)
+            return
+        missed = next(
+            k for k, name in self.missed_names if name == self.missed_var.get()
+        )
+        self.db_service.add_schedule(self.command_id, kind, spec, missed)
+        self.spec_var.set("")
+        self.changed()
+
+    def delete(self):
+        for item in self.tree.selection():
+            self.db_service.delete_schedule(int(item))
+        self.changed()
+
+    def toggle(self):
+        stopped = {
+            str(item["schedule_id"])
+            for item in self.db_service.get_schedules(self.command_id)
+            if not item["enabled"]
+        }
+        for item in self.tree.selection():
+            self.db_service.set_schedule_enabled(int(item), item in stopped)
+        self.changed()
+
+    def changed(self):
+        self.on_changed()
+        self.refresh()
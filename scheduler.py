@@ -0,0 +1,385 @@
+from collections.abc import Callable
+from datetime import datetime as dt, timedelta
+import functools
+import heapq
+import math
+import re
+import threading
+import time
+from dbservice import DBService
+
+# 定时方式
+KIND_CRON = "cron"  # cron表达式: 分 时 日 月 周
+KIND_INTERVAL = "interval"  # 固定间隔，如 90、30s、5m、2h、1d
+KIND_AT = "at"  # 在指定时间执行一次，如 2026-01-01 08:00 或 08:00
+KINDS = (KIND_CRON, KIND_INTERVAL, KIND_AT)
+
+# 错过执行时间(如休眠或程序未运行)的处理方式
+MISSED_SKIP = "skip"  # 跳过，等待下一次
+MISSED_CATCH_UP = "catch_up"  # 立即补执行一次(错过多次也只补一次)
+MISSED_POLICIES = (MISSED_SKIP, MISSED_CATCH_UP)
+
+CRON_ALIASES = {
+    "@yearly": "0 0 1 1 *",
+    "@annually": "0 0 1 1 *",
+    "@monthly": "0 0 1 * *",
+    "@weekly": "0 0 * * 0",
+    "@daily": "0 0 * * *",
+    "@midnight": "0 0 * * *",
+    "@hourly": "0 * * * *",
+}
+MONTH_NAMES = "jan feb mar apr may jun jul aug sep oct nov dec".split()
+WEEKDAY_NAMES = "sun mon tue wed thu fri sat".split()
+DURATION_PATTERN = re.compile(r"(\d+(?:\.\d+)?)\s*([smhd]?)")
+DURATION_UNITS = {"": 1, "s": 1, "m": 60, "h": 3600, "d": 86400}
+AT_FORMATS = ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M")
+AT_TIME_FORMATS = ("%H:%M:%S", "%H:%M")
+
+
+class ScheduleError(ValueError):
+    pass
+
+
+def _parse_field(text: str, low: int, high: int, names=()) -> tuple[int, ...]:
+    """解析cron的一个字段: *, 数字, 名称, a-b, 以及 /步长 和逗号分隔的列表"""
+
+    def value(token: str) -> int:
+        token = token.strip().lower()
+        if token in names:
+            return names.index(token) + low
+        if not token.isdigit():
+            raise ScheduleError(f"无效的cron字段: {text}")
+        return int(token)
+
+    values = set()
+    for part in text.split(","):
+        expr, slash, step_text = part.partition("/")
+        step = value(step_text) if slash else 1
+        if step <= 0:
+            raise ScheduleError(f"无效的步长: {part}")
+        if expr == "*":
+            start, end = low, high
+        elif "-" in expr:
+            start, end = (value(token) for token in expr.split("-", 1))
+        else:
+            start = value(expr)
+            # 5/10 表示从5开始每隔10
+            end = high if slash else start
+        if not low <= start <= end <= high:
+            raise ScheduleError(f"cron字段超出范围({low}-{high}): {part}")
+        values.update(range(start, end + 1, step))
+    return tuple(sorted(values))
+
+
+class CronTrigger:
+    """cron表达式(分 时 日 月 周)，按本地时间计算"""
+
+    def __init__(self, spec: str):
+        text = CRON_ALIASES.get(spec.strip().lower(), spec)
+        fields = text.split()
+        if len(fields) != 5:
+            raise ScheduleError(f"cron表达式应为5个字段(分 时 日 月 周): {spec}")
+        self.minutes = _parse_field(fields[0], 0, 59)
+        self.hours = frozenset(_parse_field(fields[1], 0, 23))
+        self.days = frozenset(_parse_field(fields[2], 1, 31))
+        self.months = frozenset(_parse_field(fields[3], 1, 12, MONTH_NAMES))
+        # 0和7都是周日
+        weekdays = _parse_field(fields[4], 0, 7, WEEKDAY_NAMES)
+        self.weekdays = frozenset(day % 7 for day in weekdays)
+        # 日和周都有限制时满足其一即可(与cron相同)
+        self.days_restricted = not fields[2].startswith("*")
+        self.weekdays_restricted = not fields[4].startswith("*")
+
+    def _day_matches(self, t: dt) -> bool:
+        day_ok = t.day in self.days
+        # datetime的周一为0，cron的周日为0
+        weekday_ok = (t.weekday() + 1) % 7 in self.weekdays
+        if self.days_restricted and self.weekdays_restricted:
+            return day_ok or weekday_ok
+        return day_ok and weekday_ok
+
+    def first(self, now: float) -> float:
+        return self.next_after(now)
+
+    def next_after(self, now: float, previous: float | None = None) -> float:
+        """now之后的第一个匹配时间，按月、日、时逐级跳过不匹配的部分"""
+        t = dt.fromtimestamp(now).replace(second=0, microsecond=0)
+        t += timedelta(minutes=1)
+        limit = t.year + 5
+        while t.year <= limit:
+            if t.month not in self.months:
+                t = (t.replace(day=1, hour=0, minute=0) + timedelta(days=32)).replace(
+                    day=1
+                )
+            elif not self._day_matches(t):
+                t = t.replace(hour=0, minute=0) + timedelta(days=1)
+            elif t.hour not in self.hours:
+                t = t.replace(minute=0) + timedelta(hours=1)
+            else:
+                minute = next((m for m in self.minutes if m >= t.minute), None)
+                if minute is not None:
+                    return t.replace(minute=minute).timestamp()
+                t = t.replace(minute=0) + timedelta(hours=1)
+        raise ScheduleError("cron表达式没有可执行的时间")
+
+
+class IntervalTrigger:
+    """固定间隔，错过的间隔不累积，保持原有的相位"""
+
+    def __init__(self, spec: str):
+        match = DURATION_PATTERN.fullmatch(spec.strip().lower())
+        if not match:
+            raise ScheduleError(f"无效的间隔: {spec}，例如 90、30s、5m、2h、1d")
+        self.seconds = float(match.group(1)) * DURATION_UNITS[match.group(2)]
+        if self.seconds < 1:
+            raise ScheduleError(f"间隔不能小于1秒: {spec}")
+
+    def first(self, now: float) -> float:
+        return now + self.seconds
+
+    def next_after(self, now: float, previous: float | None = None) -> float:
+        if previous is None:
+            return self.first(now)
+        skipped = max(0, math.floor((now - previous) / self.seconds))
+        return previous + (skipped + 1) * self.seconds
+
+
+class AtTrigger:
+    """在指定时间执行一次"""
+
+    def __init__(self, spec: str):
+        for fmt in AT_FORMATS:
+            try:
+                self.at = dt.strptime(spec.strip(), fmt).timestamp()
+                return
+            except ValueError:
+                continue
+        raise ScheduleError(f"无效的时间: {spec}，例如 2026-01-01 08:00")
+
+    def first(self, now: float) -> float:
+        return self.at
+
+    def next_after(self, now: float, previous: float | None = None) -> None:
+        return None
+
+
+TRIGGERS = {KIND_CRON: CronTrigger, KIND_INTERVAL: IntervalTrigger, KIND_AT: AtTrigger}
+
+
+@functools.lru_cache(maxsize=4096)
+def parse_trigger(kind: str, spec: str):
+    """解析定时设置，触发器不可变，相同的设置只解析一次"""
+    if kind not in TRIGGERS:
+        raise ScheduleError(f"未知的定时方式: {kind}")
+    return TRIGGERS[kind](spec)
+
+
+def normalize_spec(kind: str, spec: str, now: float | None = None) -> str:
+    """
+    校验定时设置并返回保存的形式；只有时间的KIND_AT补全为其下一次出现的日期
+    """
+    now = time.time() if now is None else now
+    spec = spec.strip()
+    if kind == KIND_AT:
+        for fmt in AT_TIME_FORMATS:
+            try:
+                at = dt.strptime(spec, fmt).time()
+            except ValueError:
+                continue
+            today = dt.fromtimestamp(now)
+            moment = dt.combine(today.date(), at)
+            if moment.timestamp() <= now:
+                moment += timedelta(days=1)
+            return moment.strftime(AT_FORMATS[0])
+    trigger = parse_trigger(kind, spec)
+    if kind == KIND_CRON:
+        trigger.first(now)
+    return spec
+
+
+class Schedule:
+    """一条定时设置，及其执行状态"""
+
+    __slots__ = (
+        "id",
+        "command_id",
+        "name",
+        "command",
+        "kind",
+        "spec",
+        "missed",
+        "enabled",
+        "last_run",
+        "next_run",
+        "timeout",
+        "trigger",
+        "job",
+    )
+
+    def __init__(
+        self,
+        schedule_id: int,
+        command_id: int,
+        name: str,
+        command: str,
+        kind: str,
+        spec: str,
+        missed: str = MISSED_SKIP,
+        enabled: bool = True,
+        last_run: float | None = None,
+        next_run: float | None = None,
+        timeout: float | None = None,
+    ):
+        self.id = schedule_id
+        self.command_id = command_id
+        self.name = name
+        self.command = command
+        self.kind = kind
+        self.spec = spec
+        self.missed = missed
+        self.enabled = bool(enabled)
+        self.last_run = last_run
+        self.next_run = next_run
+        self.timeout = timeout
+        self.trigger = parse_trigger(kind, spec)
+        # 最近一次启动的执行，尚未结束时不再重复启动
+        self.job = None
+
+
+class Scheduler:
+    """
+    在一个后台线程中执行定时命令：所有定时设置的下次执行时间保存在堆中，
+    线程睡眠到最近的时间才醒来，空闲时不轮询。醒来的间隔不超过max_sleep秒，
+    以便在系统休眠恢复或调整时钟后及时发现已到期的设置。
+    定时设置保存在数据库中，变更后调用reload()重新读取
+    """
+
+    max_sleep = 60.0
+    # 晚于执行时间超过该秒数视为错过，按设置的方式跳过或补执行
+    missed_grace = 60.0
+
+    def __init__(
+        self,
+        db_name: str,
+        on_due: Callable[[Schedule], object],
+        on_error: Callable[[str], None] | None = None,
+    ):
+        """
+        :param on_due: on_due(定时设置)，在调度线程中调用，返回启动的执行
+            (带有done事件，如executor.RunJob)或None
+        :param on_error: on_error(说明)，在调度线程中报告失败及未执行的原因，
+            默认输出到标准输出
+        """
+        self.db_name = db_name
+        self.on_due = on_due
+        self.on_error = on_error or print
+        self._schedules = dict[int, Schedule]()
+        # (下次执行时间, 定时设置ID)，只在调度线程中访问
+        self._heap = list[tuple[float, int]]()
+        self._wake = threading.Condition()
+        self._reload = True
+        self._stopped = False
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def reload(self):
+        """定时设置或命令已变化，重新读取(可在任意线程调用)"""
+        with self._wake:
+            self._reload = True
+            self._wake.notify()
+
+    def stop(self):
+        with self._wake:
+            self._stopped = True
+            self._wake.notify()
+
+    def _delay(self) -> float:
+        if not self._heap:
+            return self.max_sleep
+        return min(self.max_sleep, self._heap[0][0] - time.time())
+
+    def _run(self):
+        db_service = DBService(self.db_name)
+        try:
+            while True:
+                with self._wake:
+                    while not self._stopped and not self._reload:
+                        delay = self._delay()
+                        if delay <= 0:
+                            break
+                        self._wake.wait(delay)
+                    if self._stopped:
+                        return
+                    reload, self._reload = self._reload, False
+                try:
+                    if reload:
+                        self._load(db_service)
+                    self._fire_due(db_service)
+                except Exception as e:
+                    self.on_error(f"执行定时命令失败: {e}")
+        finally:
+            db_service.close()
+
+    def _load(self, db_service: DBService):
+        now = time.time()
+        schedules = dict[int, Schedule]()
+        updates = []
+        for row in db_service.get_schedules():
+            try:
+                schedule = Schedule(**row)
+            except (TypeError, ScheduleError) as e:
+                self.on_error(f"忽略无效的定时设置 {row['schedule_id']}: {e}")
+                continue
+            old = self._schedules.get(schedule.id)
+            if old is not None:
+                schedule.job = old.job
+            if schedule.enabled and schedule.next_run is None:
+                schedule.next_run = schedule.trigger.first(now)
+                updates.append(schedule)
+            schedules[schedule.id] = schedule
+        self._schedules = schedules
+        self._heap = [
+            (s.next_run, s.id)
+            for s in schedules.values()
+            if s.enabled and s.next_run is not None
+        ]
+        heapq.heapify(self._heap)
+        self._save(db_service, updates)
+
+    def _fire_due(self, db_service: DBService):
+        now = time.time()
+        updates = []
+        while self._heap and self._heap[0][0] <= now:
+            deadline, schedule_id = heapq.heappop(self._heap)
+            schedule = self._schedules.get(schedule_id)
+            if schedule is None or schedule.next_run != deadline:
+                continue
+            missed = now - deadline > self.missed_grace
+            running = schedule.job is not None and not schedule.job.done.is_set()
+            if running:
+                self.on_error(f"定时命令 {schedule.name} 上次执行尚未结束，跳过本次")
+            elif missed and schedule.missed != MISSED_CATCH_UP:
+                self.on_error(f"定时命令 {schedule.name} 错过了执行时间，已跳过")
+            else:
+                schedule.last_run = now
+                try:
+                    schedule.job = self.on_due(schedule)
+                except Exception as e:
+                    self.on_error(f"启动定时命令失败 {schedule.name}: {e}")
+            schedule.next_run = schedule.trigger.next_after(now, deadline)
+            if schedule.next_run is None:
+                schedule.enabled = False
+            else:
+                heapq.heappush(self._heap, (schedule.next_run, schedule_id))
+            updates.append(schedule)
+        self._save(db_service, updates)
+
+    def _save(self, db_service: DBService, schedules: list[Schedule]):
+        if schedules:
+            db_service.update_schedule_runs(
+                [(s.last_run, s.next_run, s.enabled, s.id) for s in schedules]
+            )
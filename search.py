@@ -0,0 +1,47 @@
+from collections.abc import Callable
+import queue
+import threading
+from dbservice import DBService
+
+
+class CommandSearcher:
+    """
+    在后台线程中执行搜索，使用独立的数据库连接；
+    积压的查询只处理最新的一条，结果通过回调返回(回调在后台线程中调用)
+    """
+
+    def __init__(self, db_name: str, on_result: Callable[[int, str, list], None]):
+        self.db_name = db_name
+        self.on_result = on_result
+        self._queries = queue.Queue()
+        self._seq = 0
+        self._lock = threading.Lock()
+        threading.Thread(target=self._worker, daemon=True).start()
+
+    def search(self, text: str) -> int:
+        """提交查询，返回其序号；结果回调时可据此丢弃过期结果"""
+        with self._lock:
+            self._seq += 1
+            seq = self._seq
+        self._queries.put((seq, text))
+        return seq
+
+    def _worker(self):
+        db_service = None
+        while True:
+            seq, text = self._queries.get()
+            # 只处理最新的查询
+            try:
+                while True:
+                    seq, text = self._queries.get_nowait()
+            except queue.Empty:
+                pass
+
+            try:
+                if db_service is None:
+                    db_service = DBService(self.db_name)
+                results = db_service.search_commands(text)
+            except Exception as e:
+                print(f"搜索命令时出错: {e}")
+                results = []
+            self.on_result(seq, text, results)
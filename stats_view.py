@@ -0,0 +1,153 @@
+from collections.abc import Callable
+from datetime import datetime as dt
+import tkinter as tk
+from tkinter import ttk
+from dbservice import DBService
+from resource_monitor import format_bytes
+
+
+def format_duration(seconds) -> str:
+    if seconds is None:
+        return "-"
+    if seconds < 1:
+        return f"{seconds * 1000:.0f}ms"
+    return f"{seconds:.2f}s"
+
+
+def format_time(timestamp) -> str:
+    if timestamp is None:
+        return "-"
+    return dt.fromtimestamp(timestamp).strftime("%y-%m-%d %H:%M:%S")
+
+
+class ExecutionStatsWindow:
+    """
+    执行统计窗口：各命令的耗时分位数、失败率、资源占用，以及最近的执行记录；
+    双击有输出日志的执行记录时查看其输出
+    """
+
+    stats_columns = (
+        ("name", "名称", 160),
+        ("runs", "次数", 60),
+        ("failure_rate", "失败率", 70),
+        ("p50", "p50", 80),
+        ("p95", "p95", 80),
+        ("peak_rss", "峰值内存", 90),
+        ("cpu_time", "平均CPU", 80),
+        ("last_run", "最近执行", 140),
+    )
+    recent_columns = (
+        ("started_at", "开始时间", 140),
+        ("command", "命令", 260),
+        ("status", "结果", 70),
+        ("exit_code", "退出码", 60),
+        ("duration", "耗时", 80),
+        ("cpu_time", "CPU", 70),
+        ("peak_rss", "峰值内存", 90),
+        ("io", "读/写", 120),
+        ("children", "子进程", 60),
+        ("output", "输出(字节)", 100),
+    )
+    recent_limit = 100
+
+    def __init__(
+        self,
+        root: tk.Tk,
+        db_service: DBService,
+        on_open_log: Callable[[str, str], None] | None = None,
+    ):
+        """
+        :param on_open_log: on_open_log(日志路径, 命令)
+        """
+        self.root = root
+        self.db_service = db_service
+        self.on_open_log = on_open_log
+        self.window = None
+        # {执行记录ID: (日志路径, 命令)}
+        self.log_paths = dict[str, tuple[str, str]]()
+
+    def show(self):
+        if self.window is None or not self.window.winfo_exists():
+            self._create()
+        self.refresh()
+        self.window.deiconify()
+        self.window.lift()
+
+    def refresh(self):
+        self.stats_tree.delete(*self.stats_tree.get_children())
+        for item in self.db_service.get_execution_stats():
+            self.stats_tree.insert(
+                "",
+                tk.END,
+                values=(
+                    item["name"],
+                    item["runs"],
+                    f"{item['failure_rate']:.0%}",
+                    format_duration(item["p50"]),
+                    format_duration(item["p95"]),
+                    format_bytes(item["peak_rss"]),
+                    format_duration(item["avg_cpu_time"]),
+                    format_time(item["last_run"]),
+                ),
+            )
+
+        self.recent_tree.delete(*self.recent_tree.get_children())
+        self.log_paths.clear()
+        for item in self.db_service.get_recent_executions(self.recent_limit):
+            iid = str(item["id"])
+            if item["log_path"]:
+                self.log_paths[iid] = (item["log_path"], item["command"])
+            self.recent_tree.insert(
+                "",
+                tk.END,
+                iid=iid,
+                values=(
+                    format_time(item["started_at"]),
+                    item["command"],
+                    item["status"],
+                    "-" if item["exit_code"] is None else item["exit_code"],
+                    format_duration(item["duration"]),
+                    format_duration(item["cpu_time"]),
+                    format_bytes(item["peak_rss"]),
+                    f"{format_bytes(item['read_bytes'])}/"
+                    f"{format_bytes(item['write_bytes'])}",
+                    "-" if item["peak_children"] is None else item["peak_children"],
+                    f"{item['stdout_bytes']}/{item['stderr_bytes']}",
+                ),
+            )
+
+    def _create(self):
+        self.window = tk.Toplevel(self.root)
+        self.window.title("执行统计")
+        self.window.geometry("1000x500")
+
+        toolbar = ttk.Frame(self.window)
+        toolbar.pack(fill=tk.X, padx=5, pady=5)
+        ttk.Button(toolbar, text="刷新", command=self.refresh).pack(side=tk.LEFT)
+
+        self.stats_tree = self._create_tree("按命令统计", self.stats_columns)
+        self.recent_tree = self._create_tree("最近执行", self.recent_columns)
+        self.recent_tree.bind("<Double-1>", self.on_recent_double_click)
+
+    def on_recent_double_click(self, event):
+        item = self.recent_tree.identify_row(event.y)
+        if item in self.log_paths and self.on_open_log is not None:
+            self.on_open_log(*self.log_paths[item])
+
+    def _create_tree(self, title: str, columns) -> ttk.Treeview:
+        frame = ttk.LabelFrame(self.window, text=title)
+        frame.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        scrollbar = ttk.Scrollbar(frame)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        tree = ttk.Treeview(
+            frame,
+            columns=[c[0] for c in columns],
+            show="headings",
+            yscrollcommand=scrollbar.set,
+        )
+        for key, text, width in columns:
+            tree.heading(key, text=text)
+            tree.column(key, width=width, stretch=True)
+        tree.pack(fill=tk.BOTH, expand=True)
+        scrollbar.config(command=tree.yview)
+        return tree
@@ -0,0 +1,122 @@
+from collections.abc import Callable
+from tkinter import ttk
+from command import Command
+from dbservice import DBService
+
+# 文件夹行的iid前缀
+FOLDER_PREFIX = "folder:"
+UNTAGGED_FOLDER = FOLDER_PREFIX
+MORE_PREFIX = "more:"
+# 占位子行，使未展开的文件夹显示展开按钮
+PLACEHOLDER_PREFIX = "placeholder:"
+
+
+class TagTreeview:
+    """
+    按标签分层显示命令：顶层只插入各标签(文件夹)行，
+    文件夹展开时才从数据库读取其中的命令，每次最多page_size条，
+    其余通过“加载更多”行按需读取。一条命令可能出现在多个文件夹中
+    """
+
+    page_size = 500
+
+    def __init__(
+        self,
+        tree: ttk.Treeview,
+        db_service: DBService,
+        insert_command: Callable[[str, Command], str],
+    ):
+        """
+        :param insert_command: 在指定父行下插入命令行 insert_command(父行, 命令)，返回行id
+        """
+        self.tree = tree
+        self.db_service = db_service
+        self.insert_command = insert_command
+        self.enabled = False
+        # 已展开过的文件夹 {文件夹行: 已加载的命令数}
+        self.loaded = dict[str, int]()
+        # {文件夹行: 标签名称}
+        self.folder_tags = dict[str, str]()
+        self._binding = None
+
+    @staticmethod
+    def is_command_row(row_id: str) -> bool:
+        return not row_id.startswith((FOLDER_PREFIX, MORE_PREFIX, PLACEHOLDER_PREFIX))
+
+    def enable(self):
+        """切换到文件夹模式，只渲染顶层的文件夹行"""
+        if not self.enabled:
+            self.enabled = True
+            self.tree.config(show="tree headings")
+            self._binding = self.tree.bind("<<TreeviewOpen>>", self.on_open, add="+")
+        self.refresh()
+
+    def disable(self):
+        if not self.enabled:
+            return
+        self.enabled = False
+        self.loaded.clear()
+        self.folder_tags.clear()
+        self.tree.unbind("<<TreeviewOpen>>", self._binding)
+        self.tree.config(show="headings")
+
+    def refresh(self):
+        """重新读取文件夹，保留展开状态，已展开的文件夹重新加载"""
+        opened = {
+            folder: count
+            for folder, count in self.loaded.items()
+            if self.tree.exists(folder) and self.tree.item(folder, "open")
+        }
+        self.loaded.clear()
+        self.folder_tags.clear()
+        self.tree.delete(*self.tree.get_children())
+
+        folders = [
+            (f"{FOLDER_PREFIX}{tag_id}", name, count)
+            for tag_id, name, count in self.db_service.get_tags()
+        ]
+        if untagged := self.db_service.count_untagged_commands():
+            folders.append((UNTAGGED_FOLDER, "未分类", untagged))
+        for folder, name, count in folders:
+            self.folder_tags[folder] = name
+            self.tree.insert(
+                "", "end", iid=folder, text=f"{name} ({count})", tags=("folder",)
+            )
+            if folder in opened:
+                self.tree.item(folder, open=True)
+                self._load(folder, max(opened[folder], self.page_size))
+            else:
+                self.tree.insert(folder, "end", iid=f"{PLACEHOLDER_PREFIX}{folder}")
+
+    def on_open(self, event=None):
+        folder = self.tree.focus()
+        if folder.startswith(FOLDER_PREFIX) and folder not in self.loaded:
+            self.tree.delete(*self.tree.get_children(folder))
+            self._load(folder, self.page_size)
+
+    def load_more(self, row_id: str):
+        """“加载更多”行被点击时读取文件夹的下一页"""
+        folder = row_id[len(MORE_PREFIX) :]
+        if self.tree.exists(row_id):
+            self.tree.delete(row_id)
+        self._load(folder, self.page_size)
+
+    def _load(self, folder: str, limit: int):
+        offset = self.loaded.get(folder, 0)
+        if folder == UNTAGGED_FOLDER:
+            commands = self.db_service.get_untagged_commands(limit, offset)
+        else:
+            commands = self.db_service.get_commands_by_tags(
+                [self.folder_tags[folder]], limit=limit, offset=offset
+            )
+        for cmd in commands:
+            self.insert_command(folder, cmd)
+        self.loaded[folder] = offset + len(commands)
+        if len(commands) == limit:
+            self.tree.insert(
+                folder,
+                "end",
+                iid=f"{MORE_PREFIX}{folder}",
+                text="加载更多…",
+                tags=("folder",),
+            )
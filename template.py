@@ -0,0 +1,100 @@
+from collections.abc import Iterator
+import functools
+import itertools
+import math
+import re
+
+# 命令模板中的占位符 {{名称}}，名称为标识符；其他花括号(如Go模板的
+# {{.Names}})原样保留为文本。
+# 只有保存时启用了模板参数的命令才按模板解析(见DBService.set_command_template)，
+# 其他命令中的 {{...}}(如Ansible、Helm的变量)按原样执行
+PLACEHOLDER_OPEN = "{{"
+PLACEHOLDER_PATTERN = re.compile(r"\{\{\s*([A-Za-z_][A-Za-z0-9_]*)\s*\}\}")
+# 参数值以此开头时表示从文件中逐行读取
+VALUES_FILE_PREFIX = "@"
+
+
+class TemplateError(ValueError):
+    pass
+
+
+class CommandTemplate:
+    """解析后的命令模板：文本与占位符交替的片段"""
+
+    def __init__(self, text: str):
+        self.text = text
+        # 偶数位为文本，奇数位为参数名
+        self.parts = list[str]()
+        pos = 0
+        for match in PLACEHOLDER_PATTERN.finditer(text):
+            self.parts += [text[pos : match.start()], match.group(1)]
+            pos = match.end()
+        self.parts.append(text[pos:])
+        # 参数名，按首次出现的顺序
+        self.names = tuple(dict.fromkeys(self.parts[1::2]))
+
+    @property
+    def is_template(self) -> bool:
+        return bool(self.names)
+
+    def render(self, values: dict[str, str]) -> str:
+        missing = [name for name in self.names if name not in values]
+        if missing:
+            raise TemplateError(f"缺少参数: {', '.join(missing)}")
+        return "".join(
+            values[part] if i % 2 else part for i, part in enumerate(self.parts)
+        )
+
+    def expand(
+        self, matrix: dict[str, list[str]]
+    ) -> Iterator[tuple[dict[str, str], str]]:
+        """按参数矩阵(各参数取值的笛卡尔积)逐个生成 (参数, 命令)，不预先展开"""
+        columns = [matrix[name] for name in self.names]
+        for combination in itertools.product(*columns):
+            values = dict(zip(self.names, combination))
+            yield values, self.render(values)
+
+    def count(self, matrix: dict[str, list[str]]) -> int:
+        return math.prod(len(matrix[name]) for name in self.names)
+
+
+@functools.lru_cache(maxsize=1024)
+def parse_template(text: str) -> CommandTemplate:
+    """解析命令模板，同一文本只解析一次；任何文本都可解析，不会抛出异常"""
+    return CommandTemplate(text)
+
+
+def check_template(text: str) -> tuple[str, ...]:
+    """保存启用了模板参数的命令时校验，返回参数名；没有占位符时抛出TemplateError"""
+    names = parse_template(text).names
+    if not names:
+        raise TemplateError("启用了模板参数，但命令中没有 {{参数名}} 占位符")
+    return names
+
+
+def is_template(text: str) -> bool:
+    """文本中是否有参数占位符(命令是否按模板执行取决于其模板设置)"""
+    return PLACEHOLDER_OPEN in text and parse_template(text).is_template
+
+
+def parse_values(spec: str) -> list[str]:
+    """
+    参数取值：以逗号分隔的多个值，或 @文件 从文件中逐行读取(忽略空行)
+    """
+    spec = spec.strip()
+    if spec.startswith(VALUES_FILE_PREFIX):
+        path = spec[len(VALUES_FILE_PREFIX) :].strip()
+        try:
+            with open(path, encoding="utf-8") as f:
+                values = [line.strip() for line in f if line.strip()]
+        except OSError as e:
+            raise TemplateError(f"无法读取参数文件 {path}: {e}")
+    else:
+        values = [value.strip() for value in spec.split(",")]
+    if not values:
+        raise TemplateError(f"没有参数值: {spec}")
+    return values
+
+
+def format_values(values: dict[str, str]) -> str:
+    return ", ".join(f"{name}={value}" for name, value in values.items())
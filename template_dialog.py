@@ -0,0 +1,117 @@
+from collections.abc import Callable
+import tkinter as tk
+from tkinter import ttk, filedialog
+from template import (
+    CommandTemplate,
+    TemplateError,
+    VALUES_FILE_PREFIX,
+    parse_template,
+    parse_values,
+)
+
+
+class TemplateRunDialog:
+    """
+    执行模板命令前填写参数：每个参数可填一个值、以逗号分隔的多个值，
+    或 @文件(每行一个值)；有多个值时按各参数取值的笛卡尔积批量执行
+    """
+
+    def __init__(
+        self,
+        root: tk.Tk,
+        on_run: Callable[[str, CommandTemplate, dict[str, list[str]], int], None],
+    ):
+        """
+        :param on_run: on_run(名称, 模板, {参数: [取值]}, 已存储命令ID)
+        """
+        self.root = root
+        self.on_run = on_run
+        self.window = None
+        self.template = None
+        self.name = ""
+        self.command_id = None
+        self.value_vars = dict[str, tk.StringVar]()
+        # 上次填写的参数值，再次执行时预填
+        self.last_values = dict[str, str]()
+
+    def show(self, name: str, command: str, command_id=None):
+        if self.window is not None and self.window.winfo_exists():
+            self.window.destroy()
+        self.template = parse_template(command)
+        self.name = name
+        self.command_id = command_id
+        self._create()
+        self.update_count()
+
+    def _create(self):
+        self.window = tk.Toplevel(self.root)
+        self.window.title(f"执行模板: {self.name}")
+        self.window.transient(self.root)
+
+        ttk.Label(self.window, text=self.template.text).pack(
+            fill=tk.X, padx=5, pady=5
+        )
+        form = ttk.Frame(self.window)
+        form.pack(fill=tk.BOTH, expand=True, padx=5)
+        form.columnconfigure(1, weight=1)
+        self.value_vars.clear()
+        first_entry = None
+        for row, name in enumerate(self.template.names):
+            ttk.Label(form, text=name).grid(row=row, column=0, sticky=tk.W)
+            var = tk.StringVar(value=self.last_values.get(name, ""))
+            var.trace_add("write", lambda *args: self.update_count())
+            entry = ttk.Entry(form, textvariable=var, width=50)
+            entry.grid(row=row, column=1, sticky=tk.EW, padx=5, pady=2)
+            ttk.Button(
+                form, text="文件…", command=lambda v=var: self.choose_file(v)
+            ).grid(row=row, column=2)
+            self.value_vars[name] = var
+            first_entry = first_entry or entry
+
+        ttk.Label(
+            self.window,
+            text=f"多个值以逗号分隔，{VALUES_FILE_PREFIX}文件 从文件中逐行读取",
+            foreground="grey",
+        ).pack(fill=tk.X, padx=5, pady=(5, 0))
+        self.count_var = tk.StringVar()
+        ttk.Label(self.window, textvariable=self.count_var).pack(fill=tk.X, padx=5)
+
+        buttons = ttk.Frame(self.window)
+        buttons.pack(fill=tk.X, padx=5, pady=5)
+        self.run_button = ttk.Button(buttons, text="执行", command=self.submit)
+        self.run_button.pack(side=tk.RIGHT, padx=5)
+        ttk.Button(buttons, text="取消", command=self.window.destroy).pack(
+            side=tk.RIGHT
+        )
+        self.window.bind("<Return>", lambda e: self.submit())
+        self.window.bind("<Escape>", lambda e: self.window.destroy())
+        if first_entry is not None:
+            first_entry.focus_set()
+
+    def choose_file(self, var: tk.StringVar):
+        path = filedialog.askopenfilename(parent=self.window, title="参数值文件")
+        if path:
+            var.set(f"{VALUES_FILE_PREFIX}{path}")
+
+    def get_matrix(self) -> dict[str, list[str]]:
+        return {name: parse_values(var.get()) for name, var in self.value_vars.items()}
+
+    def update_count(self):
+        try:
+            count = self.template.count(self.get_matrix())
+        except TemplateError as e:
+            self.count_var.set(str(e))
+            self.run_button.config(state=tk.DISABLED)
+            return
+        self.count_var.set(f"共 {count} 个组合")
+        self.run_button.config(state=tk.NORMAL)
+
+    def submit(self):
+        try:
+            matrix = self.get_matrix()
+        except TemplateError as e:
+            self.count_var.set(str(e))
+            return
+        self.last_values = {name: var.get() for name, var in self.value_vars.items()}
+        self.window.destroy()
+        self.on_run(self.name, self.template, matrix, self.command_id)
@@ -0,0 +1,211 @@
+"""
+轻量的耗时跟踪：用span()或traced标记代码段，结束的span记录到环形缓冲区，
+可汇总为各span的耗时分位数，或导出为Chrome trace事件格式
+(chrome://tracing、Perfetto可直接打开)。
+
+未启用时span()返回共享的空上下文，traced包装的函数只多一次判断。
+设置环境变量 CMDMANAGER_TRACE=1 时启动即启用
+"""
+
+from collections import deque
+from collections.abc import Callable
+import functools
+import math
+import os
+import threading
+import time
+
+# 环形缓冲区默认保留的span数
+DEFAULT_CAPACITY = 100_000
+
+
+class _State:
+    def __init__(self):
+        self.enabled = False
+        # (名称, 开始ns, 耗时ns, 线程ID, 参数)，deque.append是线程安全的
+        self.spans = deque(maxlen=DEFAULT_CAPACITY)
+        self.thread_names = dict[int, str]()
+        # 导出时以此为时间原点
+        self.origin = time.perf_counter_ns()
+
+
+_state = _State()
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ("name", "args", "start")
+
+    def __init__(self, name: str, args: dict | None):
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        _record(self.name, self.start, time.perf_counter_ns(), self.args)
+        return False
+
+
+def _record(name: str, start: int, end: int, args: dict | None):
+    thread = threading.current_thread()
+    thread_id = thread.ident
+    if thread_id not in _state.thread_names:
+        _state.thread_names[thread_id] = thread.name
+    _state.spans.append((name, start, end - start, thread_id, args))
+
+
+def is_enabled() -> bool:
+    return _state.enabled
+
+
+def enable(capacity: int | None = None):
+    """启用跟踪；指定capacity时重新建立缓冲区"""
+    if capacity is not None and capacity != _state.spans.maxlen:
+        _state.spans = deque(_state.spans, maxlen=capacity)
+    _state.enabled = True
+
+
+def disable():
+    _state.enabled = False
+
+
+def clear():
+    _state.spans.clear()
+
+
+def span(name: str, **args):
+    """
+    标记一段代码的耗时:
+        with tracing.span("db.query", sql=sql):
+            ...
+    """
+    if not _state.enabled:
+        return _NULL_SPAN
+    return _Span(name, args or None)
+
+
+def traced(name: str | Callable | None = None):
+    """
+    标记函数的耗时，可写为 @traced 或 @traced("名称")，默认名称为函数的限定名
+    """
+
+    def decorate(func: Callable) -> Callable:
+        span_name = name if isinstance(name, str) else func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _state.enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter_ns()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                _record(span_name, start, time.perf_counter_ns(), None)
+
+        return wrapper
+
+    if callable(name):
+        return decorate(name)
+    return decorate
+
+
+def trace_methods(prefix: str, exclude=()):
+    """
+    类装饰器：以 "前缀.方法名" 跟踪类的全部公开方法
+    :param exclude: 不跟踪的方法(如生成器、上下文管理器，包装后只能测到创建)
+    """
+
+    def decorate(cls):
+        for attr, value in list(vars(cls).items()):
+            if attr.startswith("_") or attr in exclude or not callable(value):
+                continue
+            setattr(cls, attr, traced(f"{prefix}.{attr}")(value))
+        return cls
+
+    return decorate
+
+
+def snapshot() -> list[tuple]:
+    """当前缓冲区中的全部span"""
+    return list(_state.spans)
+
+
+def percentile(sorted_values: list, fraction: float):
+    """最近秩法的分位数"""
+    rank = max(1, math.ceil(fraction * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(spans: list[tuple] | None = None) -> list[dict]:
+    """按名称汇总span的次数与耗时(秒)，按总耗时从高到低排序"""
+    durations = dict[str, list[int]]()
+    for name, _, duration, _, _ in snapshot() if spans is None else spans:
+        durations.setdefault(name, []).append(duration)
+    stats = []
+    for name, values in durations.items():
+        values.sort()
+        stats.append(
+            {
+                "name": name,
+                "count": len(values),
+                "total": sum(values) / 1e9,
+                "p50": percentile(values, 0.5) / 1e9,
+                "p95": percentile(values, 0.95) / 1e9,
+                "p99": percentile(values, 0.99) / 1e9,
+                "max": values[-1] / 1e9,
+            }
+        )
+    stats.sort(key=lambda item: -item["total"])
+    return stats
+
+
+def to_chrome_trace(spans: list[tuple] | None = None) -> dict:
+    """Chrome trace事件格式：每个span为一个完整事件(ph=X)，时间单位为微秒"""
+    spans = snapshot() if spans is None else spans
+    pid = os.getpid()
+    events = [
+        {"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": n}}
+        for tid, n in list(_state.thread_names.items())
+    ]
+    for name, start, duration, tid, args in spans:
+        event = {
+            "name": name,
+            "cat": name.split(".", 1)[0],
+            "ph": "X",
+            "ts": (start - _state.origin) / 1000,
+            "dur": duration / 1000,
+            "pid": pid,
+            "tid": tid,
+        }
+        if args:
+            event["args"] = {key: str(value) for key, value in args.items()}
+        events.append(event)
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+def export_chrome_trace(path: str) -> int:
+    """导出为Chrome trace JSON文件，返回导出的span数"""
+    # json(及其依赖的re)较慢，命令行启动时不导入
+    import json
+
+    trace = to_chrome_trace()
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(trace, f, ensure_ascii=False)
+    return sum(1 for event in trace["traceEvents"] if event["ph"] == "X")
+
+
+if os.environ.get("CMDMANAGER_TRACE"):
+    enable()
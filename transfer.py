@@ -0,0 +1,174 @@
+import argparse
+from collections.abc import Callable, Iterable, Iterator
+import csv
+import itertools
+import json
+import os
+import sys
+from command import Command
+from dbservice import DBService, DUPLICATE_MODES, DUPLICATE_SKIP
+
+FORMAT_JSONL = "jsonl"
+FORMAT_CSV = "csv"
+FORMATS = (FORMAT_JSONL, FORMAT_CSV)
+
+CSV_FIELDS = ("id", "name", "command", "notes")
+# 导入时每个事务写入的行数
+IMPORT_CHUNK_SIZE = 10000
+# 导出时每读取多少行报告一次进度
+EXPORT_PROGRESS_STEP = 10000
+
+
+class ImportResult:
+    def __init__(self) -> None:
+        self.total = 0
+        self.inserted = 0
+        self.overwritten = 0
+        self.skipped = 0
+
+    def __repr__(self) -> str:
+        return (
+            f"ImportResult(total={self.total}, inserted={self.inserted}, "
+            f"overwritten={self.overwritten}, skipped={self.skipped})"
+        )
+
+
+def guess_format(path: str) -> str:
+    """根据扩展名判断格式，默认JSON Lines"""
+    ext = os.path.splitext(path)[1].lower()
+    return FORMAT_CSV if ext == ".csv" else FORMAT_JSONL
+
+
+def write_commands(commands: Iterable[Command], path: str, fmt=None, progress=None):
+    """
+    逐行写出命令
+    :param progress: 进度回调 progress(已写出行数)
+    :return: 写出的行数
+    """
+    fmt = fmt or guess_format(path)
+    count = 0
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = None
+        if fmt == FORMAT_CSV:
+            writer = csv.DictWriter(f, fieldnames=CSV_FIELDS)
+            writer.writeheader()
+        for cmd in commands:
+            if writer:
+                writer.writerow(cmd.to_dict())
+            else:
+                f.write(json.dumps(cmd.to_dict(), ensure_ascii=False))
+                f.write("\n")
+            count += 1
+            if progress and count % EXPORT_PROGRESS_STEP == 0:
+                progress(count)
+    if progress:
+        progress(count)
+    return count
+
+
+def read_commands(path: str, fmt=None) -> Iterator[Command]:
+    """逐行读取命令(生成器)，不会一次性载入整个文件"""
+    fmt = fmt or guess_format(path)
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        if fmt == FORMAT_CSV:
+            for row in csv.DictReader(f):
+                yield Command.from_dict(row)
+            return
+
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield Command.from_dict(json.loads(line))
+            except (json.JSONDecodeError, AttributeError) as e:
+                raise ValueError(f"第{line_no}行格式错误: {str(e)}")
+
+
+def export_commands(db_service: DBService, path: str, fmt=None, progress=None):
+    """导出全部命令，返回导出的行数"""
+    return write_commands(db_service.iter_commands(), path, fmt, progress)
+
+
+def import_commands(
+    db_service: DBService,
+    path: str,
+    fmt=None,
+    on_duplicate=DUPLICATE_SKIP,
+    chunk_size=IMPORT_CHUNK_SIZE,
+    progress: Callable[[ImportResult], None] | None = None,
+) -> ImportResult:
+    """
+    按块导入命令，每块一个事务，由bulk_save_commands以executemany写入
+    :param on_duplicate: 与已有命令重复时的处理方式，见 DUPLICATE_MODES
+    :param progress: 每写入一块后回调 progress(ImportResult)
+    """
+    result = ImportResult()
+    commands = read_commands(path, fmt)
+    while chunk := list(itertools.islice(commands, chunk_size)):
+        valid = []
+        for cmd in chunk:
+            if cmd.name and cmd.command:
+                # 导入时总是分配新ID
+                cmd.id = None
+                valid.append(cmd)
+        inserted, overwritten, skipped = db_service.bulk_save_commands(
+            valid, on_duplicate
+        )
+        result.total += len(chunk)
+        result.inserted += inserted
+        result.overwritten += overwritten
+        result.skipped += skipped + len(chunk) - len(valid)
+        if progress:
+            progress(result)
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="导入/导出命令库")
+    sub = parser.add_subparsers(dest="action", required=True)
+
+    export_parser = sub.add_parser("export", help="导出命令")
+    export_parser.add_argument("path")
+    export_parser.add_argument("--format", choices=FORMATS)
+
+    import_parser = sub.add_parser("import", help="导入命令")
+    import_parser.add_argument("path")
+    import_parser.add_argument("--format", choices=FORMATS)
+    import_parser.add_argument(
+        "--on-duplicate", choices=DUPLICATE_MODES, default=DUPLICATE_SKIP
+    )
+    import_parser.add_argument("--chunk-size", type=int, default=IMPORT_CHUNK_SIZE)
+
+    parser.add_argument("--db", default="commands.db", help="数据库文件")
+    args = parser.parse_args(argv)
+
+    db_service = DBService(args.db)
+    try:
+        if args.action == "export":
+            count = export_commands(
+                db_service,
+                args.path,
+                args.format,
+                lambda n: print(f"已导出 {n} 条", file=sys.stderr),
+            )
+            print(f"导出完成: {count} 条")
+        else:
+            result = import_commands(
+                db_service,
+                args.path,
+                args.format,
+                args.on_duplicate,
+                args.chunk_size,
+                lambda r: print(f"已处理 {r.total} 条", file=sys.stderr),
+            )
+            print(
+                f"导入完成: 共{result.total}条, 新增{result.inserted}, "
+                f"覆盖{result.overwritten}, 跳过{result.skipped}"
+            )
+    finally:
+        db_service.close()
+
+
+if __name__ == "__main__":
+    main()
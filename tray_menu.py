@@ -0,0 +1,187 @@
+from collections.abc import Callable
+import math
+import threading
+import pystray
+from command import Command
+from dbservice import DBService
+from tracing import traced
+
+
+class TrayMenu:
+    """
+    托盘的命令菜单：在后台线程中读取命令并建立不可变的菜单快照，
+    托盘线程打开菜单时直接返回当前快照，不再逐次创建菜单项。
+    数据变更后调用invalidate()增加代数，后台线程发现代数变化才重建，
+    连续的多次变更只重建一次；新快照以单次赋值整体发布。
+    只有执行记录变化时只重新读取常用部分，按名称/标签分组的部分
+    (组内按当时的常用度排序)保留到命令增删改后才重建。
+    有标签时先按标签分为子菜单；命令(或标签)较多时按名称首字母
+    (不够再按前几个字母、最后按序号)分组为多级子菜单，每级不超过max_items项
+    """
+
+    max_items = 30
+    # 常用部分的条数
+    top_count = 10
+    # 按名称前缀分组时最多使用的字符数
+    max_prefix = 3
+
+    def __init__(
+        self,
+        db_name: str,
+        on_run: Callable[[Command], None],
+        on_published: Callable[[], None] | None = None,
+        on_error: Callable[[str], None] | None = None,
+    ):
+        """
+        :param on_error: on_error(说明)，在后台线程中报告建立菜单失败，
+            默认输出到标准输出
+        """
+        self.db_name = db_name
+        self.on_run = on_run
+        self.on_published = on_published
+        self.on_error = on_error or print
+        self.generation = 0
+        # 命令本身(而非执行记录)的变化代数
+        self.commands_generation = 0
+        # (代数, 菜单项)
+        self._snapshot = (-1, ())
+        # 分组部分：(命令代数, 菜单项)，只在后台线程中使用
+        self._groups = (-1, ())
+        self._wake = threading.Event()
+        threading.Thread(target=self._worker, daemon=True).start()
+
+    def invalidate(self, commands_changed=True):
+        """
+        数据已变化，在后台重建菜单(可在任意线程调用)
+        :param commands_changed: 为False时只有执行记录(常用度)变化，只重建常用部分
+        """
+        if commands_changed:
+            self.commands_generation += 1
+        self.generation += 1
+        self._wake.set()
+
+    def items(self) -> tuple:
+        """当前菜单快照，供pystray.Menu在托盘线程中调用"""
+        return self._snapshot[1]
+
+    def _worker(self):
+        db_service = DBService(self.db_name)
+        try:
+            while True:
+                self._wake.wait()
+                self._wake.clear()
+                generation = self.generation
+                if generation == self._snapshot[0]:
+                    continue
+                try:
+                    items = self._build(db_service)
+                except Exception as e:
+                    self.on_error(f"建立托盘菜单失败，菜单未更新: {e}")
+                    continue
+                self._snapshot = (generation, items)
+                if self.on_published:
+                    self.on_published()
+        finally:
+            db_service.close()
+
+    @traced("tray.build")
+    def _build(self, db_service: DBService) -> tuple:
+        # 先取得代数，建立期间发生的变化会在下一次重建
+        commands_generation = self.commands_generation
+        items = []
+        top_commands = db_service.get_top_commands(self.top_count)
+        if top_commands:
+            items.append(pystray.MenuItem("常用", None, enabled=False))
+            items.extend(self._make_item(cmd) for cmd in top_commands)
+            items.append(pystray.Menu.SEPARATOR)
+        if self._groups[0] != commands_generation:
+            self._groups = (commands_generation, self._build_groups(db_service))
+        items.extend(self._groups[1])
+        return tuple(items)
+
+    @traced("tray.build_groups")
+    def _build_groups(self, db_service: DBService) -> tuple:
+        commands = db_service.get_commands()
+        if not db_service.has_tags():
+            return self.build_level(commands)
+
+        # 按标签分组，组内保持常用度顺序
+        command_tags = db_service.get_command_tags()
+        folders = dict[str, list[Command]]()
+        untagged = []
+        for cmd in commands:
+            for tag in command_tags.get(cmd.id, ()):
+                folders.setdefault(tag, []).append(cmd)
+            if cmd.id not in command_tags:
+                untagged.append(cmd)
+        entries = [(tag, folders[tag]) for tag in sorted(folders)]
+        if untagged:
+            entries.append(("未分类", untagged))
+        return self.build_level(entries, name=lambda e: e[0], make=self._make_folder)
+
+    def build_level(self, items: list, depth=0, name=None, make=None) -> tuple:
+        """
+        建立一级菜单，超过max_items时分组为子菜单
+        :param items: 命令，或(标签, 命令列表)
+        :param depth: 按名称前depth+1个字符分组
+        :param name: 取得项目名称的函数，默认为命令名称
+        :param make: 创建项目菜单项的函数，默认为执行命令的菜单项
+        """
+        name = name or (lambda cmd: cmd.name)
+        make = make or self._make_item
+        if len(items) <= self.max_items:
+            return tuple(make(item) for item in items)
+
+        groups = dict[str, list]()
+        for item in items:
+            key = (name(item) or "")[: depth + 1].upper()
+            groups.setdefault(key, []).append(item)
+        if len(groups) == 1:
+            if depth + 1 < self.max_prefix:
+                return self.build_level(items, depth + 1, name, make)
+            # 名称前缀相同，按序号分段
+            size = self.max_items
+            entries = [
+                (f"{i + 1}-{i + len(items[i : i + size])}", items[i : i + size])
+                for i in range(0, len(items), size)
+            ]
+        else:
+            entries = [(key or "#", groups[key]) for key in sorted(groups)]
+
+        if len(entries) > self.max_items:
+            # 分组仍过多时合并相邻的分组，子菜单中再按同样的前缀展开
+            per = math.ceil(len(entries) / self.max_items)
+            return tuple(
+                self._make_submenu(
+                    f"{part[0][0]} – {part[-1][0]}",
+                    [item for _, group in part for item in group],
+                    depth,
+                    name,
+                    make,
+                )
+                for part in (
+                    entries[i : i + per] for i in range(0, len(entries), per)
+                )
+            )
+        # 只有一项的分组直接显示该项
+        return tuple(
+            make(group[0])
+            if len(group) == 1
+            else self._make_submenu(label, group, depth + 1, name, make)
+            for label, group in entries
+        )
+
+    def _make_submenu(self, label: str, items: list, depth: int, name, make):
+        return pystray.MenuItem(
+            f"{label} ({len(items)})",
+            pystray.Menu(*self.build_level(items, depth, name, make)),
+        )
+
+    def _make_folder(self, entry: tuple[str, list[Command]]):
+        tag, commands = entry
+        return pystray.MenuItem(
+            f"{tag} ({len(commands)})", pystray.Menu(*self.build_level(commands))
+        )
+
+    def _make_item(self, cmd: Command):
+        return pystray.MenuItem(cmd.name, lambda *args: self.on_run(cmd))
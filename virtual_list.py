@@ -0,0 +1,178 @@
+from collections.abc import Callable
+import tkinter as tk
+from tkinter import ttk
+from command import Command
+from dbservice import DBService
+
+
+class VirtualTreeview:
+    """
+    虚拟列表：Treeview中只渲染可见窗口内的行，
+    滚动时按id键集分页从数据库获取，内存与渲染耗时只与可见行数有关。
+    拖动滚动条跳转时从最近的锚点(每anchor_step行缓存一次的id)开始定位，
+    每次查询最多跳过anchor_step行
+    """
+
+    default_row_height = 20
+    anchor_step = 1000
+
+    def __init__(
+        self,
+        tree: ttk.Treeview,
+        scrollbar: tk.Scrollbar,
+        db_service: DBService,
+        on_render: Callable[[list[Command]], None],
+    ):
+        self.tree = tree
+        self.scrollbar = scrollbar
+        self.db_service = db_service
+        self.on_render = on_render
+        self.enabled = False
+        self.total = 0
+        self.offset = 0  # 窗口第一行在整个列表中的位置
+        self.window = list[Command]()
+        self._bindings = []
+        # {锚点序号: 第 序号*anchor_step 行的命令id}
+        self._anchors = dict[int, int]()
+
+    def enable(self, total: int):
+        """切换到虚拟列表模式，并从头渲染"""
+        self.total = total
+        self._anchors.clear()
+        if not self.enabled:
+            self.enabled = True
+            self.scrollbar.config(command=self.scroll)
+            self.tree.config(yscrollcommand="")
+            for seq, func in (
+                ("<Configure>", lambda e: self.refresh()),
+                ("<MouseWheel>", self.on_mouse_wheel),
+                ("<Button-4>", lambda e: self.scroll("scroll", -3, "units")),
+                ("<Button-5>", lambda e: self.scroll("scroll", 3, "units")),
+            ):
+                self._bindings.append((seq, self.tree.bind(seq, func, add="+")))
+        self.goto(min(self.offset, max(total - 1, 0)))
+
+    def disable(self):
+        """恢复为普通Treeview滚动"""
+        if not self.enabled:
+            return
+        self.enabled = False
+        self.window = []
+        self.offset = 0
+        self._anchors.clear()
+        for seq, funcid in self._bindings:
+            self.tree.unbind(seq, funcid)
+        self._bindings.clear()
+        self.scrollbar.config(command=self.tree.yview)
+        self.tree.config(yscrollcommand=self.scrollbar.set)
+
+    def visible_rows(self) -> int:
+        row_height = ttk.Style().lookup("Treeview", "rowheight")
+        try:
+            row_height = int(row_height) or self.default_row_height
+        except (TypeError, ValueError):
+            row_height = self.default_row_height
+        return max(1, self.tree.winfo_height() // row_height)
+
+    def forget_anchors(self, command_id: int):
+        """
+        新增或删除了命令：该id之后各行的位置已变化，丢弃这些锚点
+        (新命令的id总是最大，只新增时锚点仍然有效)
+        """
+        self._anchors = {
+            index: anchor_id
+            for index, anchor_id in self._anchors.items()
+            if anchor_id < command_id
+        }
+
+    def id_at(self, offset: int):
+        """第offset行的命令id，从不超过它的最近锚点开始定位"""
+        index = offset // self.anchor_step
+        known = max((i for i in self._anchors if i <= index), default=0)
+        from_id = self._anchors.get(known)
+        # 逐个补齐到目标所在的锚点，之后跳到附近时不再重复扫描
+        while known < index:
+            anchor_id = self.db_service.get_command_id_at(self.anchor_step, from_id)
+            if anchor_id is None:
+                return None
+            known += 1
+            from_id = self._anchors[known] = anchor_id
+        return self.db_service.get_command_id_at(
+            offset - known * self.anchor_step, from_id
+        )
+
+    def refresh(self):
+        """按当前位置重新获取并渲染窗口"""
+        if self.enabled:
+            self.goto(self.offset)
+
+    def goto(self, offset: int):
+        """定位到第offset行"""
+        rows = self.visible_rows()
+        offset = max(0, min(offset, self.total - rows))
+        after_id = None
+        if offset > 0:
+            after_id = self.id_at(offset - 1)
+        self.offset = offset
+        self.window = self.db_service.get_commands_page(after_id=after_id, limit=rows)
+        self._render()
+
+    def scroll(self, *args):
+        """滚动条回调: ('moveto', 比例) 或 ('scroll', 数量, 'units'|'pages')"""
+        if not self.enabled or not args:
+            return
+        if args[0] == "moveto":
+            self.goto(int(float(args[1]) * self.total))
+            return
+
+        count = int(args[1])
+        rows = self.visible_rows()
+        if args[2] == "pages":
+            count *= rows
+        if count > 0:
+            self._scroll_down(count, rows)
+        elif count < 0:
+            self._scroll_up(-count, rows)
+
+    def on_mouse_wheel(self, event):
+        self.scroll("scroll", -3 if event.delta > 0 else 3, "units")
+        return "break"
+
+    def _scroll_down(self, count: int, rows: int):
+        if not self.window or len(self.window) < rows:
+            return
+        if count >= rows:
+            self.goto(self.offset + count)
+            return
+        more = self.db_service.get_commands_page(
+            after_id=self.window[-1].id, limit=count
+        )
+        if not more:
+            return
+        self.window = self.window[len(more) :] + more
+        self.offset += len(more)
+        self._render()
+
+    def _scroll_up(self, count: int, rows: int):
+        if not self.window or self.offset == 0:
+            return
+        if count >= rows:
+            self.goto(self.offset - count)
+            return
+        more = self.db_service.get_commands_page(
+            before_id=self.window[0].id, limit=count
+        )
+        if not more:
+            return
+        self.window = more + self.window[: rows - len(more)]
+        self.offset -= len(more)
+        self._render()
+
+    def _render(self):
+        self.on_render(self.window)
+        if self.total:
+            first = self.offset / self.total
+            last = (self.offset + len(self.window)) / self.total
+            self.scrollbar.set(first, min(last, 1.0))
+        else:
+            self.scrollbar.set(0.0, 1.0)